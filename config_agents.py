@@ -19,6 +19,163 @@ PERFORMANCE_CONFIG = {
     "top_k": 40,
     "repeat_penalty": 1.1,
     "num_predict": 2500,  # GENIUS-level response length
+    "num_ctx": 8192,  # Context window - budgeted prompt (~3000 tokens) + answer; Ollama's default is smaller
+    "pipeline_mode": "pipelined",  # "pipelined" = prefill main model while thinking streams, "sequential" = old flow
+}
+
+# 🔌 INFERENCE CLIENT SETTINGS (Ollama servers are listed in BACKEND_CONFIG)
+INFERENCE_CONFIG = {
+    "max_connections": 16,  # Pooled HTTP connections to the Ollama server
+    "max_keepalive_connections": 8,
+    "keepalive_expiry": 30.0,  # Seconds an idle pooled connection stays open
+    "keep_alive": "10m",  # How long Ollama keeps a model loaded after a call
+    "max_workers": 16,  # Threads for background calls (prefill, prewarm); blocking calls run on the caller
+    "default_deadline": 120.0,  # Seconds (for streams: until the first token)
+    "stream_idle_timeout": 60.0,  # A stream that goes this long without a chunk is cut off, however long it runs
+    "deadlines": {  # Per-call-kind deadlines in seconds
+        "interactive": 300.0,
+        "thinking": 60.0,
+        "vision": 90.0,
+        "proactive": 45.0,
+        "continuation": 30.0,
+    },
+}
+
+# 🚦 INFERENCE PRIORITY SCHEDULER
+SCHEDULER_CONFIG = {
+    "enabled": True,
+    "priorities": ["interactive", "thinking", "vision", "proactive", "continuation"],  # Most urgent first
+    "max_concurrent": 6,  # Model calls in flight across all classes - a proactive wave plus a new user message
+    "class_limits": {
+        "interactive": 4,
+        "thinking": 4,
+        "vision": 2,
+        "proactive": 5,  # = GOALS_CONFIG["proactive_workers"]: 4 rounds + goal suggestions run as one wave
+        "continuation": 1,
+    },
+    "max_defer_seconds": 30.0,  # Low-priority calls stop yielding to higher classes after this
+}
+
+# 🧮 MODEL RESIDENCY (which models stay loaded in RAM/VRAM)
+RESIDENCY_CONFIG = {
+    "enabled": True,
+    "memory_budget_gb": 12.0,  # RAM/VRAM we let Ollama fill with model weights
+    "swap_wait_seconds": 15.0,  # Max time a call waits for a loaded model to drain before swapping anyway
+    "default_size_gb": 4.0,
+    "default_keep_alive": "5m",
+    "prewarm": ["gemma3n:e4b"],  # Loaded at startup
+    "models": {
+        "gemma3n:e4b": {"size_gb": 7.5, "keep_alive": "60m", "pinned": True},  # Primary - never evicted by us
+        "qwen3:0.6b": {"size_gb": 0.6, "keep_alive": "30m"},  # Thinking - tiny, runs every message
+        "gemma3:1b": {"size_gb": 0.9, "keep_alive": "30m"},  # Proactive rounds + goal suggestions
+        "qwen3:1.7b": {"size_gb": 1.4, "keep_alive": "10m"},  # Auto-continuation decisions
+        "llava:7b": {"size_gb": 4.7, "keep_alive": "2m"},  # Vision - only with images, unload quickly
+        "llava:13b": {"size_gb": 8.0, "keep_alive": "2m"},
+        "bakllava:7b": {"size_gb": 4.7, "keep_alive": "2m"},
+        "llava:1.5-7b": {"size_gb": 4.7, "keep_alive": "2m"},
+    },
+}
+
+# 🌐 OLLAMA BACKENDS (one entry per server; calls are routed by model affinity + least outstanding requests)
+BACKEND_CONFIG = {
+    "backends": [
+        {"host": None, "models": None, "weight": 1.0},  # None host = OLLAMA_HOST / localhost, None models = all
+        # {"host": "http://gpu-box:11434", "models": ["gemma3n:e4b", "llava:7b"], "weight": 2.0, "memory_budget_gb": 24.0},
+    ],
+    "max_retries": 2,  # Extra backends tried when one fails (streams only retry before the first chunk)
+    "eject_after_failures": 2,  # Consecutive connection/5xx failures before a backend is taken out
+    "eject_seconds": 30.0,
+    "health_check_interval": 15.0,  # ollama ps probe - refreshes resident models and reinstates backends
+}
+
+# 🗃️ RESPONSE CACHE (exact-match, low-temperature helper calls only)
+RESPONSE_CACHE_CONFIG = {
+    "enabled": True,
+    "max_temperature": 0.3,  # Calls hotter than this are never cached
+    "memory_entries": 512,
+    "disk_enabled": False,  # SQLite tier survives restarts (demos, classrooms)
+    "disk_path": "response_cache.db",
+    "ttl_seconds": 7 * 24 * 3600,
+}
+
+# 🧲 SEMANTIC CACHE (near-duplicate questions per agent)
+SEMANTIC_CACHE_CONFIG = {
+    "enabled": True,
+    "agents": ["education_offline", "education_personalized"],  # None = all agents
+    "similarity_threshold": 0.9,  # Cosine similarity needed to reuse an answer
+    "embedding_dim": 1024,  # Hashed word + character-trigram features
+    "max_entries_per_agent": 500,
+    "replay_words_per_chunk": 3,
+}
+
+# 🎓 AGENT INTENT CLASSIFIER (learned routing; keyword router below the confidence threshold)
+INTENT_CLASSIFIER_CONFIG = {
+    "enabled": True,
+    "weights_path": "agent_intent_weights.npy",  # float32 (hash_buckets + 1) x agents, mmap-loaded; metadata in .json
+    "hash_buckets": 32768,  # Word, word-bigram and character-trigram features hashed into this many rows
+    "confidence_threshold": 0.4,  # Needed to override a keyword hit (no hit = classifier decides); tuned with bench-router
+    "train_if_missing": True,  # Train in the background at startup when weights are missing or stale (keywords meanwhile)
+    "examples_path": "agent_routing_examples.jsonl",  # Hand-labeled user messages, always part of training
+    "epochs": 150,
+    "learning_rate": 0.5,
+    "l2": 1e-5,
+    "routing_log_path": "agent_routing_log.jsonl",  # {"message", "agent"} lines, extra training data
+    "log_selected_agents": False,  # Record messages sent with a hand-picked agent as labeled examples
+}
+
+# 📚 KNOWLEDGE RETRIEVAL (BM25 over the knowledge files - no embeddings or FAISS needed)
+WORLDVIEW_CONFIG = {
+    "enabled": True,  # Ground answers in intelligent_worldview.txt & co.
+    "index_dir": ".kb_index",  # Saved BM25 postings (.npy, mmap-loaded) + metadata per knowledge base
+    "top_k": 3,  # Chunks added to the prompt
+    "min_score": 2.0,  # Weaker BM25 matches are left out
+    "bm25_k1": 1.2,
+    "bm25_b": 0.75,
+    "reindex_interval": 10,  # Seconds between mtime checks of the knowledge files (0 = no background re-index)
+    "lazy_load": True,  # Read/index each knowledge base the first time an agent needs it (False = all at startup)
+}
+
+# 📖 KNOWLEDGE BASE REGISTRY (resolved once at startup into agent -> knowledge bases)
+# An entry claims agents by id ("agents") and/or by HACKATHON_AGENTS category ("categories");
+# "default" entries serve every agent nothing else claims, and back up the ones whose own file is missing.
+KNOWLEDGE_BASES = {
+    "worldview": {
+        "file": "intelligent_worldview.txt",
+        "agents": ["general", "mental_health", "accessibility_vision", "accessibility_hearing",
+                   "education_offline", "education_personalized", "wellness_coach", "parenting_guide",
+                   "relationship_counselor", "home_optimizer", "culinary_guide", "ethical_arbiter",
+                   "systems_thinker", "plant_disease_detector", "sustainability_guide", "crisis_response",
+                   "productivity_optimizer", "creative_collaborator", "multilingual_communicator"],
+        "default": True
+    },
+    "technical": {
+        "file": "technical_programming_knowledge.txt",
+        "agents": ["coding_mentor"]
+    },
+    # Domain corpora cost nothing until their agent is first asked something, e.g.:
+    # "plant_disease": {"file": "knowledge/plant_disease.txt", "agents": ["plant_disease_detector"]},
+    # "cooking": {"file": "knowledge/cooking.txt", "categories": ["cooking"]},
+    # "crisis": {"file": "knowledge/crisis_response.txt", "categories": ["crisis_response"]},
+}
+
+# 📏 PROMPT TOKEN BUDGET (main model prompt - prefill time grows with every token on CPU)
+PROMPT_BUDGET_CONFIG = {
+    "enabled": True,
+    "total_tokens": 3000,  # Whole prompt sent to the main model
+    "chars_per_token": 4.0,  # Rough estimate - no tokenizer needed offline
+    # Per-section caps in tokens; when the total is exceeded, the highest priority number is cut first.
+    # "keep" sections are never cut - a message too long for the budget is sent whole, with a warning
+    "sections": {
+        "agent_prompt": {"priority": 0, "max_tokens": 1200},
+        "user_message": {"priority": 0, "max_tokens": None, "keep": True},
+        "goals": {"priority": 1, "max_tokens": 700},
+        "image": {"priority": 2, "max_tokens": 500},
+        "knowledge": {"priority": 3, "max_tokens": 450},
+        "thinking": {"priority": 3, "max_tokens": 400},
+        "instructions": {"priority": 4, "max_tokens": 200},
+    },
+    "max_open_milestones": 4,  # Per goal, once completed milestones are already summarized
+    "max_routines": 3,  # Per goal, highest streak first
 }
 
 # 🎯 GOALS & PROACTIVE CONFIG
@@ -27,6 +184,16 @@ GOALS_CONFIG = {
     "max_active_goals": 10,
     "proactive_threshold": 0.7,  # When to trigger follow-ups
     "anti_agreeable_threshold": 0.8,  # When to interrupt spirals
+    "proactive_workers": 5,  # Concurrent proactive rounds + goal suggestions
+    "connection_pool_size": 4,  # Long-lived SQLite connections kept open (WAL mode)
+    "busy_timeout_ms": 5000,  # Wait this long for another writer instead of "database is locked"
+    "cache_goals": True,  # Reuse decoded goals until the goals version changes
+    "relevant_goals": 3,  # Goals put in the prompt per message
+    "relevance_weights": {"lexical": 0.55, "priority": 0.2, "recency": 0.15, "agent": 0.1},
+    "recency_half_life_days": 7.0,  # Routine/milestone activity this old counts half
+    "event_snapshot_every": 50,  # Snapshot a goal once this many events follow its last snapshot
+    "event_compaction_interval": 300,  # Seconds between background compaction passes (0 = off)
+    "event_retention_days": None,  # Drop snapshot-covered events older than this (None = keep full history)
 }
 
 # 📷 MULTIMODAL CONFIG
@@ -5,6 +5,8 @@ All functionality in one comprehensive system
 """
 
 import ollama
+import httpx
+import os
 import sqlite3
 import json
 import time
@@ -14,16 +16,31 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple, Any
 from dataclasses import dataclass, asdict
 import uuid
+import asyncio
+import hashlib
+import heapq
+import re
+import threading
+import socket
+import zlib
+from collections import OrderedDict, Counter
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 # import requests  # Removed for offmmaline-first approach
 from PIL import Image
 import cv2
 import numpy as np
 
 from config_agents import (
-    MODEL_CONFIG, PERFORMANCE_CONFIG, GOALS_CONFIG,
-    MULTIMODAL_CONFIG, HACKATHON_AGENTS, ANALYTICS_CONFIG
+    MODEL_CONFIG, PERFORMANCE_CONFIG, INFERENCE_CONFIG, SCHEDULER_CONFIG, RESIDENCY_CONFIG, BACKEND_CONFIG,
+    RESPONSE_CACHE_CONFIG, SEMANTIC_CACHE_CONFIG, PROMPT_BUDGET_CONFIG, GOALS_CONFIG,
+    MULTIMODAL_CONFIG, HACKATHON_AGENTS, ANALYTICS_CONFIG, INTENT_CLASSIFIER_CONFIG, WORLDVIEW_CONFIG,
+    KNOWLEDGE_BASES
 )
 
+# PERFORMANCE_CONFIG keys that configure the app rather than the Ollama runner
+APP_PERFORMANCE_KEYS = {"pipeline_mode"}
+
 # 🎯 DATA STRUCTURES
 @dataclass
 class Goal:
@@ -38,7 +55,7 @@ class Goal:
     completed_date: Optional[str]
     progress_percentage: int
     milestones: List[Dict]  # Enhanced with completion tracking
-    daily_routines: List[Dict]  # New: daily routines with checkmarks
+    daily_routines: List[Dict]  # New: daily routines (checkmark history: GoalsDatabase.get_checkmarks)
     related_agents: List[str]
     user_notes: str
     ai_suggestions: List[str]
@@ -110,50 +127,637 @@ class ConversationMemory:
             self.user_patterns = {"preferences": [], "goals_history": [], "interaction_style": ""}
 
 # 🗄️ GOALS SYSTEM
+class SQLiteConnectionPool:
+    """Small pool of long-lived SQLite connections (WAL journal, synchronous=NORMAL, busy timeout).
+    
+    Readers run concurrently with one writer; writes are serialized in-process so they queue here
+    instead of hitting "database is locked".
+    """
+    
+    _pools = {}
+    _pools_lock = threading.Lock()
+    
+    @classmethod
+    def for_path(cls, db_path: str, size: int = 4, busy_timeout_ms: int = 5000) -> "SQLiteConnectionPool":
+        """One shared pool per database file - every GoalsDatabase on the same file reuses it"""
+        key = os.path.abspath(db_path)
+        with cls._pools_lock:
+            if key not in cls._pools:
+                cls._pools[key] = cls(db_path, size, busy_timeout_ms)
+            return cls._pools[key]
+    
+    def __init__(self, db_path: str, size: int = 4, busy_timeout_ms: int = 5000):
+        self.db_path = db_path
+        self.size = size
+        self.busy_timeout_ms = busy_timeout_ms
+        self._idle = []
+        self._generation = 0  # Bumped by close_all so connections to a replaced file aren't reused
+        self._lock = threading.Lock()
+        self._write_lock = threading.RLock()
+        self.stats = {"opened": 0, "reused": 0, "closed": 0}
+    
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout_ms / 1000, check_same_thread=False,
+                               isolation_level=None, cached_statements=256)  # Statement cache = prepared once
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.row_factory = sqlite3.Row
+        self.stats["opened"] += 1
+        return conn
+    
+    @contextmanager
+    def connection(self):
+        """Borrow a connection (autocommit - use transaction() for writes)"""
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+            generation = self._generation
+            if conn is not None:
+                self.stats["reused"] += 1
+        if conn is None:
+            conn = self._open()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            with self._lock:
+                if generation == self._generation and len(self._idle) < self.size:
+                    self._idle.append(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()
+                self.stats["closed"] += 1
+    
+    @contextmanager
+    def transaction(self):
+        """Write transaction - commits on success, rolls back on error"""
+        with self._write_lock, self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+    
+    def close_all(self):
+        """Close idle connections; borrowed ones are closed when returned"""
+        with self._lock:
+            self._generation += 1
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+            self.stats["closed"] += 1
+
+
+# 🧱 GOALS SCHEMA MIGRATIONS
+# Each migration runs once, in order, and is recorded in schema_version. Steps are idempotent
+# (IF NOT EXISTS / column checks) so a half-migrated file from an older build upgrades cleanly.
+
+GOALS_TABLE_COLUMNS = """
+        id TEXT PRIMARY KEY,
+        title TEXT NOT NULL,
+        description TEXT,
+        category TEXT,
+        priority TEXT,
+        status TEXT,
+        target_date TEXT,
+        created_date TEXT,
+        completed_date TEXT,
+        progress_percentage INTEGER,
+        related_agents TEXT,
+        user_notes TEXT,
+        ai_suggestions TEXT
+"""
+
+# Milestones, routines and routine checkmarks get their own tables
+# so ticking a routine is a single-row insert instead of re-serializing the whole goal
+GOALS_CHILD_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS milestones (
+        goal_id TEXT NOT NULL REFERENCES goals(id) ON DELETE CASCADE,
+        id TEXT NOT NULL,
+        position INTEGER NOT NULL,
+        title TEXT,
+        description TEXT,
+        status TEXT,
+        target_date TEXT,
+        completed_date TEXT,
+        completion_timestamp TEXT,
+        progress_percentage INTEGER,
+        notes TEXT,
+        PRIMARY KEY (goal_id, id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS routines (
+        goal_id TEXT NOT NULL REFERENCES goals(id) ON DELETE CASCADE,
+        id TEXT NOT NULL,
+        position INTEGER NOT NULL,
+        title TEXT,
+        description TEXT,
+        frequency TEXT,
+        streak_count INTEGER DEFAULT 0,
+        longest_streak INTEGER DEFAULT 0,
+        last_completed TEXT,
+        is_active INTEGER DEFAULT 1,
+        PRIMARY KEY (goal_id, id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS checkmarks (
+        goal_id TEXT NOT NULL,
+        routine_id TEXT NOT NULL,
+        date TEXT NOT NULL,
+        timestamp TEXT NOT NULL,
+        FOREIGN KEY (goal_id, routine_id) REFERENCES routines(goal_id, id) ON DELETE CASCADE,
+        UNIQUE (goal_id, routine_id, timestamp)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_goals_status ON goals(status)",
+    "CREATE INDEX IF NOT EXISTS idx_milestones_goal_status ON milestones(goal_id, status)",
+    "CREATE INDEX IF NOT EXISTS idx_routines_goal ON routines(goal_id)",
+    "CREATE INDEX IF NOT EXISTS idx_checkmarks_routine_date ON checkmarks(goal_id, routine_id, date)",
+    "CREATE INDEX IF NOT EXISTS idx_checkmarks_date ON checkmarks(date)",
+]
+
+def _migrate_normalize_goals(conn):
+    """Move JSON milestones/routines/checkmarks out of the goals row into their own tables"""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(goals)")}
+    legacy_rows = []
+    if "milestones" in columns:
+        legacy_rows = conn.execute("SELECT id, milestones, daily_routines FROM goals").fetchall()
+        # Rebuild goals without the JSON columns before any child table references it
+        conn.execute("ALTER TABLE goals RENAME TO goals_legacy")
+        conn.execute(f"CREATE TABLE goals ({GOALS_TABLE_COLUMNS})")
+        conn.execute("""
+            INSERT INTO goals SELECT id, title, description, category, priority, status, target_date,
+                created_date, completed_date, progress_percentage, related_agents, user_notes, ai_suggestions
+            FROM goals_legacy
+        """)
+        conn.execute("DROP TABLE goals_legacy")
+    
+    for statement in GOALS_CHILD_TABLES:
+        conn.execute(statement)
+    
+    for goal_id, milestones_json, routines_json in legacy_rows:
+        for table, items_json in (("milestones", milestones_json), ("routines", routines_json)):
+            columns = GoalsDatabase.MILESTONE_COLUMNS if table == "milestones" else GoalsDatabase.ROUTINE_COLUMNS
+            seen = set()
+            for position, item in enumerate(json.loads(items_json or "[]")):
+                if not item.get("id") or item["id"] in seen:  # Old second-resolution ids could collide
+                    item["id"] = str(uuid.uuid4())
+                seen.add(item["id"])
+                conn.execute(f"INSERT INTO {table} (goal_id, position, {', '.join(columns)}) "
+                             f"VALUES (?, ?, {', '.join('?' * len(columns))})",
+                             (goal_id, position, *(item.get(column) for column in columns)))
+                for checkmark in item.get("checkmarks") or []:
+                    conn.execute("INSERT OR IGNORE INTO checkmarks (goal_id, routine_id, date, timestamp) "
+                                 "VALUES (?, ?, ?, ?)",
+                                 (goal_id, item["id"], checkmark.get("date"), checkmark.get("timestamp")))
+
+def _migrate_routine_stats(conn):
+    """Add the streak engine's aggregate columns, dedupe same-day check-ins and rebuild aggregates once"""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(routines)")}
+    if "last_check_date" not in columns:
+        conn.execute("ALTER TABLE routines ADD COLUMN last_check_date TEXT")
+    if "recent_days" not in columns:
+        conn.execute("ALTER TABLE routines ADD COLUMN recent_days TEXT DEFAULT '0'")
+    conn.execute("""
+        DELETE FROM checkmarks WHERE rowid NOT IN (
+            SELECT MIN(rowid) FROM checkmarks GROUP BY goal_id, routine_id, date)
+    """)
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_checkmarks_routine_day ON checkmarks(goal_id, routine_id, date)")
+    for goal_id, routine_id, frequency in conn.execute("SELECT goal_id, id, frequency FROM routines").fetchall():
+        RoutineStreakEngine.store(conn, goal_id, routine_id,
+                                  RoutineStreakEngine.rebuild(conn, goal_id, routine_id, frequency))
+
+# FTS row for one goal: its own text plus its milestone and routine titles
+GOALS_FTS_REFRESH = """
+    DELETE FROM goals_fts WHERE goal_id = {goal_id};
+    INSERT INTO goals_fts (goal_id, title, description, milestones, routines, user_notes, ai_suggestions)
+    SELECT g.id, g.title, g.description,
+        (SELECT group_concat(title, ' ') FROM milestones WHERE goal_id = g.id),
+        (SELECT group_concat(title, ' ') FROM routines WHERE goal_id = g.id),
+        g.user_notes, g.ai_suggestions
+    FROM goals g WHERE g.id = {goal_id};
+"""
+
+def _migrate_goals_search(conn):
+    """FTS5 table kept in sync by triggers (only on text columns - progress and check-ins don't touch it)"""
+    try:
+        conn.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS goals_fts USING fts5(
+                goal_id UNINDEXED, title, description, milestones, routines, user_notes, ai_suggestions,
+                tokenize = 'unicode61 remove_diacritics 2'
+            )
+        """)
+    except sqlite3.OperationalError as e:
+        print(f"⚠️ SQLite without FTS5 - goal search falls back to LIKE: {e}")
+        return
+    
+    triggers = [
+        ("goals_fts_goal_insert", "AFTER INSERT ON goals", GOALS_FTS_REFRESH.format(goal_id="NEW.id")),
+        ("goals_fts_goal_update", "AFTER UPDATE OF title, description, user_notes, ai_suggestions ON goals",
+         GOALS_FTS_REFRESH.format(goal_id="NEW.id")),
+        ("goals_fts_goal_delete", "AFTER DELETE ON goals", "DELETE FROM goals_fts WHERE goal_id = OLD.id;"),
+    ]
+    for table in ("milestones", "routines"):
+        triggers += [
+            (f"goals_fts_{table}_insert", f"AFTER INSERT ON {table}", GOALS_FTS_REFRESH.format(goal_id="NEW.goal_id")),
+            (f"goals_fts_{table}_update", f"AFTER UPDATE OF title ON {table}",
+             GOALS_FTS_REFRESH.format(goal_id="NEW.goal_id")),
+            (f"goals_fts_{table}_delete", f"AFTER DELETE ON {table}", GOALS_FTS_REFRESH.format(goal_id="OLD.goal_id")),
+        ]
+    for name, event, body in triggers:
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body} END")
+    
+    # Index what's already there
+    conn.execute("DELETE FROM goals_fts")
+    for (goal_id,) in conn.execute("SELECT id FROM goals").fetchall():
+        for statement in GOALS_FTS_REFRESH.format(goal_id="?").split(";"):
+            if statement.strip():
+                conn.execute(statement, (goal_id,))
+
+def _migrate_goal_events(conn):
+    """Append-only goal event log + snapshots; every existing goal starts from a snapshot of today's state"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS goal_events (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            goal_id TEXT NOT NULL,
+            type TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_goal_events_goal ON goal_events(goal_id, seq)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_goal_events_created ON goal_events(created_at)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS goal_snapshots (
+            goal_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            state TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            PRIMARY KEY (goal_id, seq)
+        )
+    """)
+    now = datetime.now().isoformat()
+    for (goal_id,) in conn.execute("SELECT id FROM goals").fetchall():
+        conn.execute("INSERT OR IGNORE INTO goal_snapshots VALUES (?, 0, ?, ?)",
+                     (goal_id, json.dumps(GoalEventLog.read_state(conn, goal_id)), now))
+
+# Change-log trigger: bump the goals version, then record it against the goal that changed.
+# An explicit upsert, not OR REPLACE - conflict clauses inside a trigger give way to the outer statement's
+GOALS_CHANGE_TRIGGER = """
+    CREATE TRIGGER IF NOT EXISTS {table}_{event_name}_logs_change AFTER {event} ON {table}
+    BEGIN
+        UPDATE goals_state SET version = version + 1 WHERE id = 1;
+        INSERT INTO goals_changes (goal_id, version) VALUES ({row}, (SELECT version FROM goals_state WHERE id = 1))
+        ON CONFLICT(goal_id) DO UPDATE SET version = excluded.version;
+    END
+"""
+
+def _change_trigger_row(table: str, event: str) -> Dict[str, str]:
+    return {"event_name": event.lower(),
+            "row": f"{'OLD' if event == 'DELETE' else 'NEW'}.{'id' if table == 'goals' else 'goal_id'}"}
+
+GOALS_MIGRATIONS = [
+    (1, "goals table (milestones and routines as JSON)", [
+        """
+        CREATE TABLE IF NOT EXISTS goals (
+            id TEXT PRIMARY KEY,
+            title TEXT NOT NULL,
+            description TEXT,
+            category TEXT,
+            priority TEXT,
+            status TEXT,
+            target_date TEXT,
+            created_date TEXT,
+            completed_date TEXT,
+            progress_percentage INTEGER,
+            milestones TEXT,
+            daily_routines TEXT,
+            related_agents TEXT,
+            user_notes TEXT,
+            ai_suggestions TEXT
+        )
+        """
+    ]),
+    (2, "milestone, routine and checkmark tables", _migrate_normalize_goals),
+    (3, "goals version counter maintained by triggers", [
+        "CREATE TABLE IF NOT EXISTS goals_state (id INTEGER PRIMARY KEY CHECK (id = 1), version INTEGER NOT NULL)",
+        "INSERT OR IGNORE INTO goals_state VALUES (1, 0)",
+    ] + [
+        # Every write to any goals table - from any path or process - bumps the version
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_{event.lower()}_bumps_version AFTER {event} ON {table}
+        BEGIN UPDATE goals_state SET version = version + 1 WHERE id = 1; END
+        """
+        for table in ("goals", "milestones", "routines", "checkmarks")
+        for event in ("INSERT", "UPDATE", "DELETE")
+    ]),
+    (4, "one check-in per routine per day + incremental streak aggregates", _migrate_routine_stats),
+    (5, "full-text search index over goals, milestones, routines and notes", _migrate_goals_search),
+    (6, "per-goal change log for incremental index maintenance", [
+        "CREATE TABLE IF NOT EXISTS goals_changes (goal_id TEXT PRIMARY KEY, version INTEGER NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS idx_goals_changes_version ON goals_changes(version)",
+    ] + [
+        # Replace the v3 triggers: bump the version and record which goal changed, in that order
+        statement
+        for table in ("goals", "milestones", "routines", "checkmarks")
+        for event in ("INSERT", "UPDATE", "DELETE")
+        for statement in (f"DROP TRIGGER IF EXISTS {table}_{event.lower()}_bumps_version",
+                          GOALS_CHANGE_TRIGGER.format(table=table, event=event, **_change_trigger_row(table, event)))
+    ]),
+    (7, "append-only goal event log with snapshots", _migrate_goal_events),
+    (8, "change-log triggers upsert instead of INSERT OR REPLACE", [
+        # A trigger fired by an upsert's UPDATE takes the outer statement's ABORT policy, so the v6
+        # triggers' OR REPLACE never happened and re-saving an existing goal failed
+        statement
+        for table in ("goals", "milestones", "routines", "checkmarks")
+        for event in ("INSERT", "UPDATE", "DELETE")
+        for statement in (f"DROP TRIGGER IF EXISTS {table}_{event.lower()}_logs_change",
+                          GOALS_CHANGE_TRIGGER.format(table=table, event=event, **_change_trigger_row(table, event)))
+    ]),
+]
+
+# 🔥 ROUTINE STREAK ENGINE
+class RoutineStreakEngine:
+    """Per-routine aggregates kept on the routines row and advanced in O(1) per check-in.
+    
+    State: current streak (in periods - days, or weeks for weekly routines), longest streak,
+    last check-in date and a 90-day bitmap of checked days (bit 0 = last check-in date).
+    """
+    
+    WINDOW_DAYS = 90
+    RATE_WINDOWS = (7, 30, 90)
+    
+    @staticmethod
+    def period_days(frequency: str) -> int:
+        return 7 if frequency == "weekly" else 1
+    
+    @classmethod
+    def _period(cls, day, frequency: str) -> int:
+        return (day.toordinal() - 1) // cls.period_days(frequency)  # Weeks run Monday-Sunday
+    
+    @classmethod
+    def check_in(cls, state: Dict, day, frequency: str = "daily") -> Optional[Dict]:
+        """New aggregates after a check-in on `day`; None if it isn't after the last check-in"""
+        last = state.get("last_check_date")
+        bits = int(state.get("recent_days") or "0", 16)
+        streak = state.get("streak_count") or 0
+        if last:
+            last_day = datetime.fromisoformat(last).date()
+            gap = (day - last_day).days
+            if gap <= 0:
+                return None
+            bits <<= gap
+            periods = cls._period(day, frequency) - cls._period(last_day, frequency)
+            if periods == 1:
+                streak += 1
+            elif periods > 1:
+                streak = 1
+        else:
+            streak = 1
+        return {
+            "streak_count": streak,
+            "longest_streak": max(state.get("longest_streak") or 0, streak),
+            "last_check_date": day.isoformat(),
+            "recent_days": format((bits | 1) & ((1 << cls.WINDOW_DAYS) - 1), "x")
+        }
+    
+    @classmethod
+    def summarize(cls, state: Dict, today, frequency: str = "daily") -> Dict:
+        """Read-time view: current streak (0 once a period is missed), longest, 7/30/90-day completion rates"""
+        last = state.get("last_check_date")
+        summary = {"current_streak": 0, "longest_streak": state.get("longest_streak") or 0,
+                   "checked_today": False, "completion_rates": {f"{n}d": 0.0 for n in cls.RATE_WINDOWS}}
+        if not last:
+            return summary
+        last_day = datetime.fromisoformat(last).date()
+        age = max((today - last_day).days, 0)
+        bits = (int(state.get("recent_days") or "0", 16) << age) & ((1 << cls.WINDOW_DAYS) - 1)
+        
+        if cls._period(today, frequency) - cls._period(last_day, frequency) <= 1:
+            summary["current_streak"] = state.get("streak_count") or 0
+        summary["checked_today"] = age == 0
+        period = cls.period_days(frequency)
+        for n in cls.RATE_WINDOWS:
+            buckets = max(n // period, 1)
+            done = sum(1 for b in range(buckets) if (bits >> (b * period)) & ((1 << period) - 1))
+            summary["completion_rates"][f"{n}d"] = round(done / buckets, 3)
+        return summary
+    
+    @classmethod
+    def rebuild(cls, conn, goal_id: str, routine_id: str, frequency: str) -> Dict:
+        """Aggregates from the full history - only for migrations and back-dated check-ins"""
+        state = {"streak_count": 0, "longest_streak": 0, "last_check_date": None, "recent_days": "0"}
+        for (day,) in conn.execute("""
+            SELECT DISTINCT date FROM checkmarks WHERE goal_id = ? AND routine_id = ? ORDER BY date
+        """, (goal_id, routine_id)):
+            state = cls.check_in(state, datetime.fromisoformat(day).date(), frequency) or state
+        return state
+    
+    @staticmethod
+    def store(conn, goal_id: str, routine_id: str, state: Dict):
+        conn.execute("""
+            UPDATE routines SET streak_count = ?, longest_streak = ?, last_check_date = ?, recent_days = ?
+            WHERE goal_id = ? AND id = ?
+        """, (state["streak_count"], state["longest_streak"], state["last_check_date"], state["recent_days"],
+              goal_id, routine_id))
+
+# 📜 GOAL EVENT LOG
+class GoalEventLog:
+    """Append-only history of small typed goal events, written in the same transaction as the change.
+    
+    The normalized tables stay the current read model; any past state of a goal is rebuilt from its
+    latest snapshot plus the events after it. Compaction writes a fresh snapshot once a goal has piled
+    up enough events, and can prune events a snapshot already covers.
+    """
+    
+    EVENT_TYPES = ("goal_created", "goal_saved", "goal_updated", "progress_changed", "status_changed",
+                   "milestone_added", "milestone_updated", "milestone_completed", "routine_added",
+                   "routine_checked")
+    ROUTINE_STATE_COLUMNS = ("last_check_date", "recent_days")
+    
+    @classmethod
+    def append(cls, conn, goal_id: str, event_type: str, payload: Dict = None) -> int:
+        """Record one event - call inside the write transaction that made the change"""
+        if event_type not in cls.EVENT_TYPES:
+            raise ValueError(f"Unknown goal event type: {event_type}")
+        return conn.execute("INSERT INTO goal_events (goal_id, type, payload, created_at) VALUES (?, ?, ?, ?)",
+                            (goal_id, event_type, json.dumps(payload or {}), datetime.now().isoformat())).lastrowid
+    
+    @classmethod
+    def read_state(cls, conn, goal_id: str) -> Optional[Dict]:
+        """Current state of one goal from the normalized tables, in snapshot form"""
+        row = conn.execute("SELECT * FROM goals WHERE id = ?", (goal_id,)).fetchone()
+        if row is None:
+            return None
+        state = {column: row[column] for column in GoalsDatabase.GOAL_COLUMNS}
+        for key in ("related_agents", "ai_suggestions"):
+            state[key] = json.loads(state[key] or "[]")
+        state["milestones"] = [
+            {column: milestone[column] for column in GoalsDatabase.MILESTONE_COLUMNS}
+            for milestone in conn.execute("SELECT * FROM milestones WHERE goal_id = ? ORDER BY position", (goal_id,))
+        ]
+        state["daily_routines"] = [
+            {column: routine[column] for column in GoalsDatabase.ROUTINE_COLUMNS + cls.ROUTINE_STATE_COLUMNS}
+            for routine in conn.execute("SELECT * FROM routines WHERE goal_id = ? ORDER BY position", (goal_id,))
+        ]
+        return state
+    
+    @staticmethod
+    def apply(state: Optional[Dict], event_type: str, payload: Dict) -> Optional[Dict]:
+        """Pure reducer: the goal state after one event"""
+        if event_type in ("goal_created", "goal_saved"):
+            return json.loads(json.dumps(payload))  # Full state - fresh copy
+        if state is None:
+            return None
+        if event_type in ("goal_updated", "progress_changed", "status_changed"):
+            state.update(payload)
+        elif event_type == "milestone_added":
+            state["milestones"].append(dict(payload))
+        elif event_type == "routine_added":
+            state["daily_routines"].append(dict(payload))
+        elif event_type in ("milestone_updated", "milestone_completed"):
+            fields = {key: value for key, value in payload.items() if key != "milestone_id"}
+            for milestone in state["milestones"]:
+                if milestone.get("id") == payload["milestone_id"]:
+                    milestone.update(fields)
+        elif event_type == "routine_checked":
+            # Payload carries the streak aggregates after the check-in, so replay needs no history
+            fields = {key: value for key, value in payload.items() if key not in ("routine_id", "date", "timestamp")}
+            for routine in state["daily_routines"]:
+                if routine.get("id") == payload["routine_id"]:
+                    routine.update(fields)
+                    routine["last_completed"] = max(routine.get("last_completed") or "", payload["timestamp"])
+        return state
+    
+    @classmethod
+    def replay(cls, conn, goal_id: str, until: str = None) -> Tuple[Optional[Dict], int, str]:
+        """(state, last applied seq, its timestamp) from the latest snapshot + the events after it.
+        
+        `until` (ISO timestamp) rebuilds the goal as it was at that moment.
+        """
+        bound = until or "9999"
+        snapshot = conn.execute("""
+            SELECT seq, state, created_at FROM goal_snapshots
+            WHERE goal_id = ? AND created_at <= ? ORDER BY seq DESC LIMIT 1
+        """, (goal_id, bound)).fetchone()
+        state, seq, at = (json.loads(snapshot["state"]), snapshot["seq"], snapshot["created_at"]) \
+            if snapshot else (None, 0, None)
+        for event in conn.execute("""
+            SELECT seq, type, payload, created_at FROM goal_events
+            WHERE goal_id = ? AND seq > ? AND created_at <= ? ORDER BY seq
+        """, (goal_id, seq, bound)):
+            state = cls.apply(state, event["type"], json.loads(event["payload"]))
+            seq, at = event["seq"], event["created_at"]
+        return state, seq, at
+    
+    @classmethod
+    def compact(cls, conn, min_events: int = 50, retention_days: Optional[int] = None) -> Dict:
+        """Snapshot every goal with at least `min_events` events since its last snapshot.
+        
+        With `retention_days`, events and superseded snapshots older than that are dropped once a
+        snapshot covers them - history before the window is no longer replayable.
+        """
+        due = conn.execute("""
+            SELECT e.goal_id, COUNT(*) AS pending FROM goal_events e
+            WHERE e.seq > COALESCE((SELECT MAX(s.seq) FROM goal_snapshots s WHERE s.goal_id = e.goal_id), 0)
+            GROUP BY e.goal_id HAVING COUNT(*) >= ?
+        """, (max(min_events, 1),)).fetchall()
+        snapshots = 0
+        for row in due:
+            state, seq, at = cls.replay(conn, row["goal_id"])
+            if state is not None:
+                conn.execute("INSERT OR REPLACE INTO goal_snapshots VALUES (?, ?, ?, ?)",
+                             (row["goal_id"], seq, json.dumps(state), at))
+                snapshots += 1
+        
+        pruned = 0
+        if retention_days:
+            cutoff = (datetime.now() - timedelta(days=retention_days)).isoformat()
+            pruned = conn.execute("""
+                DELETE FROM goal_events WHERE created_at < ? AND seq <= COALESCE(
+                    (SELECT MAX(s.seq) FROM goal_snapshots s WHERE s.goal_id = goal_events.goal_id), 0)
+            """, (cutoff,)).rowcount
+            conn.execute("""
+                DELETE FROM goal_snapshots WHERE created_at < ? AND seq < (
+                    SELECT MAX(s.seq) FROM goal_snapshots s WHERE s.goal_id = goal_snapshots.goal_id)
+            """, (cutoff,))
+        return {"snapshots": snapshots, "pruned_events": pruned}
+    
+    @staticmethod
+    def activity_series(conn, days: int = 30) -> Dict[str, Dict[str, int]]:
+        """Events per day and type over the last `days` days -> {date: {type: count}}"""
+        since = (datetime.now().date() - timedelta(days=days - 1)).isoformat()
+        series = {}
+        for row in conn.execute("""
+            SELECT substr(created_at, 1, 10) AS day, type, COUNT(*) AS count FROM goal_events
+            WHERE created_at >= ? GROUP BY day, type ORDER BY day
+        """, (since,)):
+            series.setdefault(row["day"], {})[row["type"]] = row["count"]
+        return series
+
 class GoalsDatabase:
+    _compactors = set()
+    _compactors_lock = threading.Lock()
+    
     def __init__(self, db_path: str = None):
         self.db_path = db_path or GOALS_CONFIG["database_path"]
+        self.pool = SQLiteConnectionPool.for_path(self.db_path, GOALS_CONFIG.get("connection_pool_size", 4),
+                                                  GOALS_CONFIG.get("busy_timeout_ms", 5000))
+        # Decoded goals per status, tagged with the goals version they were read at
+        self.cache_enabled = GOALS_CONFIG.get("cache_goals", True)
+        self._goals_cache = {}
+        self._cache_lock = threading.Lock()
+        self.cache_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+        self._stop_compaction = threading.Event()
         self.init_database()
     
     def init_database(self):
-        """Initialize the goals database"""
-        import os
-        
-        # Delete existing database to ensure clean schema
-        if os.path.exists(self.db_path):
-            os.remove(self.db_path)
-            print(f"🗑️ Deleted old database: {self.db_path}")
-        
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            CREATE TABLE goals (
-                id TEXT PRIMARY KEY,
-                title TEXT NOT NULL,
-                description TEXT,
-                category TEXT,
-                priority TEXT,
-                status TEXT,
-                target_date TEXT,
-                created_date TEXT,
-                completed_date TEXT,
-                progress_percentage INTEGER,
-                milestones TEXT,
-                daily_routines TEXT,
-                related_agents TEXT,
-                user_notes TEXT,
-                ai_suggestions TEXT
-            )
-        """)
-        
-        conn.commit()
-        conn.close()
+        """Bring the schema up to date - a version check when already current; sample goals on first run only"""
+        latest = GOALS_MIGRATIONS[-1][0]
+        with self.pool.connection() as conn:
+            if self._schema_version(conn) >= latest:
+                return
         
-        print(f"✅ Created fresh database with correct schema: {self.db_path}")
+        with self.pool.transaction() as conn:
+            # Re-read under the write lock - another process may have migrated meanwhile
+            current = self._schema_version(conn)
+            first_run = current == 0 and not conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'goals'").fetchone()
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    description TEXT,
+                    applied_at TEXT
+                )
+            """)
+            for version, description, step in GOALS_MIGRATIONS:
+                if version <= current:
+                    continue
+                if callable(step):
+                    step(conn)
+                else:
+                    for statement in step:
+                        conn.execute(statement)
+                conn.execute("INSERT INTO schema_version VALUES (?, ?, ?)",
+                             (version, description, datetime.now().isoformat()))
+                print(f"🧱 Goals database migrated to v{version}: {description}")
         
-        # Create sample goals if database is empty
-        self.create_sample_goals()
+        # Create sample goals for a brand-new database only
+        if first_run:
+            self.create_sample_goals()
+    
+    @staticmethod
+    def _schema_version(conn) -> int:
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'").fetchone():
+            return 0
+        return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
     
     def create_sample_goals(self):
         """Create professional sample goals with milestones and routines"""
@@ -437,80 +1041,776 @@ class GoalsDatabase:
         except Exception as e:
             print(f"❌ Error creating sample goals: {e}")
     
+    GOAL_COLUMNS = ("id", "title", "description", "category", "priority", "status", "target_date", "created_date",
+                    "completed_date", "progress_percentage", "related_agents", "user_notes", "ai_suggestions")
+    MILESTONE_COLUMNS = ("id", "title", "description", "status", "target_date", "completed_date",
+                         "completion_timestamp", "progress_percentage", "notes")
+    ROUTINE_COLUMNS = ("id", "title", "description", "frequency", "streak_count", "longest_streak",
+                       "last_completed", "is_active")
+    
     def save_goal(self, goal: Goal) -> bool:
-        """Save or update a goal"""
+        """Save or update a goal with its milestones and routines (existing checkmarks are kept)"""
+        return self.save_goals([goal])
+    
+    def save_goals(self, goals: List[Goal]) -> bool:
+        """Save several goals with their milestones and routines in one transaction - all or nothing"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                INSERT OR REPLACE INTO goals VALUES 
-                (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                goal.id, goal.title, goal.description, goal.category,
-                goal.priority, goal.status, goal.target_date,
-                goal.created_date, goal.completed_date, goal.progress_percentage,
-                json.dumps(goal.milestones), json.dumps(goal.daily_routines),
-                json.dumps(goal.related_agents), goal.user_notes, json.dumps(goal.ai_suggestions)
-            ))
-            
-            conn.commit()
-            conn.close()
+            with self.pool.transaction() as conn:
+                for goal in goals:
+                    self._write_goal(conn, goal)
             return True
         except Exception as e:
             print(f"Error saving goal: {e}")
             return False
     
+    def _write_goal(self, conn, goal: Goal):
+        existed = conn.execute("SELECT 1 FROM goals WHERE id = ?", (goal.id,)).fetchone() is not None
+        conn.execute("""
+            INSERT INTO goals VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET
+                title = excluded.title, description = excluded.description,
+                category = excluded.category, priority = excluded.priority,
+                status = excluded.status, target_date = excluded.target_date,
+                created_date = excluded.created_date, completed_date = excluded.completed_date,
+                progress_percentage = excluded.progress_percentage,
+                related_agents = excluded.related_agents, user_notes = excluded.user_notes,
+                ai_suggestions = excluded.ai_suggestions
+        """, (
+            goal.id, goal.title, goal.description, goal.category,
+            goal.priority, goal.status, goal.target_date,
+            goal.created_date, goal.completed_date, goal.progress_percentage,
+            json.dumps(goal.related_agents), goal.user_notes, json.dumps(goal.ai_suggestions)
+        ))
+        self._save_children(conn, "milestones", goal.id, goal.milestones, self.MILESTONE_COLUMNS)
+        self._save_children(conn, "routines", goal.id, goal.daily_routines, self.ROUTINE_COLUMNS)
+        
+        # Checkmarks carried on routine dicts (e.g. imported goals) - insert only what's new
+        conn.executemany(
+            "INSERT OR IGNORE INTO checkmarks (goal_id, routine_id, date, timestamp) VALUES (?, ?, ?, ?)",
+            [(goal.id, routine["id"], checkmark.get("date"), checkmark.get("timestamp"))
+             for routine in goal.daily_routines for checkmark in routine.get("checkmarks") or []]
+        )
+        GoalEventLog.append(conn, goal.id, "goal_saved" if existed else "goal_created",
+                            GoalEventLog.read_state(conn, goal.id))
+    
+    def _save_children(self, conn, table: str, goal_id: str, items: List[Dict], columns: Tuple[str, ...]):
+        """Upsert a goal's milestones/routines in list order and drop the ones no longer present"""
+        for item in items:
+            item.setdefault("id", str(uuid.uuid4()))
+        ids = [item["id"] for item in items]
+        conn.execute(f"DELETE FROM {table} WHERE goal_id = ? AND id NOT IN ({','.join('?' * len(ids))})",
+                     (goal_id, *ids))
+        assignments = ", ".join(f"{column} = excluded.{column}" for column in columns[1:])
+        conn.executemany(f"""
+            INSERT INTO {table} (goal_id, position, {', '.join(columns)})
+            VALUES (?, ?, {', '.join('?' * len(columns))})
+            ON CONFLICT(goal_id, id) DO UPDATE SET position = excluded.position, {assignments}
+        """, [(goal_id, position, *(item.get(column) for column in columns))
+              for position, item in enumerate(items)])
+    
+    def add_checkmark(self, goal_id: str, routine_id: str, date: str, timestamp: str,
+                      only_status: str = None) -> bool:
+        """Tick a routine for a day: one checkmark row + O(1) streak aggregates, independent of history length.
+        
+        Idempotent per day - a second check-in for the same date changes nothing and still returns True.
+        """
+        try:
+            with self.pool.transaction() as conn:
+                if not self._goal_has_status(conn, goal_id, only_status):
+                    return False
+                routine = conn.execute("""
+                    SELECT frequency, streak_count, longest_streak, last_check_date, recent_days
+                    FROM routines WHERE goal_id = ? AND id = ?
+                """, (goal_id, routine_id)).fetchone()
+                if routine is None:
+                    return False
+                inserted = conn.execute(
+                    "INSERT OR IGNORE INTO checkmarks (goal_id, routine_id, date, timestamp) VALUES (?, ?, ?, ?)",
+                    (goal_id, routine_id, date, timestamp)).rowcount
+                if not inserted:
+                    return True  # Already checked that day
+                
+                state = RoutineStreakEngine.check_in(dict(routine), datetime.fromisoformat(date).date(),
+                                                     routine["frequency"])
+                if state is None:  # Back-dated check-in - recount from history
+                    state = RoutineStreakEngine.rebuild(conn, goal_id, routine_id, routine["frequency"])
+                RoutineStreakEngine.store(conn, goal_id, routine_id, state)
+                conn.execute("""
+                    UPDATE routines SET last_completed = MAX(COALESCE(last_completed, ''), ?)
+                    WHERE goal_id = ? AND id = ?
+                """, (timestamp, goal_id, routine_id))
+                GoalEventLog.append(conn, goal_id, "routine_checked",
+                                    {"routine_id": routine_id, "date": date, "timestamp": timestamp, **state})
+            return True
+        except Exception as e:
+            print(f"Error adding checkmark: {e}")
+            return False
+    
+    def get_checkmarks(self, goal_id: str, routine_id: str) -> List[Dict]:
+        """Full check-in history of one routine (not loaded with the goal)"""
+        try:
+            with self.pool.connection() as conn:
+                rows = conn.execute("""
+                    SELECT date, timestamp FROM checkmarks WHERE goal_id = ? AND routine_id = ?
+                    ORDER BY timestamp
+                """, (goal_id, routine_id)).fetchall()
+            return [dict(row) for row in rows]
+        except Exception as e:
+            print(f"Error getting checkmarks: {e}")
+            return []
+    
     def get_goals_by_status(self, status: str) -> List[Goal]:
-        """Get goals by status"""
+        """Get goals by status (milestones and routines in one query each, checkmark history left out).
+        
+        Read-through cache: while the goals version is unchanged the decoded goals are reused.
+        The Goal objects are shared with the cache - change them through the write methods only.
+        """
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("SELECT * FROM goals WHERE status = ?", (status,))
-            rows = cursor.fetchall()
-            conn.close()
-            
-            goals = []
-            for row in rows:
-                goal = self._row_to_goal(row)
-                if goal is not None:
-                    goals.append(goal)
+            with self.pool.connection() as conn:
+                conn.execute("BEGIN")  # One snapshot for the version and the rows
+                # Streaks and completion rates are relative to today, so the day is part of the tag
+                version = (self._read_version(conn), datetime.now().date().isoformat())
+                with self._cache_lock:
+                    cached = self._goals_cache.get(status) if self.cache_enabled else None
+                    if cached and cached[0] == version:
+                        self.cache_stats["hits"] += 1
+                        return list(cached[1])
+                    self.cache_stats["misses"] += 1
+                    if cached:
+                        self.cache_stats["invalidations"] += 1
+                goals = self._load_goals(conn, "status = ?", (status,))
+                conn.execute("COMMIT")
             
-            return goals
+            if self.cache_enabled:
+                with self._cache_lock:
+                    self._goals_cache[status] = (version, goals)
+            return list(goals)
         except Exception as e:
             print(f"Error getting goals: {e}")
             return []
     
-    def _row_to_goal(self, row) -> Goal:
-        """Convert database row to Goal object with error handling"""
+    @staticmethod
+    def _read_version(conn) -> int:
+        return conn.execute("SELECT version FROM goals_state WHERE id = 1").fetchone()[0]
+    
+    def goals_version(self) -> int:
+        """Cheap token that changes on every goal write - key prompt/response caches on it"""
+        try:
+            with self.pool.connection() as conn:
+                return self._read_version(conn)
+        except Exception as e:
+            print(f"Error reading goals version: {e}")
+            return -1
+    
+    def get_changed_goal_ids(self, since_version: int) -> Tuple[int, List[str]]:
+        """(current goals version, ids of goals written after since_version) from one snapshot"""
+        with self.pool.connection() as conn:
+            conn.execute("BEGIN")
+            version = self._read_version(conn)
+            rows = conn.execute("SELECT goal_id FROM goals_changes WHERE version > ?", (since_version,)).fetchall()
+            conn.execute("COMMIT")
+        return version, [row["goal_id"] for row in rows]
+    
+    def get_cache_stats(self) -> Dict:
+        with self._cache_lock:
+            lookups = self.cache_stats["hits"] + self.cache_stats["misses"]
+            return {**self.cache_stats,
+                    "hit_rate": round(self.cache_stats["hits"] / lookups, 3) if lookups else 0.0,
+                    "cached_statuses": {status: version[0] for status, (version, _) in self._goals_cache.items()}}
+    
+    def get_goal_at(self, goal_id: str, at: str = None) -> Optional[Goal]:
+        """The goal as it was at `at` (ISO timestamp, default now), rebuilt from its snapshot + events"""
         try:
-            # Ensure we have enough columns
-            if len(row) < 15:
-                print(f"⚠️ Database row has {len(row)} columns, expected 15. Recreating database...")
-                self.init_database()  # Recreate with correct schema
+            with self.pool.connection() as conn:
+                state, _, _ = GoalEventLog.replay(conn, goal_id, at)
+            if state is None:
                 return None
-            
+            as_of = datetime.fromisoformat(at).date() if at else datetime.now().date()
+            routines = []
+            for routine in state["daily_routines"]:
+                stats = RoutineStreakEngine.summarize(routine, as_of, routine.get("frequency") or "daily")
+                routines.append({**{column: routine.get(column) for column in self.ROUTINE_COLUMNS},
+                                 "streak_count": stats["current_streak"], "checked_today": stats["checked_today"],
+                                 "completion_rates": stats["completion_rates"]})
+            return Goal(**{**{column: state[column] for column in self.GOAL_COLUMNS},
+                           "milestones": state["milestones"], "daily_routines": routines,
+                           "user_notes": state["user_notes"] or ""})
+        except Exception as e:
+            print(f"Error rebuilding goal: {e}")
+            return None
+    
+    def get_goal_history(self, goal_id: str, limit: int = 50) -> List[Dict]:
+        """Audit trail: the goal's most recent events, newest first"""
+        try:
+            with self.pool.connection() as conn:
+                rows = conn.execute("""
+                    SELECT seq, type, payload, created_at FROM goal_events
+                    WHERE goal_id = ? ORDER BY seq DESC LIMIT ?
+                """, (goal_id, limit)).fetchall()
+            return [{"seq": row["seq"], "type": row["type"], "payload": json.loads(row["payload"]),
+                     "created_at": row["created_at"]} for row in rows]
+        except Exception as e:
+            print(f"Error reading goal history: {e}")
+            return []
+    
+    def get_activity_series(self, days: int = 30) -> Dict[str, Dict[str, int]]:
+        """Goal events per day and type - one indexed GROUP BY, no goal decoding"""
+        try:
+            with self.pool.connection() as conn:
+                return GoalEventLog.activity_series(conn, days)
+        except Exception as e:
+            print(f"Error reading goal activity: {e}")
+            return {}
+    
+    def compact_events(self) -> Dict:
+        """Snapshot goals with many events since their last snapshot (and prune, if retention is set)"""
+        try:
+            with self.pool.transaction() as conn:
+                result = GoalEventLog.compact(conn, GOALS_CONFIG.get("event_snapshot_every", 50),
+                                              GOALS_CONFIG.get("event_retention_days"))
+            if result["snapshots"] or result["pruned_events"]:
+                print(f"📜 Goal events compacted: {result['snapshots']} snapshots, "
+                      f"{result['pruned_events']} events pruned")
+            return result
+        except Exception as e:
+            print(f"Error compacting goal events: {e}")
+            return {"snapshots": 0, "pruned_events": 0}
+    
+    def start_compaction(self):
+        """Background compaction loop - one per database file"""
+        interval = GOALS_CONFIG.get("event_compaction_interval", 300)
+        with GoalsDatabase._compactors_lock:
+            if not interval or self.pool in GoalsDatabase._compactors:
+                return
+            GoalsDatabase._compactors.add(self.pool)
+        
+        def compaction_loop():
+            while not self._stop_compaction.wait(interval):
+                self.compact_events()
+        threading.Thread(target=compaction_loop, name="goal-events-compaction", daemon=True).start()
+    
+    def get_goal(self, goal_id: str) -> Optional[Goal]:
+        """Primary-key lookup of one goal with its milestones and routines"""
+        try:
+            with self.pool.connection() as conn:
+                goals = self._load_goals(conn, "id = ?", (goal_id,))
+            return goals[0] if goals else None
+        except Exception as e:
+            print(f"Error getting goal: {e}")
+            return None
+    
+    def _load_goals(self, conn, where: str, params: Tuple) -> List[Goal]:
+        """Build Goal objects for the goals matching a WHERE clause"""
+        rows = conn.execute(f"SELECT * FROM goals WHERE {where}", params).fetchall()
+        milestones = conn.execute(f"""
+            SELECT * FROM milestones WHERE goal_id IN (SELECT id FROM goals WHERE {where})
+            ORDER BY goal_id, position
+        """, params).fetchall()
+        routines = conn.execute(f"""
+            SELECT * FROM routines WHERE goal_id IN (SELECT id FROM goals WHERE {where})
+            ORDER BY goal_id, position
+        """, params).fetchall()
+        
+        children = {}
+        for row in milestones:
+            children.setdefault(row["goal_id"], ([], []))[0].append(self._milestone_from_row(row))
+        for row in routines:
+            children.setdefault(row["goal_id"], ([], []))[1].append(self._routine_from_row(row))
+        
+        goals = []
+        for row in rows:
+            goal = self._row_to_goal(row, *children.get(row["id"], ([], [])))
+            if goal is not None:
+                goals.append(goal)
+        return goals
+    
+    @staticmethod
+    def _goal_has_status(conn, goal_id: str, status: Optional[str]) -> bool:
+        """True when the goal exists (and has the given status, if one is required)"""
+        row = conn.execute("SELECT status FROM goals WHERE id = ?", (goal_id,)).fetchone()
+        return row is not None and (status is None or row["status"] == status)
+    
+    def update_goal_fields(self, goal_id: str, only_status: str = None, **fields) -> bool:
+        """Update just the given columns of one goal, e.g. progress_percentage"""
+        if not fields:
+            return True  # Nothing to change
+        unknown = set(fields) - set(self.GOAL_COLUMNS[1:])
+        if unknown:
+            print(f"Error updating goal: unknown fields {sorted(unknown)}")
+            return False
+        event = dict(fields)
+        event_type = ("progress_changed" if "progress_percentage" in fields
+                      else "status_changed" if "status" in fields else "goal_updated")
+        for key in ("related_agents", "ai_suggestions"):
+            if key in fields:
+                fields[key] = json.dumps(fields[key])
+        try:
+            with self.pool.transaction() as conn:
+                if not self._goal_has_status(conn, goal_id, only_status):
+                    return False
+                assignments = ", ".join(f"{column} = ?" for column in fields)
+                conn.execute(f"UPDATE goals SET {assignments} WHERE id = ?", (*fields.values(), goal_id))
+                GoalEventLog.append(conn, goal_id, event_type, event)
+            return True
+        except Exception as e:
+            print(f"Error updating goal: {e}")
+            return False
+    
+    def add_milestone(self, goal_id: str, milestone: Dict, only_status: str = None) -> bool:
+        """Append one milestone row to a goal"""
+        return self._append_child("milestones", goal_id, milestone, self.MILESTONE_COLUMNS, only_status)
+    
+    def add_routine(self, goal_id: str, routine: Dict, only_status: str = None) -> bool:
+        """Append one routine row to a goal"""
+        return self._append_child("routines", goal_id, routine, self.ROUTINE_COLUMNS, only_status)
+    
+    def _append_child(self, table: str, goal_id: str, item: Dict, columns: Tuple[str, ...],
+                      only_status: str = None) -> bool:
+        item.setdefault("id", str(uuid.uuid4()))
+        try:
+            with self.pool.transaction() as conn:
+                if not self._goal_has_status(conn, goal_id, only_status):
+                    return False
+                conn.execute(f"""
+                    INSERT INTO {table} (goal_id, position, {', '.join(columns)})
+                    VALUES (?, (SELECT COALESCE(MAX(position), -1) + 1 FROM {table} WHERE goal_id = ?),
+                            {', '.join('?' * len(columns))})
+                """, (goal_id, goal_id, *(item.get(column) for column in columns)))
+                GoalEventLog.append(conn, goal_id, "milestone_added" if table == "milestones" else "routine_added",
+                                    {column: item.get(column) for column in columns})
+            return True
+        except Exception as e:
+            print(f"Error adding to {table}: {e}")
+            return False
+    
+    def update_milestone(self, goal_id: str, milestone_id: str, only_status: str = None, **fields) -> bool:
+        """Update just the given columns of one milestone"""
+        if not fields:
+            return True  # Nothing to change
+        unknown = set(fields) - set(self.MILESTONE_COLUMNS[1:])
+        if unknown:
+            print(f"Error updating milestone: unknown fields {sorted(unknown)}")
+            return False
+        try:
+            with self.pool.transaction() as conn:
+                if not self._goal_has_status(conn, goal_id, only_status):
+                    return False
+                assignments = ", ".join(f"{column} = ?" for column in fields)
+                updated = conn.execute(f"UPDATE milestones SET {assignments} WHERE goal_id = ? AND id = ?",
+                                       (*fields.values(), goal_id, milestone_id)).rowcount
+                if updated:
+                    GoalEventLog.append(conn, goal_id,
+                                        "milestone_completed" if fields.get("status") == "completed"
+                                        else "milestone_updated", {"milestone_id": milestone_id, **fields})
+            return updated > 0
+        except Exception as e:
+            print(f"Error updating milestone: {e}")
+            return False
+    
+    def search_goals(self, query: str, status: str = None, limit: int = 10) -> List[Tuple[Goal, float, str]]:
+        """Ranked full-text search (BM25, title weighted highest) -> [(goal, score, snippet)]"""
+        terms = [t for t in re.findall(r"\w+", query.lower()) if len(t) > 2 and t not in QUESTION_FILLER_WORDS]
+        if not terms:
+            return []
+        match = " OR ".join(f'"{term}"*' for term in dict.fromkeys(terms))
+        status_filter = "AND g.status = ?" if status else ""
+        params = (match, status, limit) if status else (match, limit)
+        try:
+            with self.pool.connection() as conn:
+                try:
+                    hits = conn.execute(f"""
+                        SELECT f.goal_id, bm25(goals_fts, 0, 10.0, 4.0, 6.0, 3.0, 2.0, 1.0) AS rank,
+                            snippet(goals_fts, -1, '**', '**', '…', 10) AS snippet
+                        FROM goals_fts f JOIN goals g ON g.id = f.goal_id
+                        WHERE goals_fts MATCH ? {status_filter}
+                        ORDER BY rank LIMIT ?
+                    """, params).fetchall()
+                except sqlite3.OperationalError:
+                    # No FTS5 in this SQLite build - plain substring match on the goal row
+                    like = " OR ".join("(g.title LIKE ? OR g.description LIKE ? OR g.user_notes LIKE ?)" for _ in terms)
+                    hits = conn.execute(f"""
+                        SELECT g.id AS goal_id, 0.0 AS rank, g.title AS snippet FROM goals g
+                        WHERE ({like}) {status_filter} LIMIT ?
+                    """, (*[f"%{t}%" for t in terms for _ in range(3)], *params[1:])).fetchall()
+                if not hits:
+                    return []
+                ids = [hit["goal_id"] for hit in hits]
+                goals = {goal.id: goal for goal in
+                         self._load_goals(conn, f"id IN ({','.join('?' * len(ids))})", tuple(ids))}
+            # bm25() is lower-is-better; flip it so callers get higher-is-better scores
+            return [(goals[hit["goal_id"]], round(-hit["rank"], 4), hit["snippet"])
+                    for hit in hits if hit["goal_id"] in goals]
+        except Exception as e:
+            print(f"Error searching goals: {e}")
+            return []
+    
+    def _milestone_from_row(self, row) -> Dict:
+        return {column: row[column] for column in self.MILESTONE_COLUMNS}
+    
+    def _routine_from_row(self, row) -> Dict:
+        routine = {column: row[column] for column in self.ROUTINE_COLUMNS}
+        routine["is_active"] = bool(routine["is_active"])
+        
+        # Precomputed streak stats as of today (streak_count drops to 0 once a day/week is missed)
+        stats = RoutineStreakEngine.summarize(dict(row), datetime.now().date(), row["frequency"])
+        routine["streak_count"] = stats["current_streak"]
+        routine["checked_today"] = stats["checked_today"]
+        routine["completion_rates"] = stats["completion_rates"]
+        return routine
+    
+    def _row_to_goal(self, row, milestones: List[Dict] = None, daily_routines: List[Dict] = None) -> Goal:
+        """Convert database row to Goal object with error handling"""
+        try:
             return Goal(
-                id=row[0], title=row[1], description=row[2], category=row[3],
-                priority=row[4], status=row[5], target_date=row[6],
-                created_date=row[7], completed_date=row[8], progress_percentage=row[9],
-                milestones=json.loads(row[10] or "[]"),
-                daily_routines=json.loads(row[11] or "[]"),
-                related_agents=json.loads(row[12] or "[]"),
-                user_notes=row[13] or "", ai_suggestions=json.loads(row[14] or "[]")
+                id=row["id"], title=row["title"], description=row["description"], category=row["category"],
+                priority=row["priority"], status=row["status"], target_date=row["target_date"],
+                created_date=row["created_date"], completed_date=row["completed_date"],
+                progress_percentage=row["progress_percentage"],
+                milestones=milestones or [],
+                daily_routines=daily_routines or [],
+                related_agents=json.loads(row["related_agents"] or "[]"),
+                user_notes=row["user_notes"] or "", ai_suggestions=json.loads(row["ai_suggestions"] or "[]")
             )
         except Exception as e:
             print(f"❌ Error converting database row to Goal: {e}")
-            print(f"Row data: {row}")
+            print(f"Row data: {tuple(row)}")
+            return None
+
+# 🧭 GOAL RELEVANCE INDEX
+class GoalRelevanceIndex:
+    """Ranks active goals against the current message: lexical overlap over per-goal term vectors,
+    priority, recency of routine/milestone activity and agent affinity.
+    
+    Postings and vectors are built once, then patched per goal from the goals change log,
+    so a query touches only the goals that share a term with the message.
+    """
+    
+    PRIORITY_SCORES = {"high": 1.0, "medium": 0.6, "low": 0.3}
+    
+    def __init__(self, goals_db: "GoalsDatabase", config: Dict = None):
+        self.db = goals_db
+        self.config = config or GOALS_CONFIG
+        self.weights = self.config.get("relevance_weights",
+                                       {"lexical": 0.55, "priority": 0.2, "recency": 0.15, "agent": 0.1})
+        self.half_life_days = self.config.get("recency_half_life_days", 7.0)
+        self.version = None
+        self.goals = {}  # goal_id -> Goal
+        self.vectors = {}  # goal_id -> {term: L2-normalized weight}
+        self.postings = {}  # term -> set of goal ids
+        self.by_agent = {}  # agent id / category -> set of goal ids
+        self.activity = {}  # goal_id -> last activity timestamp
+        self.static_order = []  # goal ids by priority, then most recent activity
+        self._lock = threading.Lock()
+        self.stats = {"full_builds": 0, "syncs": 0, "goals_reindexed": 0, "queries": 0}
+    
+    @staticmethod
+    def terms(text: str) -> List[str]:
+        """Lower-cased content words with a naive plural strip"""
+        words = []
+        for word in re.findall(r"[a-z0-9]+", (text or "").lower()):
+            if len(word) < 3 or word in QUESTION_FILLER_WORDS:
+                continue
+            if len(word) > 4 and word.endswith("s") and not word.endswith("ss"):
+                word = word[:-1]
+            words.append(word)
+        return words
+    
+    def _vector(self, goal: Goal) -> Dict[str, float]:
+        weights = Counter()
+        for term in self.terms(goal.title):
+            weights[term] += 3.0
+        for text in [goal.description, goal.user_notes] + [m.get("title", "") for m in goal.milestones] \
+                + [r.get("title", "") for r in goal.daily_routines]:
+            for term in self.terms(text):
+                weights[term] += 1.0
+        norm = sum(w * w for w in weights.values()) ** 0.5 or 1.0
+        return {term: w / norm for term, w in weights.items()}
+    
+    @staticmethod
+    def _last_activity(goal: Goal) -> float:
+        stamps = [goal.created_date] + [r.get("last_completed") for r in goal.daily_routines] \
+            + [m.get("completion_timestamp") for m in goal.milestones]
+        latest = 0.0
+        for stamp in stamps:
+            try:
+                latest = max(latest, datetime.fromisoformat(stamp).timestamp())
+            except (TypeError, ValueError):
+                continue
+        return latest
+    
+    def _add(self, goal: Goal):
+        self.goals[goal.id] = goal
+        self.vectors[goal.id] = self._vector(goal)
+        self.activity[goal.id] = self._last_activity(goal)
+        for term in self.vectors[goal.id]:
+            self.postings.setdefault(term, set()).add(goal.id)
+        for key in set(goal.related_agents) | {goal.category}:
+            self.by_agent.setdefault(key, set()).add(goal.id)
+    
+    def _remove(self, goal_id: str):
+        goal = self.goals.pop(goal_id, None)
+        if goal is None:
+            return
+        for term in self.vectors.pop(goal_id, {}):
+            self.postings[term].discard(goal_id)
+            if not self.postings[term]:
+                del self.postings[term]
+        for key in set(goal.related_agents) | {goal.category}:
+            self.by_agent.get(key, set()).discard(goal_id)
+        self.activity.pop(goal_id, None)
+    
+    def _reorder(self):
+        self.static_order = sorted(self.goals, key=lambda gid: (
+            self.PRIORITY_SCORES.get(self.goals[gid].priority, 0.3), self.activity[gid]), reverse=True)
+    
+    def sync(self):
+        """Apply goal writes since the last sync (full build the first time)"""
+        with self._lock:
+            if self.version is None:
+                self.version = self.db.goals_version()  # Read first - later writes show up in the change log
+                for goal in self.db.get_goals_by_status("active"):
+                    self._add(goal)
+                self.stats["full_builds"] += 1
+                self._reorder()
+                return
+            
+            version, changed = self.db.get_changed_goal_ids(self.version)
+            if version == self.version:
+                return
+            for goal_id in changed:
+                self._remove(goal_id)
+                goal = self.db.get_goal(goal_id)
+                if goal is not None and goal.status == "active":
+                    self._add(goal)
+            self.version = version
+            self.stats["syncs"] += 1
+            self.stats["goals_reindexed"] += len(changed)
+            self._reorder()
+    
+    def rank(self, message: str, agent_type: str, k: int = 3) -> List[Tuple[Goal, float]]:
+        """Top-k (goal, score). Candidates are goals sharing a term with the message plus the agent's goals;
+        the general agent tops up with the highest-priority, most recently active goals."""
+        self.sync()
+        with self._lock:
+            self.stats["queries"] += 1
+            query = Counter(self.terms(message))
+            lexical = Counter()
+            total = len(self.goals) or 1
+            for term, count in query.items():
+                posting = self.postings.get(term)
+                if not posting:
+                    continue
+                idf = float(np.log(1.0 + total / len(posting)))
+                for goal_id in posting:
+                    lexical[goal_id] += count * self.vectors[goal_id][term] * idf
+            
+            affine = self.by_agent.get(agent_type, set())
+            candidates = set(lexical) | affine
+            best_lexical = max(lexical.values(), default=0.0) or 1.0
+            now = time.time()
+            
+            def score(goal_id: str) -> float:
+                goal = self.goals[goal_id]
+                age_days = max(now - self.activity[goal_id], 0.0) / 86400
+                return (self.weights["lexical"] * lexical.get(goal_id, 0.0) / best_lexical
+                        + self.weights["priority"] * self.PRIORITY_SCORES.get(goal.priority, 0.3)
+                        + self.weights["recency"] * 0.5 ** (age_days / self.half_life_days)
+                        + self.weights["agent"] * (goal_id in affine))
+            
+            ranked = heapq.nlargest(k, ((score(goal_id), goal_id) for goal_id in candidates))
+            if agent_type == "general" and len(ranked) < k:
+                chosen = {goal_id for _, goal_id in ranked}
+                for goal_id in self.static_order:
+                    if len(ranked) >= k:
+                        break
+                    if goal_id not in chosen:
+                        ranked.append((score(goal_id), goal_id))
+            return [(self.goals[goal_id], round(value, 4)) for value, goal_id in ranked]
+    
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {**self.stats, "goals": len(self.goals), "terms": len(self.postings), "version": self.version}
+
+# 📚 BM25 KNOWLEDGE INDEX
+KNOWLEDGE_STOPWORDS = {"a", "an", "the", "and", "or", "of", "to", "in", "on", "for", "with", "by", "at", "from", "as",
+                       "is", "are", "was", "be", "it", "its", "this", "that", "these", "those", "i", "me", "my",
+                       "you", "your", "we", "our", "do", "does", "can", "how", "what", "why", "about", "into"}
+
+class BM25Index:
+    """Okapi BM25 over knowledge chunks, NumPy only.
+    
+    Postings are CSR arrays (term offsets into parallel chunk-id / term-count / impact arrays) with each
+    posting's BM25 contribution precomputed, so a query is one bincount over the postings of its terms.
+    Saved as .npy files and reopened with mmap; the JSON metadata is written last and names the
+    generation of array files it belongs to, so a half-written save is never loaded.
+    """
+    
+    FORMAT_VERSION = 2
+    
+    def __init__(self, chunks: List[str], vocabulary: List[str], offsets: np.ndarray, chunk_ids: np.ndarray,
+                 frequencies: np.ndarray, impacts: np.ndarray):
+        self.chunks = chunks
+        self.term_ids = {term: i for i, term in enumerate(vocabulary)}
+        self.offsets = offsets
+        self.chunk_ids = chunk_ids
+        self.frequencies = frequencies  # Raw term counts - let the next build skip unchanged chunks
+        self.impacts = impacts
+        self.build_stats = {}
+    
+    @staticmethod
+    def tokenize(text: str) -> List[str]:
+        return [token for token in re.findall(r"\w+", text.lower())
+                if len(token) > 1 and token not in KNOWLEDGE_STOPWORDS]
+    
+    @classmethod
+    def fingerprint(cls, chunks: List[str], k1: float, b: float) -> str:
+        """Changes when the chunks or scoring parameters change - a saved index is then rebuilt"""
+        digest = hashlib.sha1(f"{cls.FORMAT_VERSION}|{k1}|{b}".encode("utf-8"))
+        for chunk in chunks:
+            digest.update(b"\x00" + chunk.encode("utf-8"))
+        return digest.hexdigest()[:16]
+    
+    @classmethod
+    def build(cls, chunks: List[str], k1: float = 1.2, b: float = 0.75,
+              previous: "BM25Index" = None) -> "BM25Index":
+        """Index chunks; chunks `previous` already holds reuse its term counts, so only new text is tokenized.
+        
+        Term statistics (idf, average length) are global, so the impacts are always recomputed -
+        a vectorized pass over the postings.
+        """
+        terms, chunk_ids, frequencies = [], [], []
+        fresh = list(range(len(chunks)))
+        if previous is not None and len(previous.chunk_ids):
+            old_ids = {}
+            for old_id, chunk in enumerate(previous.chunks):
+                old_ids.setdefault(chunk, []).append(old_id)
+            old_to_new = np.full(len(previous.chunks), -1, dtype=np.int64)
+            fresh = []
+            for new_id, chunk in enumerate(chunks):
+                if old_ids.get(chunk):
+                    old_to_new[old_ids[chunk].pop()] = new_id
+                else:
+                    fresh.append(new_id)
+            vocabulary = np.array(sorted(previous.term_ids, key=previous.term_ids.get), dtype=object)
+            new_ids = old_to_new[np.asarray(previous.chunk_ids)]
+            keep = new_ids >= 0
+            terms.append(vocabulary[np.repeat(np.arange(len(vocabulary)), np.diff(previous.offsets))[keep]])
+            chunk_ids.append(new_ids[keep])
+            frequencies.append(np.asarray(previous.frequencies)[keep])
+        
+        for chunk_id in fresh:
+            counts = Counter(cls.tokenize(chunks[chunk_id]))
+            terms.append(np.array(list(counts), dtype=object))
+            chunk_ids.append(np.full(len(counts), chunk_id, dtype=np.int64))
+            frequencies.append(np.fromiter(counts.values(), dtype=np.int32, count=len(counts)))
+        
+        terms = np.concatenate(terms) if terms else np.array([], dtype=object)
+        chunk_ids = np.concatenate(chunk_ids).astype(np.int32) if chunk_ids else np.array([], dtype=np.int32)
+        frequencies = np.concatenate(frequencies).astype(np.int32) if frequencies else np.array([], dtype=np.int32)
+        vocabulary, term_ids = np.unique(terms, return_inverse=True) if len(terms) else ([], np.array([], dtype=np.int64))
+        order = np.lexsort((chunk_ids, term_ids))
+        term_ids, chunk_ids, frequencies = term_ids[order], chunk_ids[order], frequencies[order]
+        
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(term_ids, minlength=len(vocabulary)))
+        lengths = np.bincount(chunk_ids, weights=frequencies, minlength=len(chunks))
+        average_length = lengths.mean() if len(lengths) and lengths.sum() else 1.0
+        document_frequency = np.diff(offsets)
+        idf = np.log(1 + (len(chunks) - document_frequency + 0.5) / (document_frequency + 0.5))
+        norm = k1 * (1 - b + b * lengths[chunk_ids] / average_length)
+        impacts = (idf[term_ids] * frequencies * (k1 + 1) / (frequencies + norm)).astype(np.float32)
+        
+        index = cls(chunks, list(vocabulary), offsets, chunk_ids, frequencies, impacts)
+        index.build_stats = {"chunks": len(chunks), "tokenized": len(fresh), "reused": len(chunks) - len(fresh)}
+        return index
+    
+    def search(self, query: str, top_k: int = 3, min_score: float = 0.0) -> List[Tuple[int, float]]:
+        """[(chunk id, score)] best first"""
+        term_ids = {self.term_ids[term] for term in self.tokenize(query) if term in self.term_ids}
+        if not term_ids or not self.chunks:
+            return []
+        spans = [(self.offsets[term_id], self.offsets[term_id + 1]) for term_id in term_ids]
+        scores = np.bincount(np.concatenate([self.chunk_ids[start:end] for start, end in spans]),
+                             weights=np.concatenate([self.impacts[start:end] for start, end in spans]),
+                             minlength=len(self.chunks))
+        k = min(top_k, int(np.count_nonzero(scores)))
+        if k <= 0:
+            return []
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(int(chunk_id), float(scores[chunk_id])) for chunk_id in best if scores[chunk_id] >= min_score]
+    
+    # Persistence
+    ARRAYS = ("offsets", "chunk_ids", "frequencies", "impacts")
+    
+    def save(self, directory: str, name: str, source_hash: str):
+        os.makedirs(directory, exist_ok=True)
+        for array_name in self.ARRAYS:
+            path = os.path.join(directory, f"{name}.{source_hash}.{array_name}.npy")
+            with open(path + ".tmp", "wb") as f:
+                np.save(f, np.ascontiguousarray(getattr(self, array_name)))
+            os.replace(path + ".tmp", path)
+        meta_path = os.path.join(directory, f"{name}.json")
+        vocabulary = sorted(self.term_ids, key=self.term_ids.get)
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"format": self.FORMAT_VERSION, "source_hash": source_hash, "vocabulary": vocabulary,
+                       "chunks": self.chunks, "built_at": datetime.now().isoformat()}, f)
+        os.replace(meta_path + ".tmp", meta_path)  # The switch to the new generation
+        
+        for stale in os.listdir(directory):  # Array files of older generations
+            if stale.startswith(f"{name}.") and stale.endswith(".npy") and f".{source_hash}." not in stale:
+                try:
+                    os.remove(os.path.join(directory, stale))
+                except OSError:
+                    pass
+    
+    @classmethod
+    def load(cls, directory: str, name: str, source_hash: str = None) -> Optional["BM25Index"]:
+        """mmap a saved index; None when missing, corrupt or built from other chunks"""
+        try:
+            with open(os.path.join(directory, f"{name}.json"), encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("format") != cls.FORMAT_VERSION or (source_hash and meta["source_hash"] != source_hash):
+                return None
+            arrays = {array_name: np.load(os.path.join(directory, f"{name}.{meta['source_hash']}.{array_name}.npy"),
+                                          mmap_mode="r")
+                      for array_name in cls.ARRAYS}
+            return cls(meta["chunks"], meta["vocabulary"], **arrays)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"⚠️ Could not load knowledge index {name}: {e}")
             return None
 
 # 🧠 AGI-TIER VECTOR WORLDVIEW SYSTEM
 class VectorWorldviewSystem:
-    def __init__(self):
+    def __init__(self, config: Dict = None, registry: Dict = None):
         # Always use offline-first approach - no internet dependencies
-        print("🧠 Offline-first Vector Worldview System initialized!")
-        self.fallback_to_basic()
+        self.config = config or WORLDVIEW_CONFIG
+        self.index_dir = self.config.get("index_dir", ".kb_index")
+        self.registry = registry or KNOWLEDGE_BASES
+        self.default_knowledge = [kb_type for kb_type, spec in self.registry.items() if spec.get("default")]
+        self.agent_knowledge = self.resolve_agent_knowledge(HACKATHON_AGENTS)  # agent -> candidate KBs, in order
+        self.indices = {}
+        self.knowledge_bases = {}
+        self.knowledge_chunks = []
+        self.manifest = self._load_manifest()  # file -> mtime, size, content hash, chunk hashes, index hash
+        self._missing = set()  # Registered KBs whose file isn't there (re-checked by refresh)
+        self._saved_indices = {}  # Indices reused as-is because their file is unchanged
+        self._embedding_cache = {}  # chunk hash -> embedding (create_vector_index)
+        self._index_lock = threading.RLock()
+        self._stop_watching = threading.Event()
+        self._watch_thread = None
+        if not self.config.get("lazy_load", True):
+            try:
+                self.load_knowledge_base()
+            except Exception as e:
+                print(f"❌ Error building knowledge indices: {e}")
+            if not self.indices:
+                self.fallback_to_basic()
+        self.start_watching()
+        print(f"🧠 Offline-first Vector Worldview System initialized! "
+              f"({len(self.registry)} knowledge bases for {len(self.agent_knowledge)} agents)")
     
     def fallback_to_basic(self):
         """Fallback to basic keyword matching if vector search unavailable"""
@@ -518,258 +1818,1487 @@ class VectorWorldviewSystem:
         self.worldview_content = ""
         self.load_basic_worldview()
     
+    def resolve_agent_knowledge(self, agents: Dict[str, Dict]) -> Dict[str, List[str]]:
+        """Agent -> knowledge bases that claim it (by id or category; dedicated ones first), then the defaults"""
+        agent_ids = list(agents) + [agent_id for spec in self.registry.values()
+                                    for agent_id in spec.get("agents", []) if agent_id not in agents]
+        mapping = {}
+        for agent_id in dict.fromkeys(agent_ids):
+            category = agents.get(agent_id, {}).get("category")
+            claimed = [kb_type for kb_type, spec in self.registry.items()
+                       if agent_id in spec.get("agents", []) or category in spec.get("categories", [])]
+            claimed.sort(key=lambda kb_type: bool(self.registry[kb_type].get("default")))
+            mapping[agent_id] = claimed + [kb_type for kb_type in self.default_knowledge if kb_type not in claimed]
+        return mapping
+    
     def load_knowledge_base(self):
-        """Load separate knowledge bases for different agent types"""
-        self.knowledge_bases = {}
+        """Load every registered knowledge base now (otherwise each one loads the first time an agent needs it)"""
+        self._missing.clear()
+        for kb_type in self.registry:
+            self.ensure_loaded(kb_type)
         
-        # Define knowledge files for different agent categories
-        knowledge_mapping = {
-            "worldview": {
-                "file": "intelligent_worldview.txt",
-                "agents": ["general", "mental_health", "accessibility_vision", "accessibility_hearing", 
-                          "education_offline", "education_personalized", "wellness_coach", "parenting_guide", 
-                          "relationship_counselor", "home_optimizer", "culinary_guide", "ethical_arbiter", 
-                          "systems_thinker", "plant_disease_detector", "sustainability_guide", "crisis_response",
-                          "productivity_optimizer", "creative_collaborator", "multilingual_communicator"]
-            },
-            "technical": {
-                "file": "technical_programming_knowledge.txt", 
-                "agents": ["coding_mentor"]
-            }
-        }
-        
-        for kb_type, config in knowledge_mapping.items():
-            try:
-                with open(config["file"], "r", encoding="utf-8") as f:
-                    content = f.read()
-                    print(f"✅ Loaded {config['file']}: {len(content)} characters")
-                    
-                    # Split into semantic chunks
-                    chunks = []
-                    sections = content.split('\n## ')
-                    for section in sections:
-                        if len(section.strip()) < 50:
-                            continue
-                        paragraphs = section.split('\n\n')
-                        for para in paragraphs:
-                            para = para.strip()
-                            if len(para) > 100:
-                                chunks.append(para)
-                    
-                    self.knowledge_bases[kb_type] = {
-                        "chunks": chunks,
-                        "agents": config["agents"],
-                        "file": config["file"]
-                    }
-                    
-                    print(f"📚 {kb_type.upper()}: {len(chunks)} chunks for {len(config['agents'])} agent types")
-                    
-            except FileNotFoundError:
-                print(f"⚠️ {config['file']} not found - skipping {kb_type}")
+        if not self.knowledge_bases:
+            print("⚠️ No knowledge files found - creating basic version")
+            self.create_basic_worldview()
+            return
+            
+        print(f"🧠 TOTAL: {len(self.knowledge_chunks)} chunks from {len(self.knowledge_bases)} knowledge bases")
+    
+    def ensure_loaded(self, kb_type: str) -> Optional[Dict]:
+        """The knowledge base's index entry, reading/indexing its file on first use; None if unavailable"""
+        entry = self.indices.get(kb_type)
+        if entry is not None or kb_type in self._missing:
+            return entry
+        with self._index_lock:
+            if kb_type in self.indices or kb_type in self._missing:
+                return self.indices.get(kb_type)
+            spec = self.registry.get(kb_type)
+            chunks = self._read_chunks(kb_type, spec["file"]) if spec else None
+            if not chunks:
+                if spec and chunks is None:
+                    print(f"⚠️ {spec['file']} not found - skipping {kb_type}")
+                self._missing.add(kb_type)
+                return None
+            
+            source_hash = self._index_hash(chunks)
+            index = self._saved_indices.pop(kb_type, None) or BM25Index.load(self.index_dir, kb_type, source_hash)
+            if index is None:
+                # Any older saved generation still spares re-tokenizing the chunks it shares
+                index = self._build_index(kb_type, chunks, BM25Index.load(self.index_dir, kb_type))
+            else:
+                print(f"  📚 {kb_type.upper()}: BM25 index loaded ({len(index.term_ids)} terms)")
+            if spec["file"] in self.manifest:
+                self.manifest[spec["file"]]["source_hash"] = source_hash
+                self._save_manifest()
+            
+            agents = [agent_id for agent_id, kb_types in self.agent_knowledge.items() if kb_type in kb_types]
+            self._install(kb_type, {"bm25": index, "chunks": index.chunks, "agents": agents, "file": spec["file"]})
+            print(f"📚 {kb_type.upper()}: {len(chunks)} chunks for {len(agents)} agent types")
+            return self.indices[kb_type]
+    
+    def _install(self, kb_type: str, entry: Dict):
+        """Publish a knowledge base entry with one assignment - searches in flight keep the dict they started with"""
+        self.indices = {**self.indices, kb_type: entry}
+        self.knowledge_bases = {**self.knowledge_bases,
+                                kb_type: {"chunks": entry["chunks"], "agents": entry["agents"], "file": entry["file"]}}
+        self.knowledge_chunks = [chunk for kb_data in self.knowledge_bases.values() for chunk in kb_data["chunks"]]
+    
+    @staticmethod
+    def chunk_text(content: str) -> List[str]:
+        """Split into semantic chunks: '## ' sections, then paragraphs over 100 characters"""
+        chunks = []
+        sections = content.split('\n## ')
+        for section in sections:
+            if len(section.strip()) < 50:
                 continue
+            paragraphs = section.split('\n\n')
+            for para in paragraphs:
+                para = para.strip()
+                if len(para) > 100:
+                    chunks.append(para)
+        return chunks
+    
+    @staticmethod
+    def chunk_hash(chunk: str) -> str:
+        return hashlib.sha1(chunk.encode("utf-8")).hexdigest()[:16]
+    
+    def _read_chunks(self, kb_type: str, path: str) -> Optional[List[str]]:
+        """Chunks of one knowledge file - taken from its saved index when the manifest says it's unchanged"""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        entry = self.manifest.get(path)
+        if entry and entry.get("source_hash") and (entry["mtime_ns"], entry["size"]) == (stat.st_mtime_ns,
+                                                                                         stat.st_size):
+            index = BM25Index.load(self.index_dir, kb_type, entry["source_hash"])
+            if index is not None:
+                self._saved_indices[kb_type] = index
+                print(f"✅ {path} unchanged - reusing its saved index")
+                return index.chunks
+        
+        with open(path, "r", encoding="utf-8") as f:
+            content = f.read()
+        print(f"✅ Loaded {path}: {len(content)} characters")
+        chunks = self.chunk_text(content)
+        self.manifest[path] = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size,
+                               "sha1": hashlib.sha1(content.encode("utf-8")).hexdigest(),
+                               "chunks": [self.chunk_hash(chunk) for chunk in chunks]}
+        return chunks
+    
+    def _load_manifest(self) -> Dict:
+        try:
+            with open(os.path.join(self.index_dir, "manifest.json"), encoding="utf-8") as f:
+                return json.load(f).get("files", {})
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"⚠️ Ignoring unreadable knowledge manifest: {e}")
+            return {}
+    
+    def _save_manifest(self):
+        os.makedirs(self.index_dir, exist_ok=True)
+        path = os.path.join(self.index_dir, "manifest.json")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"files": self.manifest, "updated_at": datetime.now().isoformat()}, f, indent=1)
+        os.replace(path + ".tmp", path)
+    
+    def create_basic_worldview(self):
+        """Create a basic worldview file if none exists"""
+        basic_worldview = """
+# INTELLIGENT WORLDVIEW - COMPREHENSIVE KNOWLEDGE BASE
+
+## ARTIFICIAL INTELLIGENCE & MACHINE LEARNING
+AI represents the most transformative technology of our time. Current capabilities include natural language processing, computer vision, robotics, and predictive analytics. Key architectures include transformer models (GPT, BERT, Claude, Gemini), convolutional neural networks for vision, and reinforcement learning for decision-making. The trajectory points toward artificial general intelligence with implications for work, creativity, and human-AI collaboration.
+
+## PROGRAMMING & SOFTWARE DEVELOPMENT  
+Modern programming emphasizes clean code, maintainable architecture, and scalable systems. Core languages include Python for AI/data science, JavaScript/TypeScript for web development, Rust/Go for systems programming, and specialized languages for different domains. Key concepts include object-oriented programming, functional programming, design patterns, microservices architecture, and DevOps practices.
+
+## COMPUTER SCIENCE FUNDAMENTALS
+Computer science rests on algorithms, data structures, and computational complexity. Important algorithms include sorting (quicksort, mergesort), searching (binary search, graph traversal), and optimization techniques. Data structures like arrays, trees, hash tables, and graphs enable efficient data manipulation. Systems design considers scalability, reliability, and performance across distributed architectures.
+
+## MATHEMATICS & STATISTICS
+Mathematics provides the foundation for computational thinking and problem-solving. Linear algebra enables machine learning through matrix operations and vector spaces. Calculus describes change and optimization through derivatives and integrals. Statistics and probability enable data analysis, hypothesis testing, and uncertainty quantification. These mathematical tools are essential for AI, engineering, and scientific research.
+
+## HUMAN PSYCHOLOGY & BEHAVIOR
+Understanding human psychology improves communication, leadership, and system design. Cognitive psychology explores memory, attention, and decision-making processes. Social psychology examines group dynamics, persuasion, and cultural influences. Behavioral economics reveals cognitive biases that affect rational decision-making. This knowledge enables better user experience design and more effective human-computer interaction.
+
+## BUSINESS & ECONOMICS
+Modern economics balances market forces with social outcomes. Microeconomics studies individual decision-making and market mechanisms. Macroeconomics examines large-scale economic trends, monetary policy, and international trade. Business strategy involves competitive analysis, value creation, and stakeholder management. Entrepreneurship requires understanding market needs, building products, and scaling operations.
+
+## COMMUNICATION & RELATIONSHIPS
+Effective communication requires empathy, active listening, and cultural awareness. Technical communication involves explaining complex concepts clearly to diverse audiences. Leadership communication inspires and motivates teams toward shared goals. Interpersonal relationships benefit from emotional intelligence, conflict resolution skills, and mutual respect. Digital communication adds complexity requiring attention to presence and authenticity.
+
+## HEALTH & WELLNESS
+Human health encompasses physical, mental, and social well-being. Nutrition, exercise, sleep, and stress management form the foundation of physical health. Mental health involves emotional regulation, resilience, and healthy coping mechanisms. Social connections and meaningful relationships contribute significantly to overall wellness. Preventive care and early intervention often provide better outcomes than reactive treatment.
+
+## LEARNING & EDUCATION
+Effective learning combines multiple strategies and modalities. Active learning engages students through practice, discussion, and application. Spaced repetition and interleaving improve long-term retention. Metacognitive skills help learners monitor and adjust their learning strategies. Growth mindset encourages persistence through challenges and learning from mistakes.
+
+## PROBLEM-SOLVING & CRITICAL THINKING
+Problem-solving involves defining the problem, generating alternatives, evaluating options, and implementing solutions. Critical thinking requires analyzing arguments, evaluating evidence, and identifying logical fallacies. Systems thinking considers interconnections, feedback loops, and unintended consequences. Creative problem-solving combines analytical and intuitive approaches to generate innovative solutions.
+
+This knowledge base provides comprehensive context for intelligent responses across technical, scientific, business, and human domains.
+"""
+        
+        try:
+            with open("intelligent_worldview.txt", "w", encoding="utf-8") as f:
+                f.write(basic_worldview)
+            print("✅ Created basic intelligent_worldview.txt")
+            self._missing.clear()  # Pick up the created file
+            for kb_type in self.default_knowledge:
+                self.ensure_loaded(kb_type)
+        except Exception as e:
+            print(f"❌ Error creating worldview file: {e}")
+            # Keep basic content in memory
+            self.knowledge_chunks = basic_worldview.split('\n\n')
+    
+    def _index_hash(self, chunks: List[str]) -> str:
+        return BM25Index.fingerprint(chunks, self.config.get("bm25_k1", 1.2), self.config.get("bm25_b", 0.75))
+    
+    def _build_index(self, kb_type: str, chunks: List[str], previous: BM25Index = None) -> BM25Index:
+        started = time.time()
+        index = BM25Index.build(chunks, self.config.get("bm25_k1", 1.2), self.config.get("bm25_b", 0.75), previous)
+        index.save(self.index_dir, kb_type, self._index_hash(chunks))
+        print(f"  📚 {kb_type.upper()}: BM25 index built ({len(index.term_ids)} terms, "
+              f"{index.build_stats['tokenized']} chunks tokenized, {index.build_stats['reused']} reused, "
+              f"{time.time() - started:.2f}s)")
+        return index
+    
+    def refresh(self) -> Dict[str, Dict]:
+        """Re-index loaded knowledge files that changed since the last check - an unchanged file costs one stat().
+        
+        A changed file is re-chunked, but only chunks not already indexed are tokenized (and embedded,
+        with an embedding model). Knowledge bases nobody has used yet stay unloaded; a missing file
+        that appears is loaded the next time an agent asks for it.
+        """
+        changes = {}
+        touched = False
+        with self._index_lock:
+            for kb_type in list(self._missing):
+                if os.path.exists(self.registry[kb_type]["file"]):
+                    self._missing.discard(kb_type)
+            
+            for kb_type, current in list(self.indices.items()):
+                path = current["file"]
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue  # Keep serving the last index of a removed file
+                entry = self.manifest.get(path, {})
+                if (entry.get("mtime_ns"), entry.get("size")) == (stat.st_mtime_ns, stat.st_size):
+                    continue
+                with open(path, "r", encoding="utf-8") as f:
+                    content = f.read()
+                digest = hashlib.sha1(content.encode("utf-8")).hexdigest()
+                if digest == entry.get("sha1"):
+                    entry.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)  # Touched, not changed
+                    touched = True
+                    continue
+                
+                chunks = self.chunk_text(content)
+                hashes = [self.chunk_hash(chunk) for chunk in chunks]
+                index = self._build_index(kb_type, chunks, current["bm25"])
+                entry_hashes = set(entry.get("chunks", []))
+                self.manifest[path] = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha1": digest,
+                                       "chunks": hashes, "source_hash": self._index_hash(chunks)}
+                
+                kb_entry = {"bm25": index, "chunks": index.chunks, "agents": current["agents"], "file": path}
+                if "index" in current and hasattr(self, "model"):
+                    kb_entry.update(self._vector_entry(index.chunks))
+                self._install(kb_type, kb_entry)
+                changes[kb_type] = {"added": len(set(hashes) - entry_hashes),
+                                    "removed": len(entry_hashes - set(hashes)), **index.build_stats}
+            if changes or touched:
+                self._save_manifest()
+            if changes:
+                print(f"🔄 Knowledge re-indexed: {changes}")
+        return changes
+    
+    def start_watching(self):
+        """Poll the knowledge files' mtimes in the background and re-index on change"""
+        interval = self.config.get("reindex_interval", 0)
+        if not interval or self._watch_thread is not None:
+            return
+        
+        def watch_loop():
+            while not self._stop_watching.wait(interval):
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f"⚠️ Knowledge re-index failed: {e}")
+        self._watch_thread = threading.Thread(target=watch_loop, name="kb-reindex", daemon=True)
+        self._watch_thread.start()
+    
+    def stop_watching(self):
+        self._stop_watching.set()
+    
+    def create_vector_index(self):
+        """Create FAISS vector indices for each knowledge base"""
+        if not hasattr(self, 'knowledge_bases') or not self.knowledge_bases:
+            return
+            
+        try:
+            indices = {}
+            
+            print("🔄 Generating embeddings for specialized knowledge bases...")
+            
+            for kb_type, kb_data in self.knowledge_bases.items():
+                chunks = kb_data["chunks"]
+                if not chunks:
+                    continue
+                    
+                print(f"  🧠 Processing {kb_type} knowledge base ({len(chunks)} chunks)...")
+                
+                indices[kb_type] = {
+                    **self.indices.get(kb_type, {}),  # Keep the BM25 index alongside
+                    **self._vector_entry(chunks),
+                    "chunks": chunks,
+                    "agents": kb_data["agents"],
+                    "file": kb_data["file"]
+                }
+                
+                print(f"  ✅ {kb_type.upper()}: {len(chunks)} chunks indexed")
+            
+            self.indices = indices
+            print(f"🚀 AGI-tier vector indices created for {len(self.indices)} knowledge bases!")
+            
+        except Exception as e:
+            print(f"❌ Error creating vector indices: {e}")
+    
+    def _vector_entry(self, chunks: List[str]) -> Dict:
+        """FAISS index over chunk embeddings - only chunks never embedded before go through the model"""
+        import faiss
+        
+        missing = [chunk for chunk in dict.fromkeys(chunks) if self.chunk_hash(chunk) not in self._embedding_cache]
+        if missing:
+            for chunk, embedding in zip(missing, self.model.encode(missing)):
+                self._embedding_cache[self.chunk_hash(chunk)] = np.asarray(embedding, dtype=np.float32)
+        embeddings_array = np.stack([self._embedding_cache[self.chunk_hash(chunk)] for chunk in chunks])
+        
+        # Normalize for cosine similarity
+        index = faiss.IndexFlatIP(embeddings_array.shape[1])
+        faiss.normalize_L2(embeddings_array)
+        index.add(embeddings_array)
+        return {"index": index, "embeddings": embeddings_array}
+    
+    def semantic_search(self, query: str, agent_type: str, top_k: int = 3) -> List[str]:
+        """Perform intelligent semantic search using agent-specific knowledge base"""
+        try:
+            # Determine which knowledge base to use based on agent type
+            selected_kb = self._select_knowledge_base(agent_type)
+            
+            if not selected_kb or selected_kb not in self.indices:
+                print(f"⚠️ No knowledge base found for agent: {agent_type}")
+                return []
+                
+            kb_data = self.indices[selected_kb]
+            chunks = kb_data["chunks"]
+            
+            print(f"🔍 Using {selected_kb.upper()} knowledge ({kb_data['file']}) for {agent_type}")
+            
+            if "index" not in kb_data:  # No embedding index - BM25
+                hits = kb_data["bm25"].search(query, top_k, self.config.get("min_score", 0.0))
+                return [f"[Score: {score:.3f}] {chunks[chunk_id]}" for chunk_id, score in hits]
+            
+            import faiss  # Embedding indices only (create_vector_index)
+            index = kb_data["index"]
+            # Encode query
+            query_embedding = self.model.encode([query])
+            query_embedding = np.array(query_embedding).astype('float32')
+            faiss.normalize_L2(query_embedding)
+            
+            # Search for similar chunks in the selected knowledge base
+            scores, indices = index.search(query_embedding, top_k)
+            
+            # Return top matching chunks with scores
+            results = []
+            for i, idx in enumerate(indices[0]):
+                if idx < len(chunks):
+                    score = scores[0][i]
+                    results.append(f"[Score: {score:.3f}] {chunks[idx]}")
+            
+            return results
+            
+        except Exception as e:
+            print(f"❌ Semantic search error: {e}")
+            return []
+    
+    def _select_knowledge_base(self, agent_type: str) -> Optional[str]:
+        """First available knowledge base of the agent's precomputed candidates (loaded on first use)"""
+        for kb_type in self.agent_knowledge.get(agent_type, self.default_knowledge):
+            if self.ensure_loaded(kb_type) is not None:
+                return kb_type
+        return None
+    
+    def get_relevant_worldview(self, query: str, agent_type: str) -> str:
+        """Get relevant worldview context using intelligent agent-specific semantic search"""
+        # Combine query with agent type for better context  
+        search_query = f"{query} {agent_type}"
+        
+        # Perform intelligent semantic search with agent-specific knowledge base
+        relevant_chunks = self.semantic_search(search_query, agent_type, top_k=self.config.get("top_k", 3))
+        
+        if relevant_chunks:
+            # Determine which knowledge base was used
+            selected_kb = self._select_knowledge_base(agent_type)
+            kb_name = selected_kb.upper() if selected_kb else "UNKNOWN"
+            
+            worldview_context = f"\n\n🧠 {kb_name} KNOWLEDGE CONTEXT:\n"
+            for i, chunk in enumerate(relevant_chunks):
+                worldview_context += f"\n[KNOWLEDGE CHUNK {i+1}]:\n{chunk}\n"
+            worldview_context += f"\nUse this specialized {kb_name.lower()} knowledge to provide genius-level responses.\n"
+            return worldview_context
+        
+        return ""
+    
+    def load_basic_worldview(self):
+        """Fallback method for basic keyword matching"""
+        try:
+            with open("intelligent_worldview.txt", "r", encoding="utf-8") as f:
+                self.worldview_content = f.read()
+            print(f"✅ Loaded basic worldview: {len(self.worldview_content)} characters")
+        except FileNotFoundError:
+            self.worldview_content = "Basic worldview knowledge not available."
+
+# 🧮 MODEL RESIDENCY SCHEDULER
+class ModelResidencyScheduler:
+    """Tracks which models are loaded and gates calls so a loaded model drains its queue before a swap"""
+    
+    def __init__(self, config: Dict = None):
+        self.config = config or RESIDENCY_CONFIG
+        self.enabled = self.config.get("enabled", True)
+        self.memory_budget_gb = self.config.get("memory_budget_gb", 12.0)
+        self.models = self.config.get("models", {})
+        self.swap_wait_seconds = self.config.get("swap_wait_seconds", 15.0)
+        self.resident = OrderedDict()  # model -> last used time (LRU order)
+        self.active = Counter()  # model -> calls in flight
+        self.waiting = Counter()  # model -> calls queued
+        self._unload_fn = None
+        self._cond = threading.Condition()
+        self.stats = {"loads": 0, "unloads": 0, "resident_hits": 0, "queued_waits": 0, "forced_admits": 0}
+    
+    def size_of(self, model: str) -> float:
+        return self.models.get(model, {}).get("size_gb", self.config.get("default_size_gb", 4.0))
+    
+    def keep_alive_for(self, model: str):
+        return self.models.get(model, {}).get("keep_alive", self.config.get("default_keep_alive", "5m"))
+    
+    def is_pinned(self, model: str) -> bool:
+        return self.models.get(model, {}).get("pinned", False)
+    
+    def set_unloader(self, unload_fn):
+        """Callback used to ask the server to unload a model (keep_alive=0)"""
+        self._unload_fn = unload_fn
+    
+    def sync_resident(self, models: List[str]):
+        """Replace the resident set with the server's view (ollama ps), keeping models with calls in flight"""
+        with self._cond:
+            for model in list(self.resident):
+                if model not in models and not self.active[model] and not self.waiting[model]:
+                    self.resident.pop(model)
+            for model in models:
+                if model not in self.resident:
+                    self.resident[model] = time.time()
+            self._cond.notify_all()
+    
+    def _resident_gb(self) -> float:
+        return sum(self.size_of(m) for m in self.resident)
+    
+    def _evictable(self) -> List[str]:
+        """Loaded models with nothing running or queued, least recently used first"""
+        return [m for m in self.resident
+                if not self.active[m] and not self.waiting[m] and not self.is_pinned(m)]
+    
+    def _try_admit(self, model: str, forced: bool = False) -> List[str]:
+        """Admit the call if possible; returns models to unload, or None when the call must wait"""
+        if model in self.resident:
+            self.stats["resident_hits"] += 1
+            return []
+        
+        # Another loaded model still has queued work - let it drain before swapping
+        draining = any(self.waiting[m] or self.active[m] for m in self.resident)
+        needed = self._resident_gb() + self.size_of(model) - self.memory_budget_gb
+        to_unload = []
+        if needed > 0:
+            for candidate in self._evictable():
+                if needed <= 0:
+                    break
+                to_unload.append(candidate)
+                needed -= self.size_of(candidate)
+            if needed > 0 and draining and not forced:
+                return None
+        
+        for candidate in to_unload:
+            self.resident.pop(candidate, None)
+            self.stats["unloads"] += 1
+        self.stats["loads"] += 1
+        if forced:
+            self.stats["forced_admits"] += 1
+        return to_unload
+    
+    def acquire(self, model: str):
+        """Block until the model may run"""
+        if not self.enabled:
+            return
+        with self._cond:
+            self.waiting[model] += 1
+            started = time.time()
+            try:
+                to_unload = self._try_admit(model)
+                if to_unload is None:
+                    self.stats["queued_waits"] += 1
+                while to_unload is None:
+                    remaining = self.swap_wait_seconds - (time.time() - started)
+                    if remaining <= 0:
+                        to_unload = self._try_admit(model, forced=True)  # Don't starve - let Ollama evict
+                        break
+                    self._cond.wait(timeout=remaining)
+                    to_unload = self._try_admit(model)
+            finally:
+                self.waiting[model] -= 1
+            self.active[model] += 1
+            self.resident[model] = time.time()
+            self.resident.move_to_end(model)
+        
+        for candidate in to_unload:
+            print(f"📤 Unloading {candidate} to make room for {model}")
+            if self._unload_fn:
+                try:
+                    self._unload_fn(candidate)
+                except Exception as e:
+                    print(f"⚠️ Unload of {candidate} failed: {e}")
+    
+    def release(self, model: str):
+        if not self.enabled:
+            return
+        with self._cond:
+            self.active[model] -= 1
+            self.resident[model] = time.time()
+            self._cond.notify_all()
+    
+    @contextmanager
+    def slot(self, model: str):
+        """Context manager around a single model call"""
+        self.acquire(model)
+        try:
+            yield
+        finally:
+            self.release(model)
+    
+    def get_stats(self) -> Dict:
+        with self._cond:
+            return {**self.stats,
+                    "resident": list(self.resident),
+                    "resident_gb": round(self._resident_gb(), 2),
+                    "queued": {m: n for m, n in self.waiting.items() if n}}
+
+# 🗃️ EXACT-MATCH RESPONSE CACHE
+class ResponseCache:
+    """Content-addressed cache for deterministic (low-temperature) helper calls: memory LRU + optional SQLite tier"""
+    
+    def __init__(self, config: Dict = None):
+        self.config = config or RESPONSE_CACHE_CONFIG
+        self.enabled = self.config.get("enabled", True)
+        self.max_temperature = self.config.get("max_temperature", 0.3)
+        self.memory_entries = self.config.get("memory_entries", 512)
+        self.ttl_seconds = self.config.get("ttl_seconds", 7 * 24 * 3600)
+        self.disk_path = self.config.get("disk_path") if self.config.get("disk_enabled") else None
+        self._memory = OrderedDict()  # key -> (created, response text)
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "memory_hits": 0, "disk_hits": 0, "stores": 0}
+        if self.disk_path:
+            self._init_disk()
+    
+    def _init_disk(self):
+        try:
+            conn = sqlite3.connect(self.disk_path)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS response_cache (
+                    key TEXT PRIMARY KEY,
+                    response TEXT,
+                    created REAL
+                )
+            """)
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            print(f"⚠️ Response cache disk tier disabled: {e}")
+            self.disk_path = None
+    
+    def is_cacheable(self, options: Dict = None) -> bool:
+        """Only near-deterministic calls are worth caching (Ollama's default temperature is 0.8)"""
+        return self.enabled and (options or {}).get("temperature", 0.8) <= self.max_temperature
+    
+    @staticmethod
+    def make_key(model: str, prompt: str, options: Dict = None, images: List = None) -> str:
+        """Hash of model + whitespace-normalized prompt + options + image contents"""
+        image_hashes = [hashlib.sha1(img if isinstance(img, bytes) else str(img).encode("utf-8")).hexdigest()
+                        for img in (images or [])]
+        payload = json.dumps([model, " ".join(prompt.split()), options or {}, image_hashes],
+                             sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and now - entry[0] <= self.ttl_seconds:
+                self._memory.move_to_end(key)
+                self.stats["hits"] += 1
+                self.stats["memory_hits"] += 1
+                return entry[1]
+            self._memory.pop(key, None)
+        
+        if self.disk_path:
+            try:
+                conn = sqlite3.connect(self.disk_path)
+                row = conn.execute("SELECT response, created FROM response_cache WHERE key = ?", (key,)).fetchone()
+                if row and now - row[1] > self.ttl_seconds:
+                    conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                    conn.commit()
+                    row = None
+                conn.close()
+                if row:
+                    with self._lock:
+                        self._remember(key, row[1], row[0])
+                        self.stats["hits"] += 1
+                        self.stats["disk_hits"] += 1
+                    return row[0]
+            except Exception as e:
+                print(f"⚠️ Response cache read error: {e}")
+        
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+    
+    def put(self, key: str, response: str):
+        if not response:
+            return
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, response)
+            self.stats["stores"] += 1
+        
+        if self.disk_path:
+            try:
+                conn = sqlite3.connect(self.disk_path)
+                conn.execute("INSERT OR REPLACE INTO response_cache VALUES (?, ?, ?)", (key, response, now))
+                conn.commit()
+                conn.close()
+            except Exception as e:
+                print(f"⚠️ Response cache write error: {e}")
+    
+    def _remember(self, key: str, created: float, response: str):
+        self._memory[key] = (created, response)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+    
+    def get_stats(self) -> Dict:
+        with self._lock:
+            total = self.stats["hits"] + self.stats["misses"]
+            return {**self.stats, "entries": len(self._memory),
+                    "hit_rate": round(self.stats["hits"] / total, 3) if total else 0.0}
+
+# 🚦 INFERENCE PRIORITY SCHEDULER
+class InferencePriorityScheduler:
+    """Priority classes with per-class concurrency limits; lower classes wait while higher ones are queued"""
+    
+    def __init__(self, config: Dict = None):
+        self.config = config or SCHEDULER_CONFIG
+        self.enabled = self.config.get("enabled", True)
+        self.priorities = {kind: rank for rank, kind in enumerate(self.config.get("priorities", []))}
+        self.max_concurrent = self.config.get("max_concurrent", 4)
+        self.class_limits = self.config.get("class_limits", {})
+        self.max_defer_seconds = self.config.get("max_defer_seconds", 30.0)
+        self.active = Counter()  # kind -> calls running
+        self.queued = Counter()  # kind -> calls waiting
+        self._cond = threading.Condition()
+        self.stats = {"admitted": Counter(), "deferred": Counter(), "timeouts": Counter(),
+                      "max_queue_depth": Counter(), "wait_seconds": Counter()}
+    
+    def rank(self, kind: str) -> int:
+        """0 = most urgent; unknown kinds rank below every configured class"""
+        return self.priorities.get(kind, len(self.priorities))
+    
+    def _can_start(self, kind: str, waited: float) -> bool:
+        if sum(self.active.values()) >= self.max_concurrent:
+            return False
+        if self.active[kind] >= self.class_limits.get(kind, self.max_concurrent):
+            return False
+        if waited >= self.max_defer_seconds:
+            return True  # Aged out - stop deferring to higher classes
+        rank = self.rank(kind)
+        return not any(count and self.rank(other) < rank for other, count in self.queued.items())
+    
+    def acquire(self, kind: str, timeout: float = None) -> bool:
+        """Wait for a slot for this class; False if the timeout passes first"""
+        if not self.enabled:
+            return True
+        start = time.time()
+        with self._cond:
+            self.queued[kind] += 1
+            self.stats["max_queue_depth"][kind] = max(self.stats["max_queue_depth"][kind], self.queued[kind])
+            try:
+                deferred = False
+                while not self._can_start(kind, time.time() - start):
+                    if not deferred:
+                        self.stats["deferred"][kind] += 1
+                        deferred = True
+                    waited = time.time() - start
+                    wait_for = max(self.max_defer_seconds - waited, 0.05)  # Wake up to age out
+                    if timeout is not None:
+                        if waited >= timeout:
+                            self.stats["timeouts"][kind] += 1
+                            return False
+                        wait_for = min(wait_for, timeout - waited)
+                    self._cond.wait(timeout=wait_for)
+                self.active[kind] += 1
+                self.stats["admitted"][kind] += 1
+                self.stats["wait_seconds"][kind] += time.time() - start
+                return True
+            finally:
+                self.queued[kind] -= 1
+                self._cond.notify_all()  # Queue changed - lower classes may now start
+    
+    def release(self, kind: str):
+        if not self.enabled:
+            return
+        with self._cond:
+            self.active[kind] -= 1
+            self._cond.notify_all()
+    
+    def get_stats(self) -> Dict:
+        """Queue depth, in-flight calls and wait times per class"""
+        with self._cond:
+            kinds = sorted(set(self.stats["admitted"]) | set(self.queued) | set(self.active), key=self.rank)
+            return {kind: {
+                "queued": self.queued[kind],
+                "active": self.active[kind],
+                "admitted": self.stats["admitted"][kind],
+                "deferred": self.stats["deferred"][kind],
+                "timeouts": self.stats["timeouts"][kind],
+                "max_queue_depth": self.stats["max_queue_depth"][kind],
+                "avg_wait_ms": round(1000 * self.stats["wait_seconds"][kind] / self.stats["admitted"][kind], 1)
+                               if self.stats["admitted"][kind] else 0.0
+            } for kind in kinds}
+
+# 🌐 OLLAMA BACKEND POOL
+class OllamaBackend:
+    """One Ollama server: its pooled client, residency view, outstanding calls and health"""
+    
+    def __init__(self, config: Dict, timeout: float, limits_factory):
+        self.host = config.get("host")
+        self.name = self.host or "default"
+        self.models = config.get("models")  # None = serves every model
+        self.weight = config.get("weight", 1.0)
+        self._timeout = timeout
+        self._limits_factory = limits_factory
+        self.client = ollama.Client(host=self.host, timeout=timeout, limits=limits_factory())  # ps / unload
+        # Our own pooled client for /api/generate, so each call can carry its own timeout and be cut off
+        self.http = httpx.Client(base_url=self.base_url(self.host), timeout=timeout, limits=limits_factory())
+        self._async_client = None
+        self._async_loop = None
+        
+        residency_config = dict(RESIDENCY_CONFIG)
+        if config.get("memory_budget_gb") is not None:
+            residency_config["memory_budget_gb"] = config["memory_budget_gb"]
+        self.residency = ModelResidencyScheduler(residency_config)
+        self.residency.set_unloader(self.unload)
+        
+        self.outstanding = 0
+        self.failures = 0
+        self.ejected_until = 0.0
+        self.stats = {"calls": 0, "failures": 0, "ejections": 0}
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def base_url(host: Optional[str]) -> str:
+        """Server URL the way the ollama client resolves it: host, else OLLAMA_HOST, else localhost:11434"""
+        url = (host or os.environ.get("OLLAMA_HOST") or "127.0.0.1:11434").rstrip("/")
+        return url if "://" in url else f"http://{url}"
+    
+    def serves(self, model: str) -> bool:
+        return self.models is None or model in self.models
+    
+    def is_healthy(self) -> bool:
+        return time.time() >= self.ejected_until
+    
+    def async_client(self):
+        """AsyncClient bound to the running event loop (httpx pools can't cross loops)"""
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            self._async_client = ollama.AsyncClient(host=self.host, timeout=self._timeout,
+                                                    limits=self._limits_factory())
+            self._async_loop = loop
+        return self._async_client
+    
+    def acquire(self, model: str):
+        """Residency slot on this server + outstanding-request count"""
+        self.residency.acquire(model)
+        with self._lock:
+            self.outstanding += 1
+            self.stats["calls"] += 1
+    
+    def release(self, model: str):
+        with self._lock:
+            self.outstanding -= 1
+        self.residency.release(model)
+    
+    def unload(self, model: str):
+        """Ask this server to drop a model from memory now"""
+        self.client.generate(model=model, prompt="", keep_alive=0)
+    
+    @contextmanager
+    def _open_generate(self, request: Dict, stream: bool, deadline_at: float):
+        """POST /api/generate on this server's pooled connection, cut off at deadline_at.
+        
+        The per-request httpx timeout bounds connecting, waiting for the headers and each read; a
+        watchdog shuts the socket down at the deadline so a slow or stalled response stops holding
+        the connection and worker. Yields (response, watchdog) - streams push the watchdog's
+        deadline back as chunks arrive.
+        """
+        remaining = deadline_at - time.time()
+        if remaining <= 0:
+            raise TimeoutError(f"{request['model']} deadline passed before the request was sent")
+        payload = {**request, "stream": stream}
+        if payload.get("images"):
+            payload["images"] = [base64.b64encode(img).decode("utf-8") if isinstance(img, bytes) else img
+                                 for img in payload["images"]]
+        
+        watchdog = None
+        try:
+            with self.http.stream("POST", "/api/generate", json=payload, timeout=httpx.Timeout(remaining)) as response:
+                watchdog = ResponseWatchdog(response, deadline_at)
+                if response.status_code >= 400:
+                    response.read()
+                    try:
+                        error = response.json().get("error", response.text)
+                    except ValueError:
+                        error = response.text
+                    raise ollama.ResponseError(error, response.status_code)
+                yield response, watchdog
+        except httpx.ConnectError as e:
+            raise ConnectionError(f"Ollama backend {self.name} unreachable: {e}") from None
+        except (httpx.TimeoutException, httpx.TransportError) as e:
+            if (watchdog is not None and watchdog.expired.is_set()) or isinstance(e, httpx.TimeoutException):
+                raise TimeoutError(f"{request['model']} exceeded its deadline on {self.name}") from None
+            raise
+        finally:
+            if watchdog is not None:
+                watchdog.cancel()
+    
+    def generate(self, request: Dict, deadline_at: float):
+        """Non-streaming generate that gives up (and frees the connection) at deadline_at"""
+        with self._open_generate(request, False, deadline_at) as (response, watchdog):
+            body = response.read()
+            if watchdog.expired.is_set():
+                raise TimeoutError(f"{request['model']} exceeded its deadline on {self.name}")
+            return ollama.GenerateResponse(**json.loads(body))
+    
+    def stream(self, request: Dict, first_chunk_by: float, idle_timeout: float):
+        """Streaming generate: the first chunk must arrive by first_chunk_by, then each next one within
+        idle_timeout - a long answer that keeps streaming is never cut off, a stalled one is"""
+        with self._open_generate(request, True, first_chunk_by) as (response, watchdog):
+            for line in response.iter_lines():
+                if watchdog.expired.is_set():
+                    break
+                if not line:
+                    continue
+                watchdog.extend(time.time() + idle_timeout)
+                part = json.loads(line)
+                if part.get("error"):
+                    raise ollama.ResponseError(part["error"])
+                yield ollama.GenerateResponse(**part)
+            # A stream cut off by the watchdog can look like a clean end of the body
+            if watchdog.expired.is_set():
+                raise TimeoutError(f"{request['model']} stream stalled on {self.name}")
+    
+    def close(self):
+        self.http.close()
+        self.client.close()
+
+
+class ResponseWatchdog:
+    """Shuts an HTTP response's socket down once its deadline passes; one thread per response,
+    and the deadline can be moved (a stream's idle timeout restarts on every chunk)"""
+    
+    def __init__(self, response, deadline_at: float):
+        self.deadline_at = deadline_at
+        self.expired = threading.Event()
+        self._response = response
+        self._done = False
+        self._changed = threading.Condition()
+        threading.Thread(target=self._watch, name="ollama-deadline", daemon=True).start()
+    
+    def extend(self, deadline_at: float):
+        with self._changed:
+            earlier = deadline_at < self.deadline_at
+            self.deadline_at = deadline_at
+            if earlier:
+                self._changed.notify()
+    
+    def cancel(self):
+        with self._changed:
+            self._done = True
+            self._changed.notify()
+    
+    def _watch(self):
+        with self._changed:
+            while not self._done and time.time() < self.deadline_at:
+                self._changed.wait(self.deadline_at - time.time())
+            if self._done:
+                return
+            self.expired.set()
+        try:
+            self._response.extensions["network_stream"].get_extra_info("socket").shutdown(socket.SHUT_RDWR)
+        except Exception:
+            pass  # Already finished or closed
+
+
+class OllamaBackendPool:
+    """Routes calls across Ollama servers: model affinity, least outstanding requests, ejection + retry"""
+    
+    def __init__(self, timeout: float, limits_factory, config: Dict = None):
+        self.config = config or BACKEND_CONFIG
+        self.max_retries = self.config.get("max_retries", 2)
+        self.eject_after_failures = self.config.get("eject_after_failures", 2)
+        self.eject_seconds = self.config.get("eject_seconds", 30.0)
+        self.health_check_interval = self.config.get("health_check_interval", 15.0)
+        self.backends = [OllamaBackend(backend_config, timeout, limits_factory)
+                         for backend_config in self.config.get("backends") or [{"host": None}]]  # None = OLLAMA_HOST
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._health_thread = None
+        if self.health_check_interval:
+            self._health_thread = threading.Thread(target=self._health_loop, name="ollama-health", daemon=True)
+            self._health_thread.start()
+    
+    def keep_alive_for(self, model: str):
+        residency = self.backends[0].residency
+        return residency.keep_alive_for(model) if residency.enabled else None
+    
+    def candidates(self, model: str) -> List[OllamaBackend]:
+        """Backends to try in order: model already resident first, then fewest outstanding calls per weight"""
+        with self._lock:
+            serving = [b for b in self.backends if b.serves(model)] or list(self.backends)
+            healthy = [b for b in serving if b.is_healthy()] or serving  # All ejected - try anyway
+            ranked = sorted(healthy, key=lambda b: (model not in b.residency.resident,
+                                                    b.outstanding / max(b.weight, 0.01)))
+        return ranked[:self.max_retries + 1]
+    
+    @staticmethod
+    def is_backend_failure(error: Exception) -> bool:
+        """Connection problems and 5xx mean the server is in trouble, not the request"""
+        if isinstance(error, (ConnectionError, httpx.TransportError)):
+            return True
+        return isinstance(error, ollama.ResponseError) and getattr(error, "status_code", 0) >= 500
+    
+    @staticmethod
+    def is_retryable(error: Exception) -> bool:
+        """Backend failures, or 404 (model not pulled on that server)"""
+        if OllamaBackendPool.is_backend_failure(error):
+            return True
+        return isinstance(error, ollama.ResponseError) and getattr(error, "status_code", 0) == 404
+    
+    def record_success(self, backend: OllamaBackend):
+        with self._lock:
+            backend.failures = 0
+    
+    def record_failure(self, backend: OllamaBackend, error: Exception):
+        if not self.is_backend_failure(error):
+            return
+        with self._lock:
+            backend.failures += 1
+            backend.stats["failures"] += 1
+            if backend.failures >= self.eject_after_failures and backend.is_healthy():
+                backend.ejected_until = time.time() + self.eject_seconds
+                backend.stats["ejections"] += 1
+                print(f"🚫 Ejected Ollama backend {backend.name} for {self.eject_seconds:.0f}s: {error}")
+    
+    def run(self, model: str, call):
+        """Run call(backend) on the best backend, retrying the next one on retryable errors"""
+        candidates = self.candidates(model)
+        for attempt, backend in enumerate(candidates):
+            backend.acquire(model)
+            try:
+                result = call(backend)
+                self.record_success(backend)
+                return result
+            except Exception as e:
+                self.record_failure(backend, e)
+                if attempt == len(candidates) - 1 or not self.is_retryable(e):
+                    raise
+                print(f"🔁 {model} failed on {backend.name} ({e}) - retrying on {candidates[attempt + 1].name}")
+            finally:
+                backend.release(model)
+    
+    def check_health(self):
+        """Probe every backend; refresh its resident models and eject or reinstate it"""
+        for backend in self.backends:
+            try:
+                running = backend.client.ps().get("models") or []
+                backend.residency.sync_resident([m.get("model") or m.get("name") for m in running])
+                with self._lock:
+                    if not backend.is_healthy():
+                        print(f"✅ Ollama backend {backend.name} is healthy again")
+                    backend.failures = 0
+                    backend.ejected_until = 0.0
+            except Exception as e:
+                with self._lock:
+                    if backend.is_healthy():
+                        backend.stats["ejections"] += 1
+                        print(f"🚫 Health check failed for {backend.name}: {e}")
+                    backend.ejected_until = time.time() + self.eject_seconds
+    
+    def _health_loop(self):
+        while not self._stop.wait(self.health_check_interval):
+            self.check_health()
+    
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {backend.name: {
+                **backend.stats,
+                "healthy": backend.is_healthy(),
+                "outstanding": backend.outstanding,
+                "weight": backend.weight,
+                "models": backend.models or "all",
+                "residency": backend.residency.get_stats()
+            } for backend in self.backends}
+    
+    def close(self):
+        self._stop.set()
+        for backend in self.backends:
+            backend.close()
+
+# 🔌 OLLAMA INFERENCE CLIENT
+class OllamaInferenceClient:
+    """Shared Ollama client with pooled connections, sync + async calls and per-call deadlines.
+    
+    Components get the process-wide instance from shared(), so backend routing, health checks,
+    queues and model residency all see every call.
+    """
+    
+    _shared = None
+    _shared_lock = threading.Lock()
+    
+    @classmethod
+    def shared(cls) -> "OllamaInferenceClient":
+        """The one client (one backend pool, one health thread) every component uses"""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+    
+    def __init__(self, config: Dict = None, backend_config: Dict = None):
+        self.config = config or INFERENCE_CONFIG
+        self.keep_alive = self.config.get("keep_alive")
+        self.default_deadline = self.config.get("default_deadline", 120.0)
+        self.deadlines = self.config.get("deadlines", {})
+        self.stream_idle_timeout = self.config.get("stream_idle_timeout", 60.0)
+        self._executor = ThreadPoolExecutor(max_workers=self.config.get("max_workers", 8),
+                                            thread_name_prefix="ollama")
+        
+        # Priority classes - user-facing answers go first, background work waits
+        self.scheduler = InferencePriorityScheduler()
+        
+        # One pooled client per Ollama server; each tracks its own model residency
+        self.backends = OllamaBackendPool(self._http_timeout(), self._http_limits, backend_config)
+        
+        # Exact-match cache for low-temperature helper calls
+        self.response_cache = ResponseCache()
+        self._prewarm_future = None
+        self._prewarm_lock = threading.Lock()
+    
+    def _http_limits(self):
+        """Connection pool limits shared by the sync and async clients"""
+        return httpx.Limits(
+            max_connections=self.config.get("max_connections", 16),
+            max_keepalive_connections=self.config.get("max_keepalive_connections", 8),
+            keepalive_expiry=self.config.get("keepalive_expiry", 30.0)
+        )
+    
+    def _http_timeout(self) -> float:
+        """Socket-level timeout - bounds a stalled read even when no deadline fires"""
+        return max([self.default_deadline] + list(self.deadlines.values()))
+    
+    def deadline_for(self, kind: str, deadline: float = None) -> float:
+        """Resolve the deadline for a call: explicit value > per-kind config > default"""
+        if deadline is not None:
+            return deadline
+        return self.deadlines.get(kind, self.default_deadline)
+    
+    def _request(self, model: str, prompt: str, options: Dict = None,
+                 images: List[str] = None, **kwargs) -> Dict:
+        """Build generate() keyword arguments"""
+        request = {"model": model, "prompt": prompt, "options": options or {}}
+        if images:
+            request["images"] = images
+        if "keep_alive" not in kwargs:
+            keep_alive = self.backends.keep_alive_for(model) or self.keep_alive
+            if keep_alive is not None:
+                request["keep_alive"] = keep_alive
+        request.update(kwargs)
+        return request
+    
+    def _acquire(self, kind: str, model: str, timeout: float = None):
+        """Wait for a priority slot (backend choice and residency happen per attempt)"""
+        if not self.scheduler.acquire(kind, timeout=timeout):
+            raise TimeoutError(f"{model} ({kind}) waited {timeout:.1f}s in the inference queue")
+    
+    def _release(self, kind: str, model: str):
+        self.scheduler.release(kind)
+    
+    def _generate_sync(self, request: Dict, kind: str = "interactive", timeout: float = None):
+        """Non-streaming call inside a priority slot, routed to a backend; the whole call (queue wait
+        included) is bounded by the deadline, which is enforced on the HTTP request itself"""
+        deadline = self.deadline_for(kind, timeout)
+        deadline_at = time.time() + deadline
+        self._acquire(kind, request["model"], deadline)
+        try:
+            return self.backends.run(request["model"], lambda backend: backend.generate(request, deadline_at))
+        except TimeoutError:
+            raise TimeoutError(f"{request['model']} ({kind}) exceeded {deadline:.1f}s deadline") from None
+        finally:
+            self._release(kind, request["model"])
+    
+    def _cache_lookup(self, model: str, prompt: str, options: Dict, images: List[str], cache: bool):
+        """Returns (cache key or None, cached response or None)"""
+        if not cache or not self.response_cache.is_cacheable(options):
+            return None, None
+        key = self.response_cache.make_key(model, prompt, options, images)
+        cached = self.response_cache.get(key)
+        if cached is None:
+            return key, None
+        return key, {"model": model, "response": cached, "done": True, "cached": True}
+    
+    def generate(self, model: str, prompt: str, options: Dict = None, images: List[str] = None,
+                 kind: str = "interactive", deadline: float = None, cache: bool = True, **kwargs):
+        """Blocking generate that raises TimeoutError once the deadline passes.
+        
+        Low-temperature calls are served from the response cache; pass cache=False to opt out.
+        """
+        cache_key, cached = self._cache_lookup(model, prompt, options, images, cache)
+        if cached:
+            return cached
+        
+        request = self._request(model, prompt, options, images, **kwargs)
+        response = self._generate_sync(request, kind, deadline)  # Runs here - the deadline cuts the HTTP call
+        
+        if cache_key:
+            self.response_cache.put(cache_key, response['response'])
+        return response
+    
+    def generate_background(self, model: str, prompt: str, options: Dict = None,
+                            images: List[str] = None, kind: str = "interactive", **kwargs):
+        """Start a generate call on the worker pool and return its Future"""
+        request = self._request(model, prompt, options, images, **kwargs)
+        return self._executor.submit(self._generate_sync, request, kind, self.deadline_for(kind))
+    
+    def stream(self, model: str, prompt: str, options: Dict = None, images: List[str] = None,
+               kind: str = "interactive", deadline: float = None, **kwargs):
+        """Streaming generate - yields chunks; TimeoutError when no first chunk arrives within the deadline
+        or the stream then goes stream_idle_timeout seconds without one (however long the answer runs).
+        
+        A failing backend is retried on the next one only until the first chunk arrives.
+        """
+        deadline = self.deadline_for(kind, deadline)
+        request = self._request(model, prompt, options, images, **kwargs)
+        deadline_at = time.time() + deadline
+        self._acquire(kind, model, deadline)
+        try:
+            candidates = self.backends.candidates(model)
+            for attempt, backend in enumerate(candidates):
+                backend.acquire(model)
+                chunks = None
+                started = False
+                try:
+                    chunks = backend.stream(request, deadline_at, self.stream_idle_timeout)
+                    for chunk in chunks:
+                        started = True
+                        yield chunk
+                    self.backends.record_success(backend)
+                    return
+                except TimeoutError:
+                    if started:
+                        raise TimeoutError(f"{model} ({kind}) stream stalled for {self.stream_idle_timeout:.1f}s") \
+                            from None
+                    raise TimeoutError(f"{model} ({kind}) no first token within {deadline:.1f}s deadline") from None
+                except Exception as e:
+                    self.backends.record_failure(backend, e)
+                    if started or attempt == len(candidates) - 1 or not self.backends.is_retryable(e):
+                        raise
+                    print(f"🔁 {model} stream failed on {backend.name} ({e}) - retrying on {candidates[attempt + 1].name}")
+                finally:
+                    close = getattr(chunks, "close", None)
+                    if close:
+                        close()
+                    backend.release(model)
+        finally:
+            self._release(kind, model)
+    
+    async def agenerate(self, model: str, prompt: str, options: Dict = None, images: List[str] = None,
+                        kind: str = "interactive", deadline: float = None, cache: bool = True, **kwargs):
+        """Async generate with deadline (response cache as in generate)"""
+        cache_key, cached = self._cache_lookup(model, prompt, options, images, cache)
+        if cached:
+            return cached
+        
+        deadline = self.deadline_for(kind, deadline)
+        request = self._request(model, prompt, options, images, **kwargs)
+        start = time.time()
+        # Slots are taken on a worker thread with their own timeout, so a cancelled wait never leaks one
+        await asyncio.to_thread(self._acquire, kind, model, deadline)
+        try:
+            candidates = self.backends.candidates(model)
+            for attempt, backend in enumerate(candidates):
+                await asyncio.to_thread(backend.acquire, model)
+                try:
+                    remaining = max(deadline - (time.time() - start), 0.001)
+                    response = await asyncio.wait_for(backend.async_client().generate(stream=False, **request),
+                                                      timeout=remaining)
+                    self.backends.record_success(backend)
+                    break
+                except asyncio.TimeoutError:
+                    raise TimeoutError(f"{model} ({kind}) exceeded {deadline:.1f}s deadline")
+                except Exception as e:
+                    self.backends.record_failure(backend, e)
+                    if attempt == len(candidates) - 1 or not self.backends.is_retryable(e):
+                        raise
+                finally:
+                    backend.release(model)
+        finally:
+            self._release(kind, model)
+        
+        if cache_key:
+            self.response_cache.put(cache_key, response['response'])
+        return response
+    
+    async def astream(self, model: str, prompt: str, options: Dict = None, images: List[str] = None,
+                      kind: str = "interactive", deadline: float = None, **kwargs):
+        """Async streaming generate - the deadline covers the first chunk, stream_idle_timeout each one after"""
+        deadline = self.deadline_for(kind, deadline)
+        request = self._request(model, prompt, options, images, **kwargs)
+        loop_deadline = asyncio.get_running_loop().time() + deadline
+        await asyncio.to_thread(self._acquire, kind, model, deadline)
+        try:
+            candidates = self.backends.candidates(model)
+            for attempt, backend in enumerate(candidates):
+                await asyncio.to_thread(backend.acquire, model)
+                chunks = None
+                started = False
+                try:
+                    remaining = loop_deadline - asyncio.get_running_loop().time()
+                    chunks = await asyncio.wait_for(backend.async_client().generate(stream=True, **request),
+                                                    timeout=max(remaining, 0.001))
+                    while True:
+                        remaining = loop_deadline - asyncio.get_running_loop().time()
+                        if not started and remaining <= 0:
+                            raise TimeoutError(f"{model} ({kind}) no first token within {deadline:.1f}s deadline")
+                        try:
+                            chunk = await asyncio.wait_for(
+                                chunks.__anext__(), timeout=self.stream_idle_timeout if started else remaining)
+                        except StopAsyncIteration:
+                            break
+                        except asyncio.TimeoutError:
+                            if started:
+                                raise TimeoutError(f"{model} ({kind}) stream stalled for "
+                                                   f"{self.stream_idle_timeout:.1f}s")
+                            raise TimeoutError(f"{model} ({kind}) no first token within {deadline:.1f}s deadline")
+                        started = True
+                        yield chunk
+                    self.backends.record_success(backend)
+                    return
+                except asyncio.TimeoutError:
+                    raise TimeoutError(f"{model} ({kind}) stream exceeded {deadline:.1f}s deadline")
+                except Exception as e:
+                    self.backends.record_failure(backend, e)
+                    if started or attempt == len(candidates) - 1 or not self.backends.is_retryable(e):
+                        raise
+                finally:
+                    aclose = getattr(chunks, "aclose", None)
+                    if aclose:
+                        await aclose()
+                    backend.release(model)
+        finally:
+            self._release(kind, model)
+    
+    def prewarm(self, models: List[str] = None):
+        """Load models in the background so the first user message doesn't pay the cold start (once per client)"""
+        with self._prewarm_lock:
+            if self._prewarm_future is None:
+                self._prewarm_future = self._start_prewarm(
+                    models if models is not None else RESIDENCY_CONFIG.get("prewarm", []))
+            return self._prewarm_future
+    
+    def _start_prewarm(self, models: List[str]):
+        def warm():
+            self.backends.check_health()  # Seeds each backend's resident set from ollama ps
+            for model in models:
+                try:
+                    self._generate_sync(self._request(model, ""), kind="prewarm")
+                    print(f"🔥 Prewarmed {model}")
+                except Exception as e:
+                    print(f"⚠️ Prewarm of {model} failed: {e}")
         
-        if not self.knowledge_bases:
-            print("⚠️ No knowledge files found - creating basic version")
-            self.create_basic_worldview()
-            return
-            
-        # Store total chunks for fallback
-        self.knowledge_chunks = []
-        for kb_data in self.knowledge_bases.values():
-            self.knowledge_chunks.extend(kb_data["chunks"])
-            
-        print(f"🧠 TOTAL: {len(self.knowledge_chunks)} chunks from {len(self.knowledge_bases)} knowledge bases")
+        return self._executor.submit(warm)
     
-    def create_basic_worldview(self):
-        """Create a basic worldview file if none exists"""
-        basic_worldview = """
-# INTELLIGENT WORLDVIEW - COMPREHENSIVE KNOWLEDGE BASE
-
-## ARTIFICIAL INTELLIGENCE & MACHINE LEARNING
-AI represents the most transformative technology of our time. Current capabilities include natural language processing, computer vision, robotics, and predictive analytics. Key architectures include transformer models (GPT, BERT, Claude, Gemini), convolutional neural networks for vision, and reinforcement learning for decision-making. The trajectory points toward artificial general intelligence with implications for work, creativity, and human-AI collaboration.
-
-## PROGRAMMING & SOFTWARE DEVELOPMENT  
-Modern programming emphasizes clean code, maintainable architecture, and scalable systems. Core languages include Python for AI/data science, JavaScript/TypeScript for web development, Rust/Go for systems programming, and specialized languages for different domains. Key concepts include object-oriented programming, functional programming, design patterns, microservices architecture, and DevOps practices.
-
-## COMPUTER SCIENCE FUNDAMENTALS
-Computer science rests on algorithms, data structures, and computational complexity. Important algorithms include sorting (quicksort, mergesort), searching (binary search, graph traversal), and optimization techniques. Data structures like arrays, trees, hash tables, and graphs enable efficient data manipulation. Systems design considers scalability, reliability, and performance across distributed architectures.
-
-## MATHEMATICS & STATISTICS
-Mathematics provides the foundation for computational thinking and problem-solving. Linear algebra enables machine learning through matrix operations and vector spaces. Calculus describes change and optimization through derivatives and integrals. Statistics and probability enable data analysis, hypothesis testing, and uncertainty quantification. These mathematical tools are essential for AI, engineering, and scientific research.
-
-## HUMAN PSYCHOLOGY & BEHAVIOR
-Understanding human psychology improves communication, leadership, and system design. Cognitive psychology explores memory, attention, and decision-making processes. Social psychology examines group dynamics, persuasion, and cultural influences. Behavioral economics reveals cognitive biases that affect rational decision-making. This knowledge enables better user experience design and more effective human-computer interaction.
-
-## BUSINESS & ECONOMICS
-Modern economics balances market forces with social outcomes. Microeconomics studies individual decision-making and market mechanisms. Macroeconomics examines large-scale economic trends, monetary policy, and international trade. Business strategy involves competitive analysis, value creation, and stakeholder management. Entrepreneurship requires understanding market needs, building products, and scaling operations.
-
-## COMMUNICATION & RELATIONSHIPS
-Effective communication requires empathy, active listening, and cultural awareness. Technical communication involves explaining complex concepts clearly to diverse audiences. Leadership communication inspires and motivates teams toward shared goals. Interpersonal relationships benefit from emotional intelligence, conflict resolution skills, and mutual respect. Digital communication adds complexity requiring attention to presence and authenticity.
+    def get_stats(self) -> Dict:
+        """Queue, per-backend residency and cache counters in one place"""
+        return {
+            "queues": self.scheduler.get_stats(),
+            "backends": self.backends.get_stats(),
+            "response_cache": self.response_cache.get_stats()
+        }
+    
+    def close(self):
+        """Release pooled connections and worker threads"""
+        self._executor.shutdown(wait=False)
+        self.backends.close()
 
-## HEALTH & WELLNESS
-Human health encompasses physical, mental, and social well-being. Nutrition, exercise, sleep, and stress management form the foundation of physical health. Mental health involves emotional regulation, resilience, and healthy coping mechanisms. Social connections and meaningful relationships contribute significantly to overall wellness. Preventive care and early intervention often provide better outcomes than reactive treatment.
+# 🧲 SEMANTIC RESPONSE CACHE
+QUESTION_FILLER_WORDS = {"a", "an", "the", "i", "me", "my", "you", "your", "do", "does", "can", "could",
+                         "how", "what", "is", "are", "to", "of", "please", "explain", "tell", "help", "with"}
 
-## LEARNING & EDUCATION
-Effective learning combines multiple strategies and modalities. Active learning engages students through practice, discussion, and application. Spaced repetition and interleaving improve long-term retention. Metacognitive skills help learners monitor and adjust their learning strategies. Growth mindset encourages persistence through challenges and learning from mistakes.
+class SemanticResponseCache:
+    """Per-agent cache of answers looked up by cosine similarity of hashed n-gram embeddings (offline, NumPy only)"""
+    
+    def __init__(self, config: Dict = None):
+        self.config = config or SEMANTIC_CACHE_CONFIG
+        self.enabled = self.config.get("enabled", False)
+        self.agents = self.config.get("agents")  # None = every agent
+        self.threshold = self.config.get("similarity_threshold", 0.9)
+        self.dim = self.config.get("embedding_dim", 1024)
+        self.max_entries = self.config.get("max_entries_per_agent", 500)
+        self.replay_words = self.config.get("replay_words_per_chunk", 3)
+        self._vectors = {}  # agent -> (n, dim) float32 matrix
+        self._entries = {}  # agent -> list of {"response", "goals_fingerprint", "message"}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "invalidations": 0}
+    
+    @staticmethod
+    def fingerprint(prompt_prefix: str) -> str:
+        """Hash of the static prompt - changes whenever the agent prompt or goal block changes"""
+        return hashlib.sha1(prompt_prefix.encode("utf-8")).hexdigest()
+    
+    def _applies_to(self, agent_type: str) -> bool:
+        return self.enabled and (self.agents is None or agent_type in self.agents)
+    
+    def embed(self, text: str) -> np.ndarray:
+        """Hashed word + character-trigram features, L2-normalized (filler words barely count)"""
+        vector = np.zeros(self.dim, dtype=np.float32)
+        words = re.findall(r"\w+", text.lower())
+        for word in words:
+            if word in QUESTION_FILLER_WORDS:
+                vector[zlib.crc32(word.encode("utf-8")) % self.dim] += 0.2
+                continue
+            vector[zlib.crc32(word.encode("utf-8")) % self.dim] += 1.0
+            padded = f"#{word}#"
+            for i in range(len(padded) - 2):
+                vector[zlib.crc32(padded[i:i + 3].encode("utf-8")) % self.dim] += 0.5
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+    
+    @staticmethod
+    def numbers_in(text: str) -> Tuple[str, ...]:
+        """Numeric tokens ("2x", "7") - homework with different numbers needs a different answer"""
+        return tuple(sorted(re.findall(r"\d+\w*", text.lower())))
+    
+    def lookup(self, agent_type: str, user_message: str, goals_fingerprint: str) -> Optional[Dict]:
+        """Best cached answer above the similarity threshold, or None"""
+        if not self._applies_to(agent_type):
+            return None
+        query = self.embed(user_message)
+        numbers = self.numbers_in(user_message)
+        with self._lock:
+            vectors = self._vectors.get(agent_type)
+            if vectors is None or not len(vectors):
+                self.stats["misses"] += 1
+                return None
+            similarities = vectors @ query
+            for i, entry in enumerate(self._entries[agent_type]):
+                # Answers written against other goals are skipped, not dropped - the goals picked for
+                # the prompt vary per message, and the next message may rank the same ones again
+                if entry["numbers"] != numbers or entry["goals_fingerprint"] != goals_fingerprint:
+                    similarities[i] = -1.0
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            if similarity < self.threshold:
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            entry = self._entries[agent_type][best]
+        print(f"🧲 Semantic cache hit for {agent_type} ({similarity:.3f}): {entry['message'][:60]}")
+        return {"response": entry["response"], "similarity": round(similarity, 3)}
+    
+    def store(self, agent_type: str, user_message: str, goals_fingerprint: str, response: str):
+        if not self._applies_to(agent_type) or not response or not response.strip():
+            return
+        vector = self.embed(user_message)[np.newaxis, :]
+        with self._lock:
+            entries = self._entries.setdefault(agent_type, [])
+            vectors = self._vectors.get(agent_type)
+            entries.append({"response": response, "goals_fingerprint": goals_fingerprint,
+                            "message": user_message, "numbers": self.numbers_in(user_message)})
+            vectors = vector if vectors is None else np.vstack([vectors, vector])
+            if len(entries) > self.max_entries:  # Oldest answers go first
+                del entries[:len(entries) - self.max_entries]
+                vectors = vectors[-self.max_entries:]
+            self._vectors[agent_type] = vectors
+            self.stats["stores"] += 1
+    
+    def invalidate(self, agent_type: str = None):
+        with self._lock:
+            for agent in ([agent_type] if agent_type else list(self._entries)):
+                self.stats["invalidations"] += len(self._entries.pop(agent, []))
+                self._vectors.pop(agent, None)
+    
+    def replay_chunks(self, response: str):
+        """Split a cached answer into small pieces so it streams like a live one"""
+        words = re.findall(r"\s*\S+\s*", response)
+        for i in range(0, len(words), self.replay_words):
+            yield "".join(words[i:i + self.replay_words])
+    
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {**self.stats, "entries": sum(len(e) for e in self._entries.values())}
 
-## PROBLEM-SOLVING & CRITICAL THINKING
-Problem-solving involves defining the problem, generating alternatives, evaluating options, and implementing solutions. Critical thinking requires analyzing arguments, evaluating evidence, and identifying logical fallacies. Systems thinking considers interconnections, feedback loops, and unintended consequences. Creative problem-solving combines analytical and intuitive approaches to generate innovative solutions.
+# 📏 PROMPT TOKEN BUDGET
+TRUNCATION_MARKER = " …[trimmed]"
 
-This knowledge base provides comprehensive context for intelligent responses across technical, scientific, business, and human domains.
-"""
-        
-        try:
-            with open("intelligent_worldview.txt", "w", encoding="utf-8") as f:
-                f.write(basic_worldview)
-            print("✅ Created basic intelligent_worldview.txt")
-            self.load_knowledge_base()  # Reload the created file
-        except Exception as e:
-            print(f"❌ Error creating worldview file: {e}")
-            # Keep basic content in memory
-            self.knowledge_chunks = basic_worldview.split('\n\n')
+class PromptBudget:
+    """Estimates tokens per prompt section and fits sections into per-section caps and a total budget"""
     
-    def create_vector_index(self):
-        """Create FAISS vector indices for each knowledge base"""
-        if not hasattr(self, 'knowledge_bases') or not self.knowledge_bases:
-            return
-            
-        try:
-            import faiss
-            import numpy as np
-            
-            self.indices = {}
-            
-            print("🔄 Generating embeddings for specialized knowledge bases...")
-            
-            for kb_type, kb_data in self.knowledge_bases.items():
-                chunks = kb_data["chunks"]
-                if not chunks:
-                    continue
-                    
-                print(f"  🧠 Processing {kb_type} knowledge base ({len(chunks)} chunks)...")
-                
-                # Generate embeddings for this knowledge base
-                embeddings = self.model.encode(chunks)
-                embeddings_array = np.array(embeddings).astype('float32')
-                
-                # Create FAISS index for this knowledge base
-                dimension = embeddings_array.shape[1]
-                index = faiss.IndexFlatIP(dimension)
-                
-                # Normalize for cosine similarity
-                faiss.normalize_L2(embeddings_array)
-                index.add(embeddings_array)
-                
-                self.indices[kb_type] = {
-                    "index": index,
-                    "chunks": chunks,
-                    "embeddings": embeddings_array,
-                    "agents": kb_data["agents"],
-                    "file": kb_data["file"]
-                }
-                
-                print(f"  ✅ {kb_type.upper()}: {len(chunks)} chunks indexed")
-            
-            print(f"🚀 AGI-tier vector indices created for {len(self.indices)} knowledge bases!")
-            
-        except Exception as e:
-            print(f"❌ Error creating vector indices: {e}")
-            self.indices = {}
+    def __init__(self, config: Dict = None):
+        self.config = config or PROMPT_BUDGET_CONFIG
+        self.enabled = self.config.get("enabled", True)
+        self.total_tokens = self.config.get("total_tokens", 3000)
+        self.chars_per_token = self.config.get("chars_per_token", 4.0)
+        self.sections = self.config.get("sections", {})
     
-    def semantic_search(self, query: str, agent_type: str, top_k: int = 3) -> List[str]:
-        """Perform intelligent semantic search using agent-specific knowledge base"""
-        if not hasattr(self, 'indices') or not self.indices:
-            return []
-            
-        try:
-            import faiss
-            import numpy as np
-            
-            # Determine which knowledge base to use based on agent type
-            selected_kb = self._select_knowledge_base(agent_type)
-            
-            if not selected_kb or selected_kb not in self.indices:
-                print(f"⚠️ No knowledge base found for agent: {agent_type}")
-                return []
-                
-            kb_data = self.indices[selected_kb]
-            index = kb_data["index"]
-            chunks = kb_data["chunks"]
-            
-            print(f"🔍 Using {selected_kb.upper()} knowledge ({kb_data['file']}) for {agent_type}")
-            
-            # Encode query
-            query_embedding = self.model.encode([query])
-            query_embedding = np.array(query_embedding).astype('float32')
-            faiss.normalize_L2(query_embedding)
-            
-            # Search for similar chunks in the selected knowledge base
-            scores, indices = index.search(query_embedding, top_k)
-            
-            # Return top matching chunks with scores
-            results = []
-            for i, idx in enumerate(indices[0]):
-                if idx < len(chunks):
-                    score = scores[0][i]
-                    results.append(f"[Score: {score:.3f}] {chunks[idx]}")
-            
-            return results
-            
-        except Exception as e:
-            print(f"❌ Semantic search error: {e}")
-            return []
+    def estimate(self, text: str) -> int:
+        """Approximate token count (characters / chars_per_token, rounded up)"""
+        return int(-(-len(text) // self.chars_per_token)) if text else 0
     
-    def _select_knowledge_base(self, agent_type: str) -> str:
-        """Select appropriate knowledge base based on agent type"""
-        # Clean agent type for matching
-        agent_clean = agent_type.lower().replace("_", "").replace("-", "")
-        
-        for kb_type, kb_data in self.indices.items():
-            for agent_pattern in kb_data["agents"]:
-                agent_pattern_clean = agent_pattern.lower().replace("_", "").replace("-", "")
-                if agent_pattern_clean in agent_clean or agent_clean in agent_pattern_clean:
-                    return kb_type
-        
-        # Default fallback - prefer technical for coding-related, worldview for others
-        coding_keywords = ["code", "program", "tech", "dev", "ai", "ml", "cyber", "fullstack", "mobile"]
-        if any(keyword in agent_clean for keyword in coding_keywords):
-            return "technical" if "technical" in self.indices else "worldview"
-        else:
-            return "worldview" if "worldview" in self.indices else "technical"
+    def cap(self, section: str) -> Optional[int]:
+        return self.sections.get(section, {}).get("max_tokens") if self.enabled else None
     
-    def get_relevant_worldview(self, query: str, agent_type: str) -> str:
-        """Get relevant worldview context using intelligent agent-specific semantic search"""
-        # Combine query with agent type for better context  
-        search_query = f"{query} {agent_type}"
+    def priority(self, section: str) -> int:
+        return self.sections.get(section, {}).get("priority", 0)
+    
+    def keep(self, section: str) -> bool:
+        """Sections that are never cut, whatever the budget"""
+        return self.sections.get(section, {}).get("keep", False)
+    
+    def truncate(self, text: str, max_tokens: Optional[int]) -> str:
+        """Cut text to max_tokens at a line or word boundary"""
+        if max_tokens is None or self.estimate(text) <= max_tokens:
+            return text
+        limit = int(max_tokens * self.chars_per_token) - len(TRUNCATION_MARKER)
+        if limit <= 0:
+            return ""
+        cut = text[:limit]
+        boundary = max(cut.rfind("\n"), cut.rfind(" "))
+        if boundary > limit // 2:
+            cut = cut[:boundary]
+        return cut.rstrip() + TRUNCATION_MARKER
+    
+    @staticmethod
+    def dedupe_lines(text: str) -> str:
+        """Drop repeated lines (several OCR passes often read the same text)"""
+        seen = set()
+        lines = []
+        for line in text.split("\n"):
+            key = line.strip().lower()
+            if key and key in seen:
+                continue
+            seen.add(key)
+            lines.append(line)
+        return "\n".join(lines)
+    
+    def _choose(self, variants: List[str], max_tokens: Optional[int]) -> str:
+        """Most detailed variant that fits, else the most compact one truncated"""
+        for variant in variants:
+            if max_tokens is None or self.estimate(variant) <= max_tokens:
+                return variant
+        return self.truncate(variants[-1], max_tokens)
+    
+    def fit(self, sections: Dict[str, Any], reserved_tokens: int = 0) -> Tuple[Dict[str, str], Dict]:
+        """Fit sections into their caps and the total budget.
         
-        # Perform intelligent semantic search with agent-specific knowledge base
-        relevant_chunks = self.semantic_search(search_query, agent_type, top_k=3)
+        Each section is a string or a list of variants from most to least detailed.
+        Sections with the highest priority number are compacted first when over budget; "keep"
+        sections are never cut. Returns (fitted sections, report with per-section token counts and
+        "over_budget" - tokens still over once everything else is compacted).
+        """
+        variants = {name: value if isinstance(value, list) else [value] for name, value in sections.items()}
+        fitted = {name: variants[name][0] if self.keep(name) else self._choose(options, self.cap(name))
+                  for name, options in variants.items()}
         
-        if relevant_chunks:
-            # Determine which knowledge base was used
-            selected_kb = self._select_knowledge_base(agent_type)
-            kb_name = selected_kb.upper() if selected_kb else "UNKNOWN"
-            
-            worldview_context = f"\n\n🧠 {kb_name} KNOWLEDGE CONTEXT:\n"
-            for i, chunk in enumerate(relevant_chunks):
-                worldview_context += f"\n[KNOWLEDGE CHUNK {i+1}]:\n{chunk}\n"
-            worldview_context += f"\nUse this specialized {kb_name.lower()} knowledge to provide genius-level responses.\n"
-            return worldview_context
+        over = 0
+        if self.enabled:
+            over = reserved_tokens + sum(self.estimate(text) for text in fitted.values()) - self.total_tokens
+            for name in sorted(fitted, key=self.priority, reverse=True):
+                if over <= 0:
+                    break
+                if self.keep(name):
+                    continue
+                tokens = self.estimate(fitted[name])
+                fitted[name] = self._choose(variants[name], max(tokens - over, 0))
+                over -= tokens - self.estimate(fitted[name])
         
-        return ""
-    
-    def load_basic_worldview(self):
-        """Fallback method for basic keyword matching"""
-        try:
-            with open("intelligent_worldview.txt", "r", encoding="utf-8") as f:
-                self.worldview_content = f.read()
-            print(f"✅ Loaded basic worldview: {len(self.worldview_content)} characters")
-        except FileNotFoundError:
-            self.worldview_content = "Basic worldview knowledge not available."
+        report = {
+            "sections": {name: self.estimate(text) for name, text in fitted.items()},
+            "compacted": [name for name in fitted if fitted[name] != variants[name][0]],
+            "over_budget": max(over, 0)
+        }
+        return fitted, report
 
 # 🤖 PROACTIVE DECISION ENGINE
 class ProactiveDecisionEngine:
-    def __init__(self):
+    def __init__(self, inference: OllamaInferenceClient = None):
+        self.inference = inference or OllamaInferenceClient.shared()
         self.model = MODEL_CONFIG["thinking_model"]  # qwen3:0.6b (not used in simplified logic)
         self.threshold = GOALS_CONFIG["proactive_threshold"]
         self.anti_agreeable_threshold = GOALS_CONFIG["anti_agreeable_threshold"]
@@ -803,9 +3332,10 @@ SUGGEST_GOALS: YES
 """
         
         try:
-            response = ollama.generate(
+            response = self.inference.generate(
                 model=self.model,
                 prompt=decision_prompt,
+                kind="proactive",
                 options={
                     "temperature": 0.1,
                     "top_p": 0.8,
@@ -870,9 +3400,10 @@ FOCUS: what should the remaining rounds focus on
 """
         
         try:
-            response = ollama.generate(
+            response = self.inference.generate(
                 model=self.model,
                 prompt=continuation_prompt,
+                kind="proactive",
                 options={
                     "temperature": 0.2,
                     "top_p": 0.8,
@@ -942,9 +3473,10 @@ GOAL3: [specific goal title]
 """
         
         try:
-            response = ollama.generate(
+            response = self.inference.generate(
                 model=self.model,
                 prompt=goal_prompt,
+                kind="proactive",
                 options={
                     "temperature": 0.3,
                     "top_p": 0.9,
@@ -1048,7 +3580,8 @@ GOAL3: [specific goal title]
 
 # 💬 FOLLOW-UP GENERATOR
 class FollowUpGenerator:
-    def __init__(self):
+    def __init__(self, inference: OllamaInferenceClient = None):
+        self.inference = inference or OllamaInferenceClient.shared()
         self.model = MODEL_CONFIG["follow_up_model"]  # qwen3:1.7b (FAST!)
     
     def generate_goal_focused_follow_up(self, conversation_state: ConversationState,
@@ -1106,9 +3639,10 @@ Generate 1-2 sentences that speak directly to the user with {agent_mode} perspec
 """
 
         try:
-            response = ollama.generate(
+            response = self.inference.generate(
                 model=self.model,
                 prompt=follow_up_prompt,
+                kind="proactive",
                 options={"temperature": 0.8, "max_tokens": 150}  # Keep it short and fast
             )
             return response['response'].strip()
@@ -1185,9 +3719,10 @@ Generate only the follow-up message, no labels or formatting:
 """
         
         try:
-            response = ollama.generate(
+            response = self.inference.generate(
                 model="gemma3:1b",  # Use Gemma 3:1b for proactive responses
                 prompt=follow_up_prompt,
+                kind="proactive",
                 options={
                     "temperature": 0.6,
                     "top_p": 0.9,
@@ -1255,9 +3790,10 @@ GENERATE YOUR 3 GOALS WITH MILESTONES AND ROUTINES NOW:
 """
         
         try:
-            response = ollama.generate(
+            response = self.inference.generate(
                 model="gemma3:1b",  # Use Gemma 3:1b for goal suggestions
                 prompt=suggestions_prompt,
+                kind="proactive",
                 options={
                     "temperature": 0.4,
                     "top_p": 0.9,
@@ -1314,7 +3850,8 @@ GENERATE YOUR 3 GOALS WITH MILESTONES AND ROUTINES NOW:
 
 # 📷 AGI-TIER MULTIMODAL PROCESSOR
 class MultimodalProcessor:
-    def __init__(self):
+    def __init__(self, inference: OllamaInferenceClient = None):
+        self.inference = inference or OllamaInferenceClient.shared()
         self.enabled = MULTIMODAL_CONFIG["camera_enabled"]
         self.max_size = MULTIMODAL_CONFIG["max_image_size"]
         self.supported_formats = MULTIMODAL_CONFIG["supported_formats"]
@@ -1539,9 +4076,10 @@ Be specific and detailed in your analysis.
             
             for model in vision_models:
                 try:
-                    response = ollama.generate(
+                    response = self.inference.generate(
                         model=model,
                         prompt=vision_prompt,
+                        kind="vision",
                         images=[img_base64],
                         options={"temperature": 0.3, "max_tokens": 300}
                     )
@@ -1595,19 +4133,391 @@ Be specific and detailed in your analysis.
 
 # 💫 MULTI-ROUND PROACTIVE SYSTEM
 class MultiRoundProactiveSystem:
-    def __init__(self):
-        self.decision_engine = ProactiveDecisionEngine()
-        self.follow_up_generator = FollowUpGenerator()
+    def __init__(self, inference: OllamaInferenceClient = None):
+        self.decision_engine = ProactiveDecisionEngine(inference)
+        self.follow_up_generator = FollowUpGenerator(inference)
+
+# 🔀 AGENT KEYWORD ROUTER
+class AgentKeywordRouter:
+    """Every agent keyword compiled once into a phrase -> agents hash table.
+    
+    The message is tokenized in one pass and each position is looked up longest phrase first
+    (plurals allowed), so cost grows with message length only - and "ai" no longer fires inside "said".
+    """
+    
+    WORD_PATTERN = re.compile(r"[a-z0-9]+")
+    
+    def __init__(self, agents: Dict[str, Dict], default_agent: str = "general"):
+        self.agent_ids = list(agents)
+        self.default_agent = default_agent
+        self.keyword_agents = {}  # "first aid" -> agents listing it, in agent order
+        for agent_id, agent_config in agents.items():
+            for keyword in agent_config.get("keywords", []):
+                phrase = " ".join(self.WORD_PATTERN.findall(keyword.lower()))
+                if phrase and agent_id not in self.keyword_agents.setdefault(phrase, []):
+                    self.keyword_agents[phrase].append(agent_id)
+        self.max_words = max((phrase.count(" ") + 1 for phrase in self.keyword_agents), default=0)
+        self.phrase_starts = {phrase.split(" ", 1)[0] for phrase in self.keyword_agents if " " in phrase}
+    
+    def _lookup(self, phrase: str) -> Optional[str]:
+        if phrase in self.keyword_agents:
+            return phrase
+        if phrase.endswith("s"):  # images -> image, classes -> class
+            for stem in (phrase[:-1], phrase[:-2] if phrase.endswith("es") else None):
+                if stem in self.keyword_agents:
+                    return stem
+        return None
+    
+    def matches(self, message: str) -> Dict[str, List[str]]:
+        """Agent -> distinct keywords it matched in the message"""
+        words = self.WORD_PATTERN.findall(message.lower())
+        found = {}
+        i = 0
+        while i < len(words):
+            keyword, width = None, 1
+            if words[i] in self.phrase_starts:  # Only these can begin a multi-word keyword
+                for n in range(min(self.max_words, len(words) - i), 1, -1):
+                    keyword = self._lookup(" ".join(words[i:i + n]))
+                    if keyword:
+                        width = n
+                        break
+            keyword = keyword or self._lookup(words[i])
+            if keyword:
+                found[keyword] = None
+            i += width
+        
+        matched = {}
+        for keyword in found:
+            for agent_id in self.keyword_agents[keyword]:
+                matched.setdefault(agent_id, []).append(keyword)
+        return matched
+    
+    def scores(self, message: str) -> Dict[str, int]:
+        """Agent -> number of distinct keywords matched (agents with no hits are left out)"""
+        return {agent_id: len(keywords) for agent_id, keywords in self.matches(message).items()}
+    
+    def route(self, message: str) -> Tuple[str, Dict[str, int]]:
+        """(best agent, per-agent scores) - ties go to the agent listed first, no hits to the default"""
+        scores = self.scores(message)
+        best_match, best_score = self.default_agent, 0
+        for agent_id in self.agent_ids:
+            if scores.get(agent_id, 0) > best_score:
+                best_match, best_score = agent_id, scores[agent_id]
+        return best_match, scores
+    
+    def route_many(self, messages: List[str]) -> List[Tuple[str, Dict[str, int]]]:
+        """Route a batch of messages with the same compiled pattern"""
+        return [self.route(message) for message in messages]
+
+# 🎓 AGENT INTENT CLASSIFIER
+class AgentIntentClassifier:
+    """Linear softmax router over hashed word, word-bigram and character-trigram features (NumPy only).
+    
+    Trained from each agent's keywords, description and prompt, the shipped labeled examples and an
+    optional routing log. Weights are one float32 .npy - a row per hash bucket plus a bias row - opened
+    with mmap, so startup only reads the metadata and a prediction touches the few rows its features hit.
+    Missing or stale weights are retrained on a background thread; until then routing uses keywords.
+    """
+    
+    def __init__(self, agents: Dict[str, Dict], config: Dict = None):
+        self.config = config or INTENT_CLASSIFIER_CONFIG
+        self.agents = agents
+        self.enabled = self.config.get("enabled", False)
+        self.buckets = self.config.get("hash_buckets", 32768)
+        self.threshold = self.config.get("confidence_threshold", 0.5)
+        self.weights_path = self.config.get("weights_path", "agent_intent_weights.npy")
+        self.meta_path = os.path.splitext(self.weights_path)[0] + ".json"
+        self.log_path = self.config.get("routing_log_path")
+        self.examples_path = self.config.get("examples_path")
+        self.labels = []
+        self.weights = None
+        self._log_lock = threading.Lock()
+        self._training_thread = None
+        self.stats = {"predictions": 0, "confident": 0, "fallbacks": 0}
+        if self.enabled and not self.load() and self.config.get("train_if_missing", True):
+            self.train_in_background()
+    
+    # Features
+    def features(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """(bucket indices, L2-normalized weights) - filler words barely count"""
+        counts = {}
+        words = re.findall(r"\w+", text.lower())
+        for word in words:
+            if word in QUESTION_FILLER_WORDS:
+                grams = [(word, 0.2)]
+            else:
+                padded = f"#{word}#"
+                grams = [(word, 1.0)] + [(padded[i:i + 3], 0.5) for i in range(len(padded) - 2)]
+            for gram, weight in grams:
+                bucket = zlib.crc32(gram.encode("utf-8")) % self.buckets
+                counts[bucket] = counts.get(bucket, 0.0) + weight
+        for first, second in zip(words, words[1:]):
+            bucket = zlib.crc32(f"{first} {second}".encode("utf-8")) % self.buckets
+            counts[bucket] = counts.get(bucket, 0.0) + 1.0
+        indices = np.fromiter(counts, dtype=np.int64, count=len(counts))
+        values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+        norm = np.linalg.norm(values)
+        return indices, (values / norm if norm else values)
+    
+    # Training data
+    def fingerprint(self) -> str:
+        """Changes whenever an agent's keywords, description or prompt or the shipped examples change"""
+        source = {agent_id: [config.get("keywords", []), config.get("description", ""), config.get("prompt", "")]
+                  for agent_id, config in self.agents.items()}
+        source["__examples__"] = self.log_samples(self.examples_path) if self.examples_path else []
+        return hashlib.sha1(json.dumps(source, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    
+    def agent_samples(self) -> List[Tuple[str, str]]:
+        """(text, agent) pairs from the agent configs: each keyword, the name/description, prompt lines"""
+        samples = []
+        for agent_id, config in self.agents.items():
+            samples += [(keyword, agent_id) for keyword in config.get("keywords", [])]
+            samples.append((f"{config.get('name', '')} {config.get('description', '')}", agent_id))
+            for line in re.split(r"[\n.!?]+", config.get("prompt", "")):
+                line = line.strip(" -•*:\t")
+                if len(line.split()) >= 3:
+                    samples.append((line, agent_id))
+        return samples
+    
+    def log_samples(self, path: str = None) -> List[Tuple[str, str]]:
+        """Labeled routing log lines {"message": ..., "agent": ...} for agents that still exist"""
+        path = path or self.log_path
+        if not path or not os.path.exists(path):
+            return []
+        samples = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get("agent") in self.agents and record.get("message"):
+                    samples.append((record["message"], record["agent"]))
+        return samples
+    
+    def example_samples(self) -> List[Tuple[str, str]]:
+        """Labeled user messages shipped with the app (same format as the routing log)"""
+        return self.log_samples(self.examples_path) if self.examples_path else []
+    
+    def log_selection(self, message: str, agent_type: str):
+        """Append a hand-routed message to the routing log (when enabled) for the next training run"""
+        if not self.config.get("log_selected_agents") or not self.log_path or not message.strip():
+            return
+        try:
+            with self._log_lock, open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"message": message, "agent": agent_type,
+                                    "timestamp": datetime.now().isoformat()}) + "\n")
+        except Exception as e:
+            print(f"⚠️ Could not write routing log: {e}")
+    
+    # Training
+    def fit(self, samples: List[Tuple[str, str]], epochs: int = None) -> np.ndarray:
+        """Full-batch gradient descent on class-balanced softmax cross-entropy -> (buckets + 1, agents) weights"""
+        epochs = epochs or self.config.get("epochs", 150)
+        learning_rate = self.config.get("learning_rate", 0.5)
+        l2 = self.config.get("l2", 1e-5)
+        labels = list(self.agents)
+        label_index = {agent_id: i for i, agent_id in enumerate(labels)}
+        
+        # Sparse design matrix as flat (row, bucket, value) arrays
+        featurized = [self.features(text) for text, _ in samples]
+        rows = np.repeat(np.arange(len(samples)), [len(indices) for indices, _ in featurized])
+        columns = np.concatenate([indices for indices, _ in featurized])
+        values = np.concatenate([values for _, values in featurized])
+        targets = np.array([label_index[agent_id] for _, agent_id in samples])
+        onehot = np.eye(len(labels), dtype=np.float32)[targets]
+        class_counts = np.bincount(targets, minlength=len(labels))
+        sample_weights = (len(samples) / (len(labels) * np.maximum(class_counts, 1)))[targets] / len(samples)
+        
+        weights = np.zeros((self.buckets + 1, len(labels)), dtype=np.float32)
+        squared = np.full_like(weights, 1e-8)  # Adagrad: rare n-grams keep a large step size
+        for _ in range(epochs):
+            logits = np.zeros((len(samples), len(labels)), dtype=np.float32)
+            np.add.at(logits, rows, weights[columns] * values[:, None])
+            logits += weights[-1]
+            probabilities = self._softmax(logits)
+            gradient = ((probabilities - onehot) * sample_weights[:, None]).astype(np.float32)
+            update = np.zeros_like(weights)
+            np.add.at(update, columns, gradient[rows] * values[:, None])
+            update[-1] = gradient.sum(axis=0)
+            update += l2 * weights
+            squared += update * update
+            weights -= learning_rate * update / np.sqrt(squared)
+        self.labels = labels
+        return weights
+    
+    def train(self, log_path: str = None, save: bool = True, epochs: int = None) -> Dict:
+        """Train from the agent configs + routing log and (optionally) save the weights for mmap loading"""
+        started = time.time()
+        samples = self.agent_samples() + self.example_samples() + self.log_samples(log_path)
+        self.weights = self.fit(samples, epochs)
+        accuracy = self.accuracy(samples)
+        report = {"samples": len(samples), "agents": len(self.labels), "train_accuracy": accuracy,
+                  "seconds": round(time.time() - started, 2)}
+        if save:
+            self.save(report)
+        print(f"🎓 Intent classifier trained: {report}")
+        return report
+    
+    def train_in_background(self) -> threading.Thread:
+        """Train + save on a daemon thread so startup doesn't wait; route() uses keywords meanwhile"""
+        def run():
+            try:
+                self.train(save=True)
+            except Exception as e:
+                print(f"⚠️ Intent classifier training failed: {e}")
+        
+        print("🎓 Intent classifier weights missing or stale - training in the background")
+        self._training_thread = threading.Thread(target=run, name="intent-classifier-train", daemon=True)
+        self._training_thread.start()
+        return self._training_thread
+    
+    def wait_until_trained(self, timeout: float = None) -> bool:
+        """Block until a background training run finishes; True when weights are available"""
+        if self._training_thread is not None:
+            self._training_thread.join(timeout)
+        return self.weights is not None
+    
+    def save(self, report: Dict = None):
+        """Write weights + metadata atomically (temp file, then rename) and reopen the weights with mmap"""
+        temp_path = self.weights_path + ".tmp"
+        with open(temp_path, "wb") as f:
+            np.save(f, np.ascontiguousarray(self.weights, dtype=np.float32))
+        os.replace(temp_path, self.weights_path)
+        with open(self.meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"labels": self.labels, "hash_buckets": self.buckets, "fingerprint": self.fingerprint(),
+                       "trained_at": datetime.now().isoformat(), **(report or {})}, f, indent=2)
+        os.replace(self.meta_path + ".tmp", self.meta_path)
+        self.load()
+    
+    def load(self) -> bool:
+        """mmap the saved weights if they match the current agents and hashing; False if missing/stale"""
+        try:
+            with open(self.meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("fingerprint") != self.fingerprint() or meta.get("hash_buckets") != self.buckets \
+                    or set(meta.get("labels", [])) - set(self.agents):
+                print("🎓 Intent classifier weights are stale - agents changed")
+                return False
+            weights = np.load(self.weights_path, mmap_mode="r")
+            if weights.shape != (self.buckets + 1, len(meta["labels"])):
+                return False
+            self.labels, self.weights = meta["labels"], weights
+            return True
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            print(f"⚠️ Could not load intent classifier: {e}")
+            return False
+    
+    # Prediction
+    @staticmethod
+    def _softmax(logits: np.ndarray) -> np.ndarray:
+        exp = np.exp(logits - logits.max(axis=-1, keepdims=True))
+        return exp / exp.sum(axis=-1, keepdims=True)
+    
+    def predict_proba(self, text: str) -> Dict[str, float]:
+        """Agent -> probability (empty when the classifier isn't available)"""
+        if self.weights is None:
+            return {}
+        indices, values = self.features(text)
+        logits = values @ self.weights[indices] + self.weights[-1] if len(indices) else np.array(self.weights[-1])
+        return dict(zip(self.labels, self._softmax(logits).tolist()))
+    
+    def predict(self, text: str) -> Tuple[Optional[str], float]:
+        """(most likely agent, its probability) - (None, 0.0) without weights"""
+        probabilities = self.predict_proba(text)
+        if not probabilities:
+            return None, 0.0
+        agent_id = max(probabilities, key=probabilities.get)
+        return agent_id, probabilities[agent_id]
+    
+    def route(self, text: str, keyword_router: "AgentKeywordRouter") -> Tuple[str, float, str]:
+        """(agent, confidence, "classifier" | "keywords").
+        
+        A keyword hit stands unless the classifier is at least confidence_threshold sure of another
+        agent; messages no keyword matches are left to the classifier.
+        """
+        agent_id, confidence = self.predict(text)
+        keyword_agent, scores = keyword_router.route(text)
+        self.stats["predictions"] += 1
+        if agent_id is not None and (confidence >= self.threshold or not scores):
+            self.stats["confident"] += 1
+            return agent_id, confidence, "classifier"
+        self.stats["fallbacks"] += 1
+        return keyword_agent, confidence, "keywords"
+    
+    def accuracy(self, samples: List[Tuple[str, str]]) -> float:
+        if not samples:
+            return 0.0
+        return round(sum(self.predict(text)[0] == agent_id for text, agent_id in samples) / len(samples), 3)
+    
+    def get_stats(self) -> Dict:
+        return {**self.stats, "loaded": self.weights is not None, "agents": len(self.labels),
+                "mmap": isinstance(self.weights, np.memmap)}
+    
+    def benchmark(self, samples: List[Tuple[str, str]], keyword_router: "AgentKeywordRouter") -> Dict:
+        """Accuracy and per-message latency of keywords only, classifier only and classifier + fallback"""
+        methods = {
+            "keywords": lambda text: keyword_router.route(text)[0],
+            "classifier": lambda text: self.predict(text)[0],
+            "hybrid": lambda text: self.route(text, keyword_router)[0],
+        }
+        results = {}
+        for name, method in methods.items():
+            latencies, correct = [], 0
+            for text, agent_id in samples:
+                started = time.perf_counter()
+                correct += method(text) == agent_id
+                latencies.append((time.perf_counter() - started) * 1000)
+            latencies.sort()
+            results[name] = {
+                "accuracy": round(correct / len(samples), 3) if samples else 0.0,
+                "p50_ms": round(latencies[len(latencies) // 2], 3) if latencies else 0.0,
+                "p99_ms": round(latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)], 3)
+                if latencies else 0.0,
+            }
+        
+        # Hybrid accuracy and keyword-fallback rate at other thresholds, to tune confidence_threshold
+        predictions = [(self.predict(text), keyword_router.route(text), agent_id) for text, agent_id in samples]
+        
+        def keeps_keywords(confidence, scores, threshold):
+            return bool(scores) and confidence < threshold
+        
+        results["thresholds"] = {
+            threshold: {
+                "accuracy": round(sum((keyword if keeps_keywords(confidence, scores, threshold) else predicted)
+                                      == agent_id
+                                      for (predicted, confidence), (keyword, scores), agent_id in predictions)
+                                  / len(samples), 3) if samples else 0.0,
+                "fallback_rate": round(sum(keeps_keywords(confidence, scores, threshold)
+                                           for (_, confidence), (_, scores), _ in predictions)
+                                       / len(samples), 3) if samples else 0.0,
+            } for threshold in (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7)
+        }
+        return results
 
 # 🧠 CORE GEMMA AGENT SYSTEM
 class GemmaAgentSystem:
     def __init__(self):
         self.agents = HACKATHON_AGENTS
+        self.router = AgentKeywordRouter(self.agents)  # Keywords compiled once
+        self.intent_classifier = AgentIntentClassifier(self.agents)  # mmap-loaded weights, trained if missing
         self.model = MODEL_CONFIG["primary_model"]
+        self.model_options = {k: v for k, v in PERFORMANCE_CONFIG.items() if k not in APP_PERFORMANCE_KEYS}
+        self.pipeline_mode = PERFORMANCE_CONFIG.get("pipeline_mode", "sequential")
+        self.inference = OllamaInferenceClient.shared()  # One pooled client for every model call in the process
+        self.semantic_cache = SemanticResponseCache()  # Near-duplicate questions skip the main model
+        self.prompt_budget = PromptBudget()  # Caps prompt size so prefill stays fast on CPU
+        self.inference.prewarm()  # Load the primary model while the UI starts
         self.goals_db = GoalsDatabase()
-        # self.worldview = VectorWorldviewSystem()  # DISABLED - using thinking model instead
-        self.proactive_system = MultiRoundProactiveSystem()
-        self.multimodal = MultimodalProcessor()
+        self.goal_index = GoalRelevanceIndex(self.goals_db)  # Incrementally maintained goal ranking
+        # BM25 knowledge grounding - offline, no embedding model
+        self.worldview = VectorWorldviewSystem() if WORLDVIEW_CONFIG.get("enabled") else None
+        self.proactive_system = MultiRoundProactiveSystem(self.inference)
+        self.multimodal = MultimodalProcessor(self.inference)
+        self.proactive_executor = ThreadPoolExecutor(max_workers=GOALS_CONFIG["proactive_workers"],
+                                                     thread_name_prefix="proactive")
         self.conversation_history = []
         self.memory = ConversationMemory()  # Proto-AGI Memory System
         self.auto_continuation_active = False  # Track auto-continuation
@@ -1616,94 +4526,154 @@ class GemmaAgentSystem:
     def route_to_agent(self, user_message: str, selected_agent: str = None) -> str:
         """Route message to appropriate agent"""
         if selected_agent and selected_agent in self.agents:
+            self.intent_classifier.log_selection(user_message, selected_agent)
             return selected_agent
         
-        # Auto-routing based on keywords
-        message_lower = user_message.lower()
-        best_match = "general"
-        best_score = 0
+        # Learned intent first; the precompiled keyword router when it isn't confident
+        best_match, confidence, method = self.intent_classifier.route(user_message, self.router)
+        if method == "classifier":
+            print(f"🎓 Routed to {best_match} ({confidence:.2f})")
+        return best_match
+    
+    def route_many(self, user_messages: List[str]) -> List[Tuple[str, Dict[str, int]]]:
+        """Batch routing -> [(agent, per-agent keyword scores)] for each message"""
+        return [(self.intent_classifier.route(message, self.router)[0], self.router.scores(message))
+                for message in user_messages]
+    
+    def get_relevant_goals(self, agent_type: str, user_message: str = "") -> List[Goal]:
+        """Top goals for this message and agent (lexical overlap, priority, recent activity, agent affinity)"""
+        ranked = self.goal_index.rank(user_message, agent_type, k=GOALS_CONFIG.get("relevant_goals", 3))
+        if ranked:
+            print(f"🧭 Goal relevance: {[(g.title, score) for g, score in ranked]}")
+        return [goal for goal, _ in ranked]
+    
+    def _start_prefill(self, prompt_prefix: str):
+        """Prefill the primary model with the static prompt prefix in the background.
+        
+        Ollama keeps the evaluated prefix in the runner's KV cache, so the main request
+        that starts with the same text only has to evaluate the tail.
+        """
+        try:
+            return self.inference.generate_background(
+                model=self.model,
+                prompt=prompt_prefix,
+                options={**self.model_options, "num_predict": 1}  # Same runner options = no reload
+            )
+        except Exception as e:
+            print(f"⚠️ Prefill start failed: {e}")
+            return None
+    
+    def _collect_prefill(self, prefill_future, prefill_start: float) -> Dict:
+        """Report how much of the primary model's load + prefill was hidden behind thinking"""
+        if prefill_future is None:
+            return {"mode": "sequential", "ttft_saved": 0.0}
         
-        for agent_id, agent_config in self.agents.items():
-            score = sum(1 for keyword in agent_config["keywords"] 
-                       if keyword in message_lower)
-            if score > best_score:
-                best_score = score
-                best_match = agent_id
+        info = {"mode": "pipelined", "prefill_done": prefill_future.done(), "prefill_tokens": 0, "ttft_saved": 0.0}
+        if not prefill_future.done():
+            # Still loading/prefilling - the main request queues behind it, nothing measurable was hidden
+            info["prefill"] = "pending"
+            print("⏳ Prefill still running when the main request started - no time-to-first-token saved")
+            return info
         
-        return best_match
-    
-    def get_relevant_goals(self, agent_type: str) -> List[Goal]:
-        """Get goals relevant to this agent"""
-        active_goals = self.goals_db.get_goals_by_status("active")
-        relevant_goals = []
-        
-        for goal in active_goals:
-            # Check if agent can help with this goal
-            if (agent_type in goal.related_agents or 
-                goal.category == agent_type or 
-                agent_type == "general"):
-                relevant_goals.append(goal)
-        
-        # Sort by priority and progress
-        priority_order = {"high": 3, "medium": 2, "low": 1}
-        relevant_goals.sort(
-            key=lambda g: (priority_order.get(g.priority, 1), -g.progress_percentage),
-            reverse=True
-        )
+        overlapped = time.time() - prefill_start
+        try:
+            response = prefill_future.result()
+            info["prefill_tokens"] = response.get("prompt_eval_count") or 0
+            # Ollama reports durations in nanoseconds
+            prefill_seconds = ((response.get("load_duration") or 0) +
+                               (response.get("prompt_eval_duration") or 0)) / 1e9
+            overlapped = min(overlapped, prefill_seconds) if prefill_seconds else overlapped
+        except Exception as e:
+            print(f"⚠️ Prefill failed: {e}")
+            info["error"] = str(e)
+            overlapped = 0.0
         
-        return relevant_goals[:3]  # Top 3 most relevant
+        info["ttft_saved"] = round(overlapped, 3)
+        print(f"⚡ Pipelined prefill hid {info['ttft_saved']}s of time-to-first-token")
+        return info
     
-    def build_enhanced_prompt(self, agent_type: str, user_message: str,
-                             relevant_goals: List[Goal], thinking_context: str = "",
-                             image_context: str = "") -> str:
-        """Build goal-aware, thinking-enhanced prompt"""
-        
-        agent = self.agents[agent_type]
-        base_prompt = agent["prompt"]
+    def _render_goal_context(self, relevant_goals: List[Goal], detail: int = 0) -> str:
+        """Goal section at a level of detail: 0 = everything, 1 = completed milestones summarized,
+        2 = also open milestones and routines capped, 3 = one line per goal"""
+        if not relevant_goals:
+            return ""
+        max_open = PROMPT_BUDGET_CONFIG.get("max_open_milestones", 4)
+        max_routines = PROMPT_BUDGET_CONFIG.get("max_routines", 3)
         
-        # Add goal context
-        goal_context = ""
-        if relevant_goals:
-            goal_context = "\n\n🎯 USER'S ACTIVE GOALS (consider these in your response):\n"
-            for goal in relevant_goals:
-                goal_context += f"\n📋 {goal.title} ({goal.progress_percentage}% complete)"
-                goal_context += f"\n   Category: {goal.category} | Priority: {goal.priority}"
-                
-                # Add milestones
-                if goal.milestones:
-                    goal_context += f"\n   🎯 Milestones:"
+        goal_context = "\n\n🎯 USER'S ACTIVE GOALS (consider these in your response):\n"
+        for goal in relevant_goals:
+            goal_context += f"\n📋 {goal.title} ({goal.progress_percentage}% complete)"
+            goal_context += f"\n   Category: {goal.category} | Priority: {goal.priority}"
+            
+            completed = [m for m in goal.milestones if m.get("status") == "completed"]
+            open_milestones = [m for m in goal.milestones if m.get("status") != "completed"]
+            if detail >= 3:
+                if open_milestones:
+                    goal_context += f"\n   ⏳ Next: {open_milestones[0].get('title', 'Unknown')}"
+                goal_context += "\n"
+                continue
+            
+            # Add milestones
+            if goal.milestones:
+                goal_context += f"\n   🎯 Milestones:"
+                if detail == 0:
                     for milestone in goal.milestones:
                         status_emoji = "✅" if milestone.get("status") == "completed" else "⏳"
                         goal_context += f"\n     {status_emoji} {milestone.get('title', 'Unknown')}"
                         if milestone.get("status") == "completed":
                             goal_context += f" (completed {milestone.get('completed_date', '')})"
-                
-                # Add daily routines
-                if goal.daily_routines:
-                    goal_context += f"\n   🔄 Daily Routines:"
-                    for routine in goal.daily_routines:
-                        streak = routine.get("streak_count", 0)
-                        longest = routine.get("longest_streak", 0)
-                        goal_context += f"\n     🔥 {routine.get('title', 'Unknown')} (streak: {streak}, best: {longest})"
-                
-                goal_context += "\n"
-        
-        # Add thinking context
-        thinking_section = thinking_context if thinking_context else ""
-        
-        # Add image context
-        image_section = ""
-        if image_context:
-            image_section = f"\n\nIMAGE CONTEXT:\n{image_context}\n"
-        
-        # Build full prompt with MAJOR goal emphasis
-        full_prompt = f"""{base_prompt}
-
-{goal_context}{thinking_section}{image_section}
-
-User: {user_message}
+                else:
+                    if completed:
+                        latest = max(completed, key=lambda m: m.get("completed_date") or "")
+                        goal_context += f"\n     ✅ {len(completed)} completed (latest: {latest.get('title', 'Unknown')})"
+                    shown = open_milestones if detail == 1 else open_milestones[:max_open]
+                    for milestone in shown:
+                        goal_context += f"\n     ⏳ {milestone.get('title', 'Unknown')}"
+                    if len(shown) < len(open_milestones):
+                        goal_context += f"\n     … {len(open_milestones) - len(shown)} more open"
+            
+            # Add daily routines
+            if goal.daily_routines:
+                routines = goal.daily_routines
+                if detail >= 2:
+                    routines = sorted(routines, key=lambda r: r.get("streak_count", 0), reverse=True)[:max_routines]
+                goal_context += f"\n   🔄 Daily Routines:"
+                for routine in routines:
+                    streak = routine.get("streak_count", 0)
+                    longest = routine.get("longest_streak", 0)
+                    week_rate = routine.get("completion_rates", {}).get("7d", 0.0)
+                    goal_context += (f"\n     🔥 {routine.get('title', 'Unknown')} "
+                                     f"(streak: {streak}, best: {longest}, last 7 days: {week_rate:.0%})")
+            
+            goal_context += "\n"
+        return goal_context
+    
+    def _fit_prompt_prefix(self, agent_type: str, relevant_goals: List[Goal]) -> Tuple[str, Dict]:
+        """Budgeted prefix - depends only on the agent and goals, so it stays identical across a turn"""
+        fitted, report = self.prompt_budget.fit({
+            "agent_prompt": self.agents[agent_type]["prompt"],
+            "goals": [self._render_goal_context(relevant_goals, detail) for detail in range(4)]
+        })
+        return f"""{fitted["agent_prompt"]}
 
-🎯 IMPORTANT: Focus heavily on the user's goals throughout your response! 
+{fitted["goals"]}""", report
+    
+    def build_prompt_prefix(self, agent_type: str, relevant_goals: List[Goal]) -> str:
+        """Static start of the prompt (agent prompt + goals) - identical across a turn, so it can be prefilled early"""
+        return self._fit_prompt_prefix(agent_type, relevant_goals)[0]
+    
+    def assemble_prompt(self, agent_type: str, user_message: str, relevant_goals: List[Goal],
+                        thinking_context: str = "", image_context: str = "",
+                        strategic_thinking: str = "", knowledge_context: str = "") -> Tuple[str, Dict]:
+        """Build the budgeted prompt; returns (prompt, token report for the metadata event)"""
+        prompt_prefix, prefix_report = self._fit_prompt_prefix(agent_type, relevant_goals)
+        # Fixed labels around the sections count against the budget too
+        labels = "\n\nUser: \n\n" + ("\n\nIMAGE CONTEXT:\n\n" if image_context else "")
+        if strategic_thinking:
+            labels += "\n\n🧠 STRATEGIC THINKING:\n\n\nNow provide your comprehensive response:"
+        reserved = self.prompt_budget.estimate(prompt_prefix) + self.prompt_budget.estimate(labels)
+        
+        goal_instructions = """🎯 IMPORTANT: Focus heavily on the user's goals throughout your response! 
 
 If they have active goals:
 - Reference their goals frequently
@@ -1714,8 +4684,64 @@ If they have active goals:
 - Extend your response to cover all aspects of their goals
 
 Provide a comprehensive, detailed response that extensively discusses their goals, progress, and actionable steps. Make this response thorough and goal-centric."""
+        compact_instructions = ("🎯 IMPORTANT: Connect your response to the user's active goals - "
+                                "their progress, next steps and specific actions.")
+        
+        thinking = "\n\n".join(t for t in (thinking_context, strategic_thinking) if t)
+        fitted, report = self.prompt_budget.fit({
+            "user_message": user_message,
+            "image": self.prompt_budget.dedupe_lines(image_context) if image_context else "",
+            "knowledge": knowledge_context,
+            "thinking": thinking,
+            "instructions": [goal_instructions, compact_instructions, ""]
+        }, reserved_tokens=reserved)
+        
+        # With strategic thinking all thinking closes the prompt, otherwise it goes inline after the goals
+        inline_thinking = "" if strategic_thinking else fitted["thinking"]
+        
+        # Add image context
+        image_section = ""
+        if fitted["image"]:
+            image_section = f"\n\nIMAGE CONTEXT:\n{fitted['image']}\n"
+        
+        # Build full prompt with MAJOR goal emphasis
+        full_prompt = f"""{prompt_prefix}{inline_thinking}{fitted["knowledge"]}{image_section}
+
+User: {fitted["user_message"]}
+
+{fitted["instructions"]}"""
+        if strategic_thinking:
+            full_prompt += f"\n\n🧠 STRATEGIC THINKING:\n{fitted['thinking']}\n\nNow provide your comprehensive response:"
         
-        return full_prompt
+        report["sections"] = {**prefix_report["sections"], **report["sections"]}
+        report["compacted"] = prefix_report["compacted"] + report["compacted"]
+        report["tokens"] = self.prompt_budget.estimate(full_prompt)
+        report["budget"] = self.prompt_budget.total_tokens
+        if report["over_budget"]:
+            # The message itself is never cut - say so rather than silently dropping part of it
+            report["warning"] = (f"Your message is very long: the prompt is ~{report['tokens']} tokens against a "
+                                 f"{report['budget']}-token budget even with the other context trimmed, so the "
+                                 f"answer may miss parts of it.")
+        return full_prompt, report
+    
+    def build_enhanced_prompt(self, agent_type: str, user_message: str,
+                             relevant_goals: List[Goal], thinking_context: str = "",
+                             image_context: str = "", knowledge_context: str = "") -> str:
+        """Build goal-aware, thinking-enhanced prompt"""
+        return self.assemble_prompt(agent_type, user_message, relevant_goals, thinking_context, image_context,
+                                    knowledge_context=knowledge_context)[0]
+    
+    def get_knowledge_context(self, user_message: str, agent_type: str) -> Tuple[str, Dict]:
+        """Grounding chunks from the agent's knowledge base -> (prompt section, knowledge_source metadata)"""
+        if self.worldview is None:
+            return "", {}
+        started = time.time()
+        context = self.worldview.get_relevant_worldview(user_message, agent_type)
+        if not context:
+            return "", {}
+        return context, {"knowledge_base": self.worldview._select_knowledge_base(agent_type),
+                         "chunks": context.count("[KNOWLEDGE CHUNK"),
+                         "search_ms": round((time.time() - started) * 1000, 2)}
     
     def get_response_stream(self, user_message: str, selected_agent: str = None,
                            image_data: str = None, session_state=None):
@@ -1728,7 +4754,7 @@ Provide a comprehensive, detailed response that extensively discusses their goal
         agent_config = self.agents[agent_type]
         
         # Get relevant goals
-        relevant_goals = self.get_relevant_goals(agent_type)
+        relevant_goals = self.get_relevant_goals(agent_type, user_message)
         print(f"🎯 STREAMING: Found {len(relevant_goals)} relevant goals: {[g.title for g in relevant_goals]}")
         
         # STEP 1: Process multimodal input (image/video)
@@ -1780,21 +4806,51 @@ Provide a comprehensive, detailed response that extensively discusses their goal
                 image_context = f"Multimodal processing failed: {str(e)}"
         
         try:
-            # Create initial Ollama request (will be updated with thinking later)
-            request_data = {
-                "model": self.model,
-                "prompt": "",  # Will be set after thinking generation
-                "options": PERFORMANCE_CONFIG,
-                "stream": True
-            }
+            # Static prompt prefix (agent prompt + goals) - prefilled into the runner's KV cache, keys the semantic cache
+            prompt_prefix = self.build_prompt_prefix(agent_type, relevant_goals)
+            prefix_fingerprint = self.semantic_cache.fingerprint(prompt_prefix)
             
-            # Add images if provided
-            if multimodal_data and "images" in multimodal_data:
-                request_data["images"] = multimodal_data["images"]
-                print(f"📷 Streaming multimodal response with {len(multimodal_data['images'])} images")
+            # SEMANTIC CACHE: near-duplicate question to this agent with unchanged goals => replay the answer
+            semantic_hit = None
+            if not image_data:
+                semantic_hit = self.semantic_cache.lookup(agent_type, user_message, prefix_fingerprint)
+            
+            if semantic_hit:
+                thinking_response = ""
+                full_response = ""
+                yield {
+                    "type": "metadata",
+                    "agent_type": agent_type,
+                    "agent_name": agent_config["name"],
+                    "agent_emoji": agent_config["emoji"],
+                    "relevant_goals": [{"id": g.id, "title": g.title, "progress": g.progress_percentage} 
+                                     for g in relevant_goals],
+                    "knowledge_source": {},
+                    "semantic_cache": {"hit": True, "similarity": semantic_hit["similarity"]},
+                    "start_time": start_time
+                }
+                for text_chunk in self.semantic_cache.replay_chunks(semantic_hit["response"]):
+                    full_response += text_chunk
+                    yield {
+                        "type": "text",
+                        "content": text_chunk,
+                        "full_content": full_response
+                    }
+            else:
+                # Create initial Ollama request (will be updated with thinking later)
+                request_data = {
+                    "model": self.model,
+                    "prompt": "",  # Will be set after thinking generation
+                    "options": self.model_options
+                }
+            
+                # Add images if provided
+                if multimodal_data and "images" in multimodal_data:
+                    request_data["images"] = multimodal_data["images"]
+                    print(f"📷 Streaming multimodal response with {len(multimodal_data['images'])} images")
             
-            # STEP 2: QWEN 3:1.7B THINKING (shows in UI) + SOTA FACTS
-            thinking_prompt = f"""
+                # STEP 2: QWEN 3:1.7B THINKING (shows in UI) + SOTA FACTS
+                thinking_prompt = f"""
 STRATEGIC THINKING + SOTA ANALYSIS TASK:
 Analyze this user request and generate strategic thinking that incorporates state-of-the-art (SOTA) and recent developments.
 
@@ -1828,89 +4884,113 @@ Point 2: [SOTA approach + practical application]
 Point 3: [Future trends + goal alignment]
 """
             
-            # Generate thinking with Qwen 3:0.6b
-            thinking_response = ""
-            try:
-                thinking_stream = ollama.generate(
-                    model=MODEL_CONFIG["thinking_model"],
-                    prompt=thinking_prompt,
-                    options={"temperature": 0.7, "max_tokens": 200},
-                    stream=True
-                )
+                # PIPELINED MODE: load + prefill Gemma 3n with the static prompt prefix while thinking streams.
+                # The main request then sends the whole prompt; the runner's prompt cache finds the prefix
+                # already evaluated - this turn's prefill, or the last turn's when the goals are unchanged
+                prefill_future = None
+                prefill_start = time.time()
+                if self.pipeline_mode == "pipelined" and "images" not in request_data:
+                    prefill_future = self._start_prefill(prompt_prefix)
+            
+                # Generate thinking with Qwen 3:0.6b
+                thinking_response = ""
+                try:
+                    thinking_stream = self.inference.stream(
+                        model=MODEL_CONFIG["thinking_model"],
+                        prompt=thinking_prompt,
+                        kind="thinking",
+                        options={"temperature": 0.7, "max_tokens": 200}
+                    )
                 
-                # Stream thinking to UI
-                for chunk in thinking_stream:
-                    if 'response' in chunk:
-                        # Keep response clean for UI display
-                        clean_response = chunk['response']
-                        thinking_response += clean_response
-                        yield {
-                            "type": "thinking",
-                            "content": clean_response,
-                            "full_thinking": thinking_response
-                        }
+                    # Stream thinking to UI
+                    for chunk in thinking_stream:
+                        if 'response' in chunk:
+                            # Keep response clean for UI display
+                            clean_response = chunk['response']
+                            thinking_response += clean_response
+                            yield {
+                                "type": "thinking",
+                                "content": clean_response,
+                                "full_thinking": thinking_response
+                            }
                         
-            except Exception as e:
-                print(f"Thinking model error: {e}")
-                thinking_response = "Strategic thinking about user request and optimal response approach."
+                except Exception as e:
+                    print(f"Thinking model error: {e}")
+                    thinking_response = "Strategic thinking about user request and optimal response approach."
             
-            # STEP 2: Build enhanced prompt with thinking context
-            thinking_context = thinking_response  # Set the actual thinking content
-            enhanced_prompt = self.build_enhanced_prompt(
-                agent_type, user_message, relevant_goals, thinking_context, image_context
-            )
-            print(f"🔧 STREAMING: Enhanced prompt includes {len(relevant_goals)} goals")
-            if relevant_goals:
-                print(f"🔧 Goals in prompt: {[g.title for g in relevant_goals]}")
-                # Show a snippet of the enhanced prompt to verify goals are included
-                prompt_snippet = enhanced_prompt[:500] + "..." if len(enhanced_prompt) > 500 else enhanced_prompt
-                print(f"🔧 Prompt snippet: {prompt_snippet}")
+                pipeline_info = self._collect_prefill(prefill_future, prefill_start)
             
-            # Add thinking to enhanced prompt for Gemma 3n:e4b
-            enhanced_prompt += f"\n\n🧠 STRATEGIC THINKING:\n{thinking_response}\n\nNow provide your comprehensive response:"
-            request_data["prompt"] = enhanced_prompt
+                # STEP 2: Build budgeted prompt - thinking goes in the closing STRATEGIC THINKING section,
+                # so the prefix stays static for the prefill and KV context reuse
+                knowledge_context, knowledge_source = self.get_knowledge_context(user_message, agent_type)
+                enhanced_prompt, prompt_report = self.assemble_prompt(
+                    agent_type, user_message, relevant_goals, image_context=image_context,
+                    strategic_thinking=thinking_response, knowledge_context=knowledge_context
+                )
+                print(f"📏 Prompt: ~{prompt_report['tokens']}/{prompt_report['budget']} tokens"
+                      f"{' (compacted: ' + ', '.join(prompt_report['compacted']) + ')' if prompt_report['compacted'] else ''}")
+                if prompt_report.get("warning"):
+                    print(f"⚠️ {prompt_report['warning']}")
+                print(f"🔧 STREAMING: Enhanced prompt includes {len(relevant_goals)} goals")
+                if relevant_goals:
+                    print(f"🔧 Goals in prompt: {[g.title for g in relevant_goals]}")
+                    # Show a snippet of the enhanced prompt to verify goals are included
+                    prompt_snippet = enhanced_prompt[:500] + "..." if len(enhanced_prompt) > 500 else enhanced_prompt
+                    print(f"🔧 Prompt snippet: {prompt_snippet}")
             
-            # Stream the main response with Gemma 3n:e4b
-            response_stream = ollama.generate(**request_data)
+                # One templated user turn, exactly like the prefill's up to the end of the prefix - no `context`
+                # array, which would put the prefix in a user turn of its own ahead of the rest
+                request_data["prompt"] = enhanced_prompt
+                prefix_tokens = self.prompt_budget.estimate(prompt_prefix)
+                # If Ollama ever has to shift the context, the agent prompt + goals stay at the front
+                request_data["options"] = {**self.model_options, "num_keep": prefix_tokens}
             
-            full_response = ""
+                # Stream the main response with Gemma 3n:e4b
+                response_stream = self.inference.stream(kind="interactive", **request_data)
             
-            # Get knowledge base info for metadata (using empty dict instead of None)
-            knowledge_source = {}
+                full_response = ""
             
-            # Yield metadata first
-            yield {
-                "type": "metadata",
-                "agent_type": agent_type,
-                "agent_name": agent_config["name"],
-                "agent_emoji": agent_config["emoji"],
-                "relevant_goals": [{"id": g.id, "title": g.title, "progress": g.progress_percentage} 
-                                 for g in relevant_goals],
-                "knowledge_source": knowledge_source,
-                "start_time": start_time
-            }
+                # Yield metadata first
+                yield {
+                    "type": "metadata",
+                    "agent_type": agent_type,
+                    "agent_name": agent_config["name"],
+                    "agent_emoji": agent_config["emoji"],
+                    "relevant_goals": [{"id": g.id, "title": g.title, "progress": g.progress_percentage} 
+                                     for g in relevant_goals],
+                    "knowledge_source": knowledge_source,
+                    "pipeline": pipeline_info,
+                    "kv_context": {"prefix_tokens": prefix_tokens, "prefilled": prefill_future is not None},
+                    "prompt_tokens": prompt_report["tokens"],
+                    "prompt_budget": prompt_report,
+                    "start_time": start_time
+                }
             
-            # Stream response chunks
-            for chunk in response_stream:
-                if 'response' in chunk and chunk['response']:
-                    # Filter out CSS leaking and short markdown blocks
-                    text_chunk = chunk['response']
+                # Stream response chunks
+                for chunk in response_stream:
+                    if 'response' in chunk and chunk['response']:
+                        # Filter out CSS leaking and short markdown blocks
+                        text_chunk = chunk['response']
                     
-                    # Remove CSS-style markdown blocks if they're short (< 12 lines)
-                    if '```' in text_chunk or '<div' in text_chunk or '</div>' in text_chunk:
-                        lines = text_chunk.split('\n')
-                        # If it's a short code block or contains HTML, filter it out
-                        if len(lines) < 12 and any(marker in text_chunk.lower() for marker in ['<div', '</div>', 'style=', 'background:', 'color:']):
-                            print(f"🚫 Filtered CSS leak: {text_chunk[:100]}...")
-                            continue
+                        # Remove CSS-style markdown blocks if they're short (< 12 lines)
+                        if '```' in text_chunk or '<div' in text_chunk or '</div>' in text_chunk:
+                            lines = text_chunk.split('\n')
+                            # If it's a short code block or contains HTML, filter it out
+                            if len(lines) < 12 and any(marker in text_chunk.lower() for marker in ['<div', '</div>', 'style=', 'background:', 'color:']):
+                                print(f"🚫 Filtered CSS leak: {text_chunk[:100]}...")
+                                continue
                     
-                    full_response += text_chunk
+                        full_response += text_chunk
                     
-                    yield {
-                        "type": "text",
-                        "content": text_chunk,
-                        "full_content": full_response
-                    }
+                        yield {
+                            "type": "text",
+                            "content": text_chunk,
+                            "full_content": full_response
+                        }
+            
+                # Remember the answer for near-duplicate questions to this agent
+                if not image_data:
+                    self.semantic_cache.store(agent_type, user_message, prefix_fingerprint, full_response)
             
             # Final metadata
             response_time = time.time() - start_time
@@ -1955,27 +5035,51 @@ Point 3: [Future trends + goal alignment]
                     })
                 
                 proactive_messages = []
+                suggested_goals = []
                 
-                # Auto-generate 4 proactive rounds with different agents - MEMORY-ENHANCED
+                # Auto-generate 4 proactive rounds with different agents + goal suggestions - CONCURRENT
                 agent_rotation = ["general", "coaching", "creative", "analytical"]
+                # Rounds run concurrently, so they all share this snapshot - a round does not see
+                # the rounds queued beside it, only what the thread held before they started
+                thread_context = [entry.get("user_message", "") for entry in self.memory.thread_memory[-3:]]
+                round_futures = {}
                 for round_num in range(1, 5):
+                    current_agent = agent_rotation[(round_num - 1) % len(agent_rotation)]
+                    print(f"🧠 Queueing memory-enhanced round {round_num}/4 with {current_agent} perspective...")
+                    future = self.proactive_executor.submit(
+                        self.proactive_system.follow_up_generator.generate_follow_up,
+                        conversation_state, {"mode": current_agent}, relevant_goals,
+                        thread_context, round_num, current_agent
+                    )
+                    round_futures[future] = (round_num, current_agent)
+                
+                # FORCE GOAL SUGGESTIONS - Always generate them, alongside the rounds
+                goals_future = self.proactive_executor.submit(
+                    self._generate_goal_suggestions, user_message, full_response, agent_type, relevant_goals
+                )
+                
+                def stop_requested():
+                    return bool(session_state and getattr(session_state, 'stop_proactive', False))
+                
+                # Yield each round as soon as it finishes
+                pending = set(round_futures)
+                while pending:
                     # Check for stop signal from UI
-                    if session_state and getattr(session_state, 'stop_proactive', False):
-                        print(f"🛑 Proactive generation stopped by user at round {round_num}")
+                    if stop_requested():
+                        print(f"🛑 Proactive generation stopped by user with {len(pending)} rounds pending")
+                        for future in pending:
+                            future.cancel()
                         break
                     
-                    current_agent = agent_rotation[(round_num - 1) % len(agent_rotation)]
-                    timestamp = datetime.now().strftime("%H:%M:%S")
-                    print(f"🧠 [{timestamp}] Generating memory-enhanced round {round_num}/4 with {current_agent} perspective...")
-                    
-                    try:
-                        # Use thread memory for enhanced context
-                        thread_context = [entry.get("user_message", "") for entry in self.memory.thread_memory[-3:]]
-                        
-                        follow_up = self.proactive_system.follow_up_generator.generate_follow_up(
-                            conversation_state, {"mode": current_agent}, relevant_goals, 
-                            thread_context, round_num, current_agent
-                        )
+                    done, pending = wait(pending, timeout=0.25, return_when=FIRST_COMPLETED)
+                    for future in sorted(done, key=lambda f: round_futures[f][0]):
+                        round_num, current_agent = round_futures[future]
+                        timestamp = datetime.now().strftime("%H:%M:%S")
+                        try:
+                            follow_up = future.result()
+                        except Exception as round_error:
+                            print(f"🚨 Error in proactive round {round_num}: {round_error}")
+                            continue
                         
                         if follow_up and follow_up.strip():
                             proactive_msg = {
@@ -1988,7 +5092,7 @@ Point 3: [Future trends + goal alignment]
                             }
                             proactive_messages.append(proactive_msg)
                             
-                            # Add to thread memory for next rounds
+                            # Add to thread memory for later continuation
                             self.memory.thread_memory.append({
                                 "timestamp": datetime.now().isoformat(),
                                 "proactive_round": round_num,
@@ -2009,69 +5113,22 @@ Point 3: [Future trends + goal alignment]
                             print(f"✅ [{timestamp}] Memory-enhanced proactive round {round_num} generated successfully")
                         else:
                             print(f"⚠️ Proactive round {round_num} failed - empty response")
-                            
-                    except Exception as round_error:
-                        print(f"🚨 Error in proactive round {round_num}: {round_error}")
-                        continue
+                
+                proactive_messages.sort(key=lambda msg: msg["round"])
                 
                 # Set up auto-continuation timer (continues every minute after initial 4)
                 self.last_proactive_time = time.time()
                 self.auto_continuation_active = True
                 print(f"🔥 Auto-continuation enabled - will continue every 60 seconds")
-                    
-                # FORCE GOAL SUGGESTIONS - Always generate them!
-                suggested_goals = []
-                try:
-                    # Use Gemma 3:1b for goal suggestions (not Qwen)
-                    goal_suggestion_prompt = f"""
-GOAL SUGGESTION TASK:
-Based on this conversation and user's current goals, suggest 3-5 relevant new goals.
-
-CONVERSATION:
-User: {user_message}
-AI Response: {full_response}
-Agent Type: {agent_type}
-
-CURRENT GOALS ({len(relevant_goals)}):
-{chr(10).join([f"- {g.title} ({g.progress_percentage}% progress)" for g in relevant_goals])}
-
-SUGGEST NEW GOALS THAT:
-1. Build on the conversation topic
-2. Complement existing goals
-3. Address gaps in user's goal portfolio
-4. Are specific and actionable
-5. Include milestones and daily routines
-
-FORMAT EACH GOAL AS:
-Title: [Goal Title]
-Category: [category]
-Milestones: [3-4 specific milestones]
-Daily Routines: [2-3 daily/weekly routines]
-
-GENERATE 3-5 GOALS:
-"""
-                    
-                    # Use Gemma 3:1b for goal suggestions
-                    goal_response = ollama.generate(
-                        model="gemma3:1b",
-                        prompt=goal_suggestion_prompt,
-                        options={"temperature": 0.8, "max_tokens": 800}
-                    )
-                    
-                    # Parse goal suggestions
-                    goal_text = goal_response['response']
-                    suggested_goals = self._parse_goal_suggestions_advanced(goal_text)
-                    
-                    print(f"🎯 FORCED: Generated {len(suggested_goals)} goal suggestions using Gemma 3:1b")
-                    
-                except Exception as e:
-                    print(f"❌ Goal suggestion error: {e}")
-                    # Fallback suggestions
-                    suggested_goals = [
-                        "Improve daily productivity with time management techniques",
-                        "Learn a new technical skill relevant to your career",
-                        "Establish better work-life balance habits"
-                    ]
+                
+                # Wait for the goal suggestions the same way - a stop skips them instead of blocking on them
+                while not goals_future.done() and not stop_requested():
+                    wait([goals_future], timeout=0.25)
+                if goals_future.done() and not goals_future.cancelled():
+                    suggested_goals = goals_future.result()
+                else:
+                    goals_future.cancel()
+                    print("🛑 Goal suggestions skipped - proactive generation stopped by user")
                 
                 # Final complete with all proactive data (MOVED OUTSIDE except block!)
                 print(f"🎯 YIELDING: Sending {len(suggested_goals)} goal suggestions to UI")
@@ -2113,6 +5170,60 @@ GENERATE 3-5 GOALS:
                 "agent_emoji": agent_config["emoji"]
             }
     
+    def _generate_goal_suggestions(self, user_message: str, full_response: str, agent_type: str,
+                                   relevant_goals: List[Goal]) -> List[Dict]:
+        """Generate goal suggestions with Gemma 3:1b (runs alongside the proactive rounds)"""
+        # Use Gemma 3:1b for goal suggestions (not Qwen)
+        goal_suggestion_prompt = f"""
+GOAL SUGGESTION TASK:
+Based on this conversation and user's current goals, suggest 3-5 relevant new goals.
+
+CONVERSATION:
+User: {user_message}
+AI Response: {full_response}
+Agent Type: {agent_type}
+
+CURRENT GOALS ({len(relevant_goals)}):
+{chr(10).join([f"- {g.title} ({g.progress_percentage}% progress)" for g in relevant_goals])}
+
+SUGGEST NEW GOALS THAT:
+1. Build on the conversation topic
+2. Complement existing goals
+3. Address gaps in user's goal portfolio
+4. Are specific and actionable
+5. Include milestones and daily routines
+
+FORMAT EACH GOAL AS:
+Title: [Goal Title]
+Category: [category]
+Milestones: [3-4 specific milestones]
+Daily Routines: [2-3 daily/weekly routines]
+
+GENERATE 3-5 GOALS:
+"""
+        
+        try:
+            goal_response = self.inference.generate(
+                model="gemma3:1b",
+                prompt=goal_suggestion_prompt,
+                kind="proactive",
+                options={"temperature": 0.8, "max_tokens": 800}
+            )
+            
+            # Parse goal suggestions
+            suggested_goals = self._parse_goal_suggestions_advanced(goal_response['response'])
+            print(f"🎯 FORCED: Generated {len(suggested_goals)} goal suggestions using Gemma 3:1b")
+            return suggested_goals
+            
+        except Exception as e:
+            print(f"❌ Goal suggestion error: {e}")
+            # Fallback suggestions
+            return [
+                "Improve daily productivity with time management techniques",
+                "Learn a new technical skill relevant to your career",
+                "Establish better work-life balance habits"
+            ]
+    
     def _parse_goal_suggestions_advanced(self, goal_text: str) -> List[Dict]:
         """Parse advanced goal suggestions with milestones and routines"""
         try:
@@ -2176,10 +5287,11 @@ GENERATE 3-5 GOALS:
         agent_config = self.agents[agent_type]
         
         # Get relevant goals
-        relevant_goals = self.get_relevant_goals(agent_type)
+        relevant_goals = self.get_relevant_goals(agent_type, user_message)
         
-        # No worldview - using Qwen thinking model instead
+        # No thinking model here - grounding comes from the BM25 knowledge index
         thinking_context = ""
+        knowledge_context, _ = self.get_knowledge_context(user_message, agent_type)
         
         # Process image if provided
         image_context = ""
@@ -2212,7 +5324,7 @@ GENERATE 3-5 GOALS:
         
         # Build enhanced prompt
         enhanced_prompt = self.build_enhanced_prompt(
-            agent_type, user_message, relevant_goals, thinking_context, image_context
+            agent_type, user_message, relevant_goals, thinking_context, image_context, knowledge_context
         )
         
         try:
@@ -2220,7 +5332,7 @@ GENERATE 3-5 GOALS:
             request_data = {
                 "model": self.model,
                 "prompt": enhanced_prompt,
-                "options": PERFORMANCE_CONFIG
+                "options": self.model_options
             }
             
             # Add images if provided
@@ -2230,8 +5342,7 @@ GENERATE 3-5 GOALS:
             
             if hasattr(self, 'stream_response') and self.stream_response:
                 # Stream the response for real-time generation
-                request_data["stream"] = True
-                response_stream = ollama.generate(**request_data)
+                response_stream = self.inference.stream(kind="interactive", **request_data)
                 
                 # Collect streaming response
                 agent_response = ""
@@ -2243,7 +5354,7 @@ GENERATE 3-5 GOALS:
                             self._stream_callback(chunk['response'])
             else:
                 # Standard non-streaming response
-                response = ollama.generate(**request_data)
+                response = self.inference.generate(kind="interactive", **request_data)
                 agent_response = response['response']
             response_time = time.time() - start_time
             
@@ -2276,7 +5387,7 @@ GENERATE 3-5 GOALS:
                 "response_time": response_time,
                 "relevant_goals": [{"id": g.id, "title": g.title, "progress": g.progress_percentage} 
                                  for g in relevant_goals],
-                "worldview_enhanced": False,
+                "worldview_enhanced": bool(knowledge_context),
                 "proactive_result": proactive_result,
                 "success": True
             }
@@ -2330,7 +5441,7 @@ GENERATE 3-5 GOALS:
                 
                 last_conversation = self.conversation_history[-1]
                 thread_context = [entry.get("content", "") for entry in self.memory.thread_memory[-5:]]
-                relevant_goals = self.get_relevant_goals(last_conversation.agent_type)
+                relevant_goals = self.get_relevant_goals(last_conversation.agent_type, last_conversation.user_message)
                 
                 # Build intelligent decision prompt
                 decision_prompt = f"""
@@ -2371,9 +5482,11 @@ DECISION:
 """
                 
                 # Use Qwen 3:1.7B for intelligent decision
-                decision_response = ollama.generate(
+                decision_response = self.inference.generate(
                     model="qwen3:1.7b",
                     prompt=decision_prompt,
+                    kind="continuation",
+                    cache=False,  # Time-sensitive decision - always ask the model
                     options={"temperature": 0.3, "max_tokens": 100}
                 )
                 
@@ -2444,15 +5557,25 @@ DECISION:
 class GoalsManager:
     def __init__(self):
         self.db = GoalsDatabase()
+        self.db.start_compaction()
+        self.router = AgentKeywordRouter(HACKATHON_AGENTS)
     
     def create_goal(self, title: str, description: str = "", category: str = "general",
                    priority: str = "medium", target_date: str = None) -> Goal:
         """Create a new goal"""
+        goal = self.build_goal(title, description, category, priority, target_date)
+        self.db.save_goal(goal)
+        return goal
+    
+    def build_goal(self, title: str, description: str = "", category: str = "general",
+                   priority: str = "medium", target_date: str = None,
+                   milestones: List[Dict] = None, routines: List[Dict] = None) -> Goal:
+        """Assemble a complete goal with its milestones and routines in memory (nothing is written)"""
         
         # Suggest related agents based on category
         related_agents = self._suggest_related_agents(category, description + " " + title)
         
-        goal = Goal(
+        return Goal(
             id=str(uuid.uuid4()),
             title=title,
             description=description,
@@ -2463,15 +5586,22 @@ class GoalsManager:
             created_date=datetime.now().isoformat(),
             completed_date=None,
             progress_percentage=0,
-            milestones=[],
-            daily_routines=[],
+            milestones=[self._new_milestone(m.get("title", ""), m.get("description") or f"Milestone for {title}",
+                                            m.get("target_date")) for m in milestones or []],
+            daily_routines=[self._new_routine(r.get("title", ""), r.get("description") or f"Daily routine for {title}",
+                                              r.get("frequency", "daily")) for r in routines or []],
             related_agents=related_agents,
             user_notes="",
             ai_suggestions=[]
         )
+    
+    def create_goals(self, specs: List[Dict]) -> List[Goal]:
+        """Create several goals (each with milestones and routines) in one transaction.
         
-        self.db.save_goal(goal)
-        return goal
+        Each spec takes build_goal's keyword arguments. Returns the goals, or [] if nothing was written.
+        """
+        goals = [self.build_goal(**spec) for spec in specs]
+        return goals if self.db.save_goals(goals) else []
     
     def _suggest_related_agents(self, category: str, text: str) -> List[str]:
         """Suggest which agents can help with this goal"""
@@ -2484,12 +5614,10 @@ class GoalsManager:
                 related.append(agent_id)
         
         # Keyword matching
-        for agent_id, agent_config in HACKATHON_AGENTS.items():
-            if agent_id not in related:
-                keyword_matches = sum(1 for keyword in agent_config["keywords"] 
-                                    if keyword in text_lower)
-                if keyword_matches >= 2:  # At least 2 keyword matches
-                    related.append(agent_id)
+        keyword_matches = self.router.scores(text_lower)
+        for agent_id in HACKATHON_AGENTS:
+            if agent_id not in related and keyword_matches.get(agent_id, 0) >= 2:  # At least 2 keyword matches
+                related.append(agent_id)
         
         return related[:5]  # Max 5 related agents
     
@@ -2500,15 +5628,12 @@ class GoalsManager:
     def update_goal_progress(self, goal_id: str, progress: int) -> bool:
         """Update goal progress"""
         try:
-            goals = self.db.get_goals_by_status("active")
-            for goal in goals:
-                if goal.id == goal_id:
-                    goal.progress_percentage = min(100, max(0, progress))
-                    if goal.progress_percentage == 100:
-                        goal.status = "completed"
-                        goal.completed_date = datetime.now().isoformat()
-                    return self.db.save_goal(goal)
-            return False
+            progress = min(100, max(0, progress))
+            fields = {"progress_percentage": progress}
+            if progress == 100:
+                fields["status"] = "completed"
+                fields["completed_date"] = datetime.now().isoformat()
+            return self.db.update_goal_fields(goal_id, only_status="active", **fields)
         except Exception as e:
             print(f"Error updating goal progress: {e}")
             return False
@@ -2517,25 +5642,8 @@ class GoalsManager:
                      target_date: str = None) -> bool:
         """Add a milestone to a goal"""
         try:
-            goal = self.db.get_goals_by_status("active")
-            goal = next((g for g in goal if g.id == goal_id), None)
-            if not goal:
-                return False
-            
-            milestone = {
-                "id": f"milestone_{int(time.time())}",
-                "title": title,
-                "description": description,
-                "status": "pending",
-                "target_date": target_date,
-                "completed_date": None,
-                "completion_timestamp": None,
-                "progress_percentage": 0,
-                "notes": ""
-            }
-            
-            goal.milestones.append(milestone)
-            return self.db.save_goal(goal)
+            milestone = self._new_milestone(title, description, target_date)
+            return self.db.add_milestone(goal_id, milestone, only_status="active")
         except Exception as e:
             print(f"Error adding milestone: {e}")
             return False
@@ -2544,46 +5652,50 @@ class GoalsManager:
                          frequency: str = "daily") -> bool:
         """Add a daily routine to a goal"""
         try:
-            goal = self.db.get_goals_by_status("active")
-            goal = next((g for g in goal if g.id == goal_id), None)
-            if not goal:
-                return False
-            
-            routine = {
-                "id": f"routine_{int(time.time())}",
-                "title": title,
-                "description": description,
-                "frequency": frequency,
-                "checkmarks": [],
-                "streak_count": 0,
-                "longest_streak": 0,
-                "last_completed": None,
-                "is_active": True
-            }
-            
-            goal.daily_routines.append(routine)
-            return self.db.save_goal(goal)
+            routine = self._new_routine(title, description, frequency)
+            return self.db.add_routine(goal_id, routine, only_status="active")
         except Exception as e:
             print(f"Error adding daily routine: {e}")
             return False
     
+    @staticmethod
+    def _new_milestone(title: str, description: str = "", target_date: str = None) -> Dict:
+        return {
+            "id": f"milestone_{uuid.uuid4().hex[:12]}",
+            "title": title,
+            "description": description,
+            "status": "pending",
+            "target_date": target_date,
+            "completed_date": None,
+            "completion_timestamp": None,
+            "progress_percentage": 0,
+            "notes": ""
+        }
+    
+    @staticmethod
+    def _new_routine(title: str, description: str = "", frequency: str = "daily") -> Dict:
+        return {
+            "id": f"routine_{uuid.uuid4().hex[:12]}",
+            "title": title,
+            "description": description,
+            "frequency": frequency,
+            "checkmarks": [],
+            "streak_count": 0,
+            "longest_streak": 0,
+            "last_completed": None,
+            "is_active": True
+        }
+    
     def complete_milestone(self, goal_id: str, milestone_id: str) -> bool:
         """Mark a milestone as completed"""
         try:
-            goal = self.db.get_goals_by_status("active")
-            goal = next((g for g in goal if g.id == goal_id), None)
-            if not goal:
-                return False
-            
-            for milestone in goal.milestones:
-                if milestone["id"] == milestone_id:
-                    milestone["status"] = "completed"
-                    milestone["completed_date"] = datetime.now().strftime("%Y-%m-%d")
-                    milestone["completion_timestamp"] = datetime.now().isoformat()
-                    milestone["progress_percentage"] = 100
-                    break
-            
-            return self.db.save_goal(goal)
+            return self.db.update_milestone(
+                goal_id, milestone_id, only_status="active",
+                status="completed",
+                completed_date=datetime.now().strftime("%Y-%m-%d"),
+                completion_timestamp=datetime.now().isoformat(),
+                progress_percentage=100
+            )
         except Exception as e:
             print(f"Error completing milestone: {e}")
             return False
@@ -2591,41 +5703,23 @@ class GoalsManager:
     def check_daily_routine(self, goal_id: str, routine_id: str) -> bool:
         """Check off a daily routine for today"""
         try:
-            goal = self.db.get_goals_by_status("active")
-            goal = next((g for g in goal if g.id == goal_id), None)
-            if not goal:
-                return False
-            
             today = datetime.now().strftime("%Y-%m-%d")
             now = datetime.now().isoformat()
-            
-            for routine in goal.daily_routines:
-                if routine["id"] == routine_id:
-                    # Add checkmark for today
-                    checkmark = {
-                        "date": today,
-                        "timestamp": now
-                    }
-                    routine["checkmarks"].append(checkmark)
-                    routine["last_completed"] = now
-                    
-                    # Update streak
-                    routine["streak_count"] += 1
-                    if routine["streak_count"] > routine["longest_streak"]:
-                        routine["longest_streak"] = routine["streak_count"]
-                    break
-            
-            return self.db.save_goal(goal)
+            return self.db.add_checkmark(goal_id, routine_id, today, now, only_status="active")
         except Exception as e:
             print(f"Error checking daily routine: {e}")
             return False
     
+    def search_goals(self, query: str, status: str = None, limit: int = 10) -> List[Dict]:
+        """Find goals (any status unless given) matching free text, best match first"""
+        return [{"goal": goal, "score": score, "snippet": snippet}
+                for goal, score, snippet in self.db.search_goals(query, status, limit)]
+    
     def get_goal_with_details(self, goal_id: str) -> Optional[Dict]:
         """Get a goal with all its milestones and routines"""
         try:
-            goals = self.db.get_goals_by_status("active")
-            goal = next((g for g in goals if g.id == goal_id), None)
-            if not goal:
+            goal = self.db.get_goal(goal_id)
+            if not goal or goal.status != "active":
                 return None
             
             return {
@@ -2665,44 +5759,51 @@ class GemmaMultiverseSystem:
                                    priority: str = "medium", target_date: str = None, 
                                    milestones: List[Dict] = None, routines: List[Dict] = None) -> bool:
         """Create a goal from form input with milestones and routines"""
+        if not goal_title:
+            return False
+        return self.create_goals_from_suggestions([{
+            "title": goal_title, "category": category, "description": description, "priority": priority,
+            "target_date": target_date, "milestones": milestones, "routines": routines
+        }])
+    
+    def create_goals_from_suggestions(self, suggestions: List) -> bool:
+        """Create every suggested goal with its milestones and routines in one atomic write.
+        
+        Suggestions may be plain titles or dicts (title, category, description, priority, target_date,
+        milestones, routines); milestones/routines may be titles or dicts.
+        """
         try:
-            if not goal_title:
+            specs = [self._suggestion_to_spec(suggestion) for suggestion in suggestions]
+            specs = [spec for spec in specs if spec["title"]]
+            if not specs:
                 return False
             
-            # Create the goal
-            goal = self.goals_manager.create_goal(
-                title=goal_title,
-                description=description,
-                category=category,
-                priority=priority,
-                target_date=target_date
-            )
-            
-            # Add milestones
-            if milestones:
-                for milestone in milestones:
-                    self.goals_manager.add_milestone(
-                        goal_id=goal.id,
-                        title=milestone.get("title", ""),
-                        description=f"Milestone for {goal_title}"
-                    )
-            
-            # Add daily routines
-            if routines:
-                for routine in routines:
-                    self.goals_manager.add_daily_routine(
-                        goal_id=goal.id,
-                        title=routine.get("title", ""),
-                        description=f"Daily routine for {goal_title}"
-                    )
-            
-            print(f"✅ Created goal '{goal_title}' with {len(milestones or [])} milestones and {len(routines or [])} routines")
-            return True
+            goals = self.goals_manager.create_goals(specs)
+            for goal in goals:
+                print(f"✅ Created goal '{goal.title}' with {len(goal.milestones)} milestones and {len(goal.daily_routines)} routines")
+            return bool(goals)
             
         except Exception as e:
             print(f"❌ Error creating goal from suggestion: {e}")
             return False
     
+    @staticmethod
+    def _suggestion_to_spec(suggestion) -> Dict:
+        """Normalize a suggestion into GoalsManager.build_goal keyword arguments"""
+        if isinstance(suggestion, str):
+            return {"title": suggestion, "category": "general", "description": "AI suggested goal"}
+        def as_items(items):
+            return [{"title": item} if isinstance(item, str) else item for item in items or []]
+        return {
+            "title": suggestion.get("title", ""),
+            "category": suggestion.get("category", "general"),
+            "description": suggestion.get("description", ""),
+            "priority": suggestion.get("priority", "medium"),
+            "target_date": suggestion.get("target_date"),
+            "milestones": as_items(suggestion.get("milestones")),
+            "routines": as_items(suggestion.get("routines"))
+        }
+    
     def get_active_goals(self) -> List[Dict]:
         """Get user's active goals for UI with full details"""
         goals = self.goals_manager.get_active_goals()
@@ -2721,6 +5822,26 @@ class GemmaMultiverseSystem:
             "ai_suggestions": g.ai_suggestions
         } for g in goals]
     
+    def search_goals(self, query: str, limit: int = 10) -> List[Dict]:
+        """Search every goal (active, completed, paused) for the UI"""
+        return [{
+            "id": hit["goal"].id,
+            "title": hit["goal"].title,
+            "status": hit["goal"].status,
+            "progress": hit["goal"].progress_percentage,
+            "category": hit["goal"].category,
+            "snippet": hit["snippet"],
+            "score": hit["score"]
+        } for hit in self.goals_manager.search_goals(query, limit=limit)]
+    
+    def get_goal_activity(self, days: int = 30) -> Dict[str, Dict[str, int]]:
+        """Goal events per day and type for the stats dashboard"""
+        return self.goals_manager.db.get_activity_series(days)
+    
+    def get_goal_history(self, goal_id: str, limit: int = 50) -> List[Dict]:
+        """Most recent events of one goal, newest first"""
+        return self.goals_manager.db.get_goal_history(goal_id, limit)
+    
     def get_agent_list(self) -> Dict[str, Dict]:
         """Get list of available agents for UI"""
         return {agent_id: {
@@ -2734,13 +5855,28 @@ class GemmaMultiverseSystem:
         """Capture image from camera"""
         return self.agent_system.multimodal.capture_camera_frame()
 
-# 🌟 GLOBAL SYSTEM INSTANCE
-gemma_system = GemmaMultiverseSystem()
+# 🌟 GLOBAL SYSTEM INSTANCE (built on first use - CLI commands and tests import main without starting it)
+_gemma_system = None
+_gemma_system_lock = threading.Lock()
+
+def get_gemma_system() -> GemmaMultiverseSystem:
+    global _gemma_system
+    with _gemma_system_lock:
+        if _gemma_system is None:
+            _gemma_system = GemmaMultiverseSystem()
+    return _gemma_system
+
+def __getattr__(name: str):
+    """`from main import gemma_system` builds the system on first access"""
+    if name == "gemma_system":
+        return get_gemma_system()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # 🧪 TEST FUNCTION
 def test_system():
     """Test the complete system"""
     print("🧠 Testing Gemma 3n Multiverse System...")
+    gemma_system = get_gemma_system()
     
     # Test basic response
     result = gemma_system.process_message("I want to learn programming")
@@ -2763,5 +5899,45 @@ def test_system():
     
     print("🎉 Proactive Intelligence System READY! 🧠⚡")
 
+# 🎓 ROUTER TRAINING CLI
+def intent_classifier_cli(argv: List[str] = None):
+    """python main.py train-router [--log FILE] [--epochs N] | python main.py bench-router [--data FILE]"""
+    import argparse
+    parser = argparse.ArgumentParser(prog="main.py", description="Train or benchmark the agent intent classifier")
+    commands = parser.add_subparsers(dest="command", required=True)
+    train = commands.add_parser("train-router", help="Train from the agent configs (+ routing log) and save weights")
+    train.add_argument("--log", help="Labeled routing log, JSONL with message/agent (default: config path)")
+    train.add_argument("--epochs", type=int, help="Gradient steps (default: config)")
+    bench = commands.add_parser("bench-router", help="Accuracy and latency of keywords vs classifier vs hybrid")
+    bench.add_argument("--data", help="Labeled JSONL to score the saved weights on, e.g. tests/data/routing_messages.jsonl "
+                                      "(default: held-out prompt lines)")
+    args = parser.parse_args(argv)
+    
+    classifier = AgentIntentClassifier(HACKATHON_AGENTS, {**INTENT_CLASSIFIER_CONFIG, "enabled": True,
+                                                          "train_if_missing": False})
+    if args.command == "train-router":
+        classifier.train(log_path=args.log, save=True, epochs=args.epochs)
+        return
+    
+    if args.data:
+        if not classifier.load():
+            print("❌ No usable weights - run `python main.py train-router` first")
+            return
+        samples = classifier.log_samples(args.data)
+    else:
+        # Hold out every 4th prompt sentence and train a throwaway model on everything else
+        all_samples = classifier.agent_samples()
+        sentences = [i for i, (text, _) in enumerate(all_samples) if len(text.split()) >= 3][::4]
+        held_out = set(sentences)
+        samples = [all_samples[i] for i in sentences]
+        classifier.weights = classifier.fit([s for i, s in enumerate(all_samples) if i not in held_out]
+                                            + classifier.example_samples())
+    print(f"📊 Routing benchmark on {len(samples)} labeled messages")
+    print(json.dumps(classifier.benchmark(samples, AgentKeywordRouter(HACKATHON_AGENTS)), indent=2))
+
 if __name__ == "__main__":
-    test_system() 
\ No newline at end of file
+    import sys
+    if len(sys.argv) > 1:
+        intent_classifier_cli()
+    else:
+        test_system() 
\ No newline at end of file
@@ -7,7 +7,11 @@ Amazon Bedrock-inspired AI Brain UI
 import streamlit as st
 import time
 import base64
+import hashlib
+import html
 import json
+import re
+import uuid
 from datetime import datetime
 from PIL import Image
 import io
@@ -888,6 +892,20 @@ def render_goals_dashboard():
             elif submitted and not goal_title:
                 st.error("⚠️ Please enter a goal title.")
     
+    # Search across all goals, including completed and paused ones
+    with st.expander("🔎 Search Goals", expanded=False):
+        search_query = st.text_input("Search", placeholder="e.g., sleep, python, marathon",
+                                     key="goal_search", label_visibility="collapsed")
+        if search_query:
+            results = gemma_system.search_goals(search_query)
+            if not results:
+                st.markdown("*No matching goals*")
+            for result in results:
+                # Goal text is user input - escape it, then turn the snippet's ** match markers into <b>
+                snippet = re.sub(r"\*\*(.+?)\*\*", r"<b>\1</b>", html.escape(result['snippet']))
+                st.markdown(f"<b>{html.escape(result['title'])}</b> · {result['status']} · {result['progress']}%<br>"
+                            f"<small>{snippet}</small>", unsafe_allow_html=True)
+    
     # Display active goals
     active_goals = gemma_system.get_active_goals()
     print(f"🎯 SIDEBAR: Retrieved {len(active_goals)} active goals")
@@ -1001,12 +1019,16 @@ def render_goals_dashboard():
                         routine_longest = 0
                         routine_frequency = 'daily'
                         routine_last = None
+                        routine_rates = {}
+                        routine_checked = False
                     else:
                         routine_title = routine.get('title', 'Unknown')
                         routine_streak = routine.get('streak_count', 0)
                         routine_longest = routine.get('longest_streak', 0)
                         routine_frequency = routine.get('frequency', 'daily')
                         routine_last = routine.get('last_completed')
+                        routine_rates = routine.get('completion_rates', {})
+                        routine_checked = routine.get('checked_today', False)
                     
                     col1, col2 = st.columns([4, 1])
                     
@@ -1016,12 +1038,15 @@ def render_goals_dashboard():
                         - Current Streak: {routine_streak} days
                         - Longest Streak: {routine_longest} days
                         - Frequency: {routine_frequency}
+                        - Completion: 7d {routine_rates.get('7d', 0):.0%} · 30d {routine_rates.get('30d', 0):.0%} · 90d {routine_rates.get('90d', 0):.0%}
                         """)
                         if routine_last:
                             st.markdown(f"*Last completed: {routine_last[:10]}*")
                     
                     with col2:
-                        if st.button("✅ Check Today", key=f"routine_{i}_{k}"):
+                        if routine_checked:
+                            st.markdown("✅ Done today")
+                        elif st.button("✅ Check Today", key=f"routine_{i}_{k}"):
                             success = gemma_system.goals_manager.check_daily_routine(
                                 goal['id'], routine.get('id', str(k))
                             )
@@ -1057,6 +1082,17 @@ def render_goal_suggestions(suggested_goals: List[str]):
         st.markdown("### 💡 AI Goal Suggestions")
         st.markdown("*Intelligent suggestions based on your conversation - Click to add instantly*")
         
+        # The key must survive reruns or the click is lost - derive it from the suggestions themselves
+        titles = [goal if isinstance(goal, str) else goal.get("title", "") for goal in suggested_goals]
+        suggestions_key = hashlib.sha1("\n".join(titles).encode("utf-8")).hexdigest()[:12]
+        if len(suggested_goals) > 1 and st.button("✅ Add all", key=f"add_all_goals_{suggestions_key}"):
+            # One atomic write for every suggestion with its milestones and routines
+            if gemma_system.create_goals_from_suggestions(suggested_goals):
+                st.success(f"🎉 Added {len(suggested_goals)} goals to your list! Check the sidebar.")
+                st.rerun()
+            else:
+                st.error("❌ Failed to add goals. Please try again.")
+        
         for i, goal in enumerate(suggested_goals):
             col1, col2 = st.columns([4, 1])
             
@@ -1265,6 +1301,8 @@ def render_streaming_response(response_stream, placeholder):
                 "relevant_goals": chunk["relevant_goals"],
                 "knowledge_source": chunk.get("knowledge_source")
             }
+            if (chunk.get("prompt_budget") or {}).get("warning"):
+                st.warning(f"⚠️ {chunk['prompt_budget']['warning']}")
             
             # Update header with agent info and thinking animation
             placeholder.markdown(f"""
@@ -1509,6 +1547,8 @@ def render_chat_interface():
     # Initialize chat history
     if "messages" not in st.session_state:
         st.session_state.messages = []
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = str(uuid.uuid4())  # Keys per-session model context reuse
     
     # Display chat history with proactive rounds
     for message in st.session_state.messages:
@@ -1831,6 +1871,18 @@ def render_stats_dashboard():
             <div class="stat-label">Thinking Enhanced</div>
         </div>
         """, unsafe_allow_html=True)
+    
+    # Goal activity over time, straight from the goal event log
+    activity = gemma_system.get_goal_activity(30)
+    if activity:
+        st.markdown("#### 📈 Goal Activity (last 30 days)")
+        activity_df = pd.DataFrame([
+            {"date": day, "event": event_type.replace("_", " "), "count": count}
+            for day, counts in activity.items() for event_type, count in counts.items()
+        ])
+        fig = px.bar(activity_df, x="date", y="count", color="event", barmode="stack")
+        fig.update_layout(height=300, margin=dict(l=0, r=0, t=10, b=0), legend_title_text="")
+        st.plotly_chart(fig, use_container_width=True)
 
 # 🚀 MAIN APP
 def main():
@@ -1893,6 +1945,7 @@ def main():
         # Clear chat button
         if st.button("🗑️ Clear Chat", type="secondary"):
             st.session_state.messages = []
+            st.session_state.session_id = str(uuid.uuid4())  # Fresh model context too
             st.rerun()
     
     # Main chat interface
@@ -0,0 +1,54 @@
+import os
+import sys
+
+import pytest
+
+# main.py and config_agents.py live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+from ollama_stub import StubOllamaServer  # noqa: E402
+
+
+@pytest.fixture
+def stubs():
+    servers = []
+
+    def make(**kwargs):
+        server = StubOllamaServer(**kwargs)
+        servers.append(server)
+        return server
+
+    yield make
+    for server in servers:
+        server.close()
+
+
+@pytest.fixture
+def make_client():
+    clients = []
+
+    def make(*backends, **pool_config):
+        backend_config = {"backends": [{"host": b.host} if isinstance(b, StubOllamaServer) else b for b in backends],
+                          "max_retries": 2, "eject_after_failures": 2, "eject_seconds": 30.0,
+                          "health_check_interval": 0, **pool_config}
+        client = main.OllamaInferenceClient({**main.INFERENCE_CONFIG, "max_workers": 4}, backend_config)
+        clients.append(client)
+        return client
+
+    yield make
+    for client in clients:
+        client.close()
+
+
+@pytest.fixture
+def agent_system(tmp_path, monkeypatch, stubs, make_client):
+    server = stubs()
+    monkeypatch.setattr(main.OllamaInferenceClient, "_shared", make_client(server))
+    monkeypatch.setitem(main.GOALS_CONFIG, "database_path", str(tmp_path / "goals.db"))
+    monkeypatch.setitem(main.INTENT_CLASSIFIER_CONFIG, "enabled", False)
+    monkeypatch.setitem(main.WORLDVIEW_CONFIG, "enabled", False)
+    monkeypatch.setitem(main.PERFORMANCE_CONFIG, "pipeline_mode", "pipelined")
+    system = main.GemmaAgentSystem()
+    system.inference.prewarm().result(timeout=10)
+    return system, server
@@ -0,0 +1,131 @@
+"""Minimal stand-in for an Ollama server: /api/generate (streaming or not) and /api/ps"""
+
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubOllamaServer:
+    """Serves `models` (404 for others); knobs make it fail, respond slowly or stall mid-stream.
+
+    Every /api/generate body is recorded in `requests`. Like Ollama, a prompt is wrapped in the chat
+    template (unless raw) and appended to the request's `context`; one token per word or template tag.
+    Each model has a one-slot prompt cache: `evaluations` records every rendered token sequence and
+    how many of its leading tokens were already cached from the previous request to that model.
+    """
+
+    TEMPLATE = "<start_of_turn>user\n{prompt}<end_of_turn>\n<start_of_turn>model\n"
+
+    def __init__(self, models=None, resident=None, response="stub answer"):
+        self.models = models  # None = every model
+        self.resident = list(resident or [])
+        self.response = response
+        self.fail_status = None  # e.g. 500 -> every generate fails with that status
+        self.delay = 0.0  # Seconds before a non-streaming reply / the first chunk
+        self.stall = 0.0  # Seconds to hang after the first stream chunk
+        self.chunk_interval = 0.0  # Seconds between stream chunks (a slow but steady answer)
+        self.requests = []
+        self.evaluations = []  # {"model", "tokens", "cached"} per generate
+        self._kv = {}  # model -> tokens of the last evaluated sequence
+        self._vocabulary = {}
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    @property
+    def host(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    @property
+    def generate_requests(self):
+        """Generate calls other than keep_alive=0 unloads"""
+        return [r for r in self.requests if r.get("keep_alive") != 0]
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    @staticmethod
+    def tokenize(text):
+        return re.findall(r"<[a-z_]+>|[^\s<]+", text)
+
+    def _ids(self, tokens):
+        return [self._vocabulary.setdefault(token, len(self._vocabulary)) for token in tokens]
+
+    def _evaluate(self, request):
+        """Render the prompt like Ollama, reuse the cached prefix and return the context after the answer"""
+        prompt = request.get("prompt", "")
+        words = {i: token for token, i in self._vocabulary.items()}
+        tokens = [words[i] for i in request.get("context") or []]
+        tokens += self.tokenize(prompt if request.get("raw") else self.TEMPLATE.format(prompt=prompt))
+        previous = self._kv.get(request.get("model"), [])
+        cached = 0
+        while cached < min(len(previous), len(tokens)) and previous[cached] == tokens[cached]:
+            cached += 1
+        self.evaluations.append({"model": request.get("model"), "tokens": tokens, "cached": cached})
+        answer = self.tokenize(self.response) + ["<end_of_turn>"]
+        self._kv[request.get("model")] = tokens + answer
+        return self._ids(tokens + answer), len(tokens) - cached
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _json(self, status, payload):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path == "/api/ps":
+                    if stub.fail_status:
+                        return self._json(stub.fail_status, {"error": "stub failure"})
+                    return self._json(200, {"models": [{"name": m, "model": m} for m in stub.resident]})
+                self._json(404, {"error": "not found"})
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                stub.requests.append(request)
+                model = request.get("model")
+                if stub.fail_status:
+                    return self._json(stub.fail_status, {"error": "stub failure"})
+                if stub.models is not None and model not in stub.models:
+                    return self._json(404, {"error": f"model '{model}' not found"})
+                if request.get("keep_alive") == 0:
+                    if model in stub.resident:
+                        stub.resident.remove(model)
+                    return self._json(200, {"model": model, "response": "", "done": True})
+                if model not in stub.resident:
+                    stub.resident.append(model)
+                time.sleep(stub.delay)
+
+                context, prompt_eval_count = stub._evaluate(request)
+                if not request.get("stream", True):
+                    return self._json(200, {"model": model, "response": stub.response, "done": True,
+                                            "context": context, "prompt_eval_count": prompt_eval_count,
+                                            "eval_count": len(stub.response.split())})
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.end_headers()
+                words = stub.response.split()
+                for i, word in enumerate(words):
+                    self.wfile.write((json.dumps({"model": model, "response": word + " ", "done": False}) + "\n")
+                                     .encode("utf-8"))
+                    self.wfile.flush()
+                    if i == 0 and stub.stall:
+                        time.sleep(stub.stall)
+                    time.sleep(stub.chunk_interval)
+                self.wfile.write((json.dumps({"model": model, "response": "", "done": True, "context": context})
+                                  + "\n").encode("utf-8"))
+
+        return Handler
@@ -0,0 +1,74 @@
+import os
+
+import pytest
+
+import main
+from config_agents import HACKATHON_AGENTS, INTENT_CLASSIFIER_CONFIG
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LABELED_MESSAGES = os.path.join(ROOT, "tests", "data", "routing_messages.jsonl")
+
+
+def classifier_config(tmp_path, **overrides):
+    return {**INTENT_CLASSIFIER_CONFIG, "enabled": True,
+            "weights_path": str(tmp_path / "weights.npy"),
+            "routing_log_path": None,
+            "examples_path": os.path.join(ROOT, "agent_routing_examples.jsonl"),
+            **overrides}
+
+
+@pytest.fixture(scope="module")
+def router():
+    return main.AgentKeywordRouter(HACKATHON_AGENTS)
+
+
+@pytest.fixture(scope="module")
+def classifier(tmp_path_factory):
+    classifier = main.AgentIntentClassifier(
+        HACKATHON_AGENTS, classifier_config(tmp_path_factory.mktemp("router"), train_if_missing=False))
+    classifier.train(save=True)
+    return classifier
+
+
+def test_importing_main_does_not_build_the_system():
+    assert main._gemma_system is None
+
+
+def test_keyword_router_matches_whole_words_only(router):
+    assert router.route("She said hello")[1] == {}
+    assert router.route("Give me first aid steps")[0] == "crisis_response"
+
+
+@pytest.mark.parametrize("message, agent", [
+    ("I feel anxious and cannot sleep", "wellness_coach"),  # Weak classifier guess must not beat the keyword hit
+    ("My python script throws a KeyError, how do I debug it", "coding_mentor"),
+    ("My tomato leaves have yellow spots with brown rings", "plant_disease_detector"),
+    ("Give me a recipe for a quick vegetarian dinner", "culinary_guide"),
+    ("A wildfire is getting close, when should we evacuate", "crisis_response"),
+    ("I've been feeling really depressed lately and don't enjoy anything", "mental_health"),
+])
+def test_pinned_routes(classifier, router, message, agent):
+    assert classifier.route(message, router)[0] == agent
+
+
+def test_hybrid_beats_keywords_on_labeled_messages(classifier, router):
+    samples = classifier.log_samples(LABELED_MESSAGES)
+    results = classifier.benchmark(samples, router)
+    assert len(samples) == 100
+    assert results["hybrid"]["accuracy"] > results["keywords"]["accuracy"]
+    assert results["hybrid"]["accuracy"] >= 0.6
+
+
+def test_saved_weights_are_mmap_loaded(classifier, tmp_path):
+    reloaded = main.AgentIntentClassifier(HACKATHON_AGENTS, {**classifier.config, "train_if_missing": False})
+    assert reloaded.get_stats()["mmap"]
+    assert reloaded.predict("Explain async await in javascript") == classifier.predict(
+        "Explain async await in javascript")
+
+
+def test_missing_weights_train_in_background_and_route_by_keywords_meanwhile(tmp_path, router):
+    classifier = main.AgentIntentClassifier(HACKATHON_AGENTS, classifier_config(tmp_path, epochs=5))
+    if classifier.weights is None:
+        assert classifier.route("Make me a workout plan", router)[2] == "keywords"
+    assert classifier.wait_until_trained(timeout=60)
+    assert os.path.exists(tmp_path / "weights.npy")
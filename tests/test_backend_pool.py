@@ -0,0 +1,118 @@
+import main
+
+
+def test_call_goes_to_backend_with_model_resident(stubs, make_client):
+    cold, warm = stubs(), stubs(resident=["m"])
+    client = make_client(cold, warm)
+    client.backends.check_health()
+    client.generate("m", "hello", cache=False)
+    assert len(warm.generate_requests) == 1
+    assert cold.generate_requests == []
+
+
+def test_model_affinity_from_backend_config(stubs, make_client):
+    other, serving = stubs(), stubs()
+    client = make_client({"host": other.host, "models": ["other-model"]}, {"host": serving.host, "models": ["m"]})
+    for _ in range(3):
+        client.generate("m", "hello", cache=False)
+    assert len(serving.generate_requests) == 3
+    assert other.generate_requests == []
+
+
+def test_server_error_is_retried_on_next_backend(stubs, make_client):
+    broken, healthy = stubs(), stubs()
+    broken.fail_status = 500
+    client = make_client(broken, healthy)
+    assert client.generate("m", "hello", cache=False)["response"] == "stub answer"
+    assert len(broken.generate_requests) == 1
+    assert len(healthy.generate_requests) == 1
+    assert client.backends.backends[0].failures == 1
+
+
+def test_missing_model_retries_elsewhere_without_ejecting(stubs, make_client):
+    lacking, having = stubs(models=["x"]), stubs()
+    client = make_client(lacking, having, eject_after_failures=1)
+    client.generate("m", "hello", cache=False)
+    assert len(having.generate_requests) == 1
+    assert client.backends.backends[0].is_healthy()
+
+
+def test_failing_backend_is_ejected_and_reinstated_by_health_check(stubs, make_client):
+    broken, healthy = stubs(), stubs()
+    broken.fail_status = 500
+    client = make_client(broken, healthy)
+    for _ in range(2):
+        client.generate("m", "hello", cache=False)
+    assert not client.backends.backends[0].is_healthy()
+    assert client.get_stats()["backends"][broken.host]["ejections"] == 1
+
+    client.generate("m", "hello", cache=False)
+    assert len(broken.generate_requests) == 2  # Ejected - no longer tried
+    assert len(healthy.generate_requests) == 3
+
+    broken.fail_status = None
+    client.backends.check_health()
+    assert client.backends.backends[0].is_healthy()
+
+
+def test_stream_retries_before_first_chunk(stubs, make_client):
+    broken, healthy = stubs(), stubs()
+    broken.fail_status = 503
+    client = make_client(broken, healthy)
+    text = "".join(chunk["response"] for chunk in client.stream("m", "hello"))
+    assert text.split() == ["stub", "answer"]
+    assert len(healthy.generate_requests) == 1
+
+
+def test_prewarm_runs_once_per_client(stubs, make_client):
+    server = stubs()
+    client = make_client(server)
+    first = client.prewarm(["m"])
+    assert client.prewarm(["m"]) is first
+    first.result(timeout=10)
+    assert len(server.generate_requests) == 1
+
+
+def test_components_share_one_client(stubs, make_client, monkeypatch):
+    client = make_client(stubs())
+    monkeypatch.setattr(main.OllamaInferenceClient, "_shared", client)
+    assert main.OllamaInferenceClient.shared() is client
+    assert main.FollowUpGenerator().inference is client
+    assert main.ProactiveDecisionEngine().inference is client
+    proactive = main.MultiRoundProactiveSystem()
+    assert proactive.follow_up_generator.inference is proactive.decision_engine.inference is client
+
+
+def test_health_check_ejects_a_backend_whose_ps_fails_and_readmits_it(stubs, make_client):
+    flaky, steady = stubs(resident=["m"]), stubs()
+    client = make_client(flaky, steady)
+    pool = client.backends
+    pool.check_health()
+    assert "m" in pool.backends[0].residency.resident
+
+    flaky.fail_status = 500
+    for _ in range(2):
+        pool.check_health()
+    assert not pool.backends[0].is_healthy() and pool.backends[1].is_healthy()
+    assert pool.get_stats()[flaky.host]["ejections"] == 1  # Counted once while it stays down
+
+    client.generate("m", "hello", cache=False)
+    assert flaky.generate_requests == []  # Model resident there, but the backend is ejected
+    assert len(steady.generate_requests) == 1
+
+    flaky.fail_status = None
+    flaky.resident = ["m", "other"]
+    pool.check_health()
+    assert pool.backends[0].is_healthy() and pool.backends[0].failures == 0
+    assert {"m", "other"} <= set(pool.backends[0].residency.resident)
+    client.generate("m", "hello", cache=False)
+    assert len(flaky.generate_requests) == 1
+
+
+def test_health_check_ejects_an_unreachable_backend(stubs, make_client):
+    gone, steady = stubs(), stubs()
+    client = make_client(gone, steady)
+    gone.close()
+    client.backends.check_health()
+    assert not client.backends.backends[0].is_healthy()
+    assert client.backends.candidates("m")[0].name == steady.host
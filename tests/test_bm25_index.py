@@ -0,0 +1,68 @@
+import os
+
+import numpy as np
+import pytest
+
+import main
+
+CHUNKS = [
+    "Sleep hygiene: keep a consistent bedtime, avoid screens before bed and keep the bedroom cool and dark.",
+    "Interval training alternates short bursts of hard running with easy recovery jogs to build speed and endurance.",
+    "Python list comprehensions build new lists from any iterable in a single, readable and usually faster expression.",
+]
+
+
+def assert_same_index(a, b):
+    assert a.chunks == b.chunks
+    assert a.term_ids == b.term_ids
+    for name in main.BM25Index.ARRAYS:
+        np.testing.assert_array_equal(np.asarray(getattr(a, name)), np.asarray(getattr(b, name)))
+
+
+def test_search_ranks_the_matching_chunk_first():
+    index = main.BM25Index.build(CHUNKS)
+    assert index.search("how fast should my running intervals be")[0][0] == 1
+    assert index.search("bedtime screens")[0][0] == 0
+    assert index.search("quantum chromodynamics") == []
+
+
+def test_save_and_load_round_trip_with_mmap(tmp_path):
+    index = main.BM25Index.build(CHUNKS)
+    source_hash = main.BM25Index.fingerprint(CHUNKS, 1.2, 0.75)
+    index.save(str(tmp_path), "kb", source_hash)
+
+    loaded = main.BM25Index.load(str(tmp_path), "kb", source_hash)
+    assert isinstance(loaded.impacts, np.memmap)
+    assert_same_index(index, loaded)
+    assert loaded.search("python lists") == index.search("python lists")
+
+    assert main.BM25Index.load(str(tmp_path), "kb", "other-chunks") is None
+    assert main.BM25Index.load(str(tmp_path), "missing") is None
+
+
+def test_new_generation_replaces_the_old_array_files(tmp_path):
+    main.BM25Index.build(CHUNKS).save(str(tmp_path), "kb", "gen1")
+    main.BM25Index.build(CHUNKS[:2]).save(str(tmp_path), "kb", "gen2")
+    arrays = sorted(name for name in os.listdir(tmp_path) if name.endswith(".npy"))
+    assert arrays == sorted(f"kb.gen2.{name}.npy" for name in main.BM25Index.ARRAYS)
+    assert main.BM25Index.load(str(tmp_path), "kb").chunks == CHUNKS[:2]
+
+
+def test_corrupt_metadata_is_not_loaded(tmp_path):
+    main.BM25Index.build(CHUNKS).save(str(tmp_path), "kb", "gen1")
+    (tmp_path / "kb.json").write_text("{not json", encoding="utf-8")
+    assert main.BM25Index.load(str(tmp_path), "kb") is None
+
+
+@pytest.mark.parametrize("changed, tokenized", [
+    (CHUNKS + ["Compound interest grows savings because each period's interest also earns interest later on."], 1),
+    ([CHUNKS[2], CHUNKS[0]], 0),  # Removed and reordered
+    (CHUNKS + [CHUNKS[0]], 1),  # Duplicate chunk - only one copy's counts can be reused
+])
+def test_incremental_build_matches_a_full_build(tmp_path, changed, tokenized):
+    previous = main.BM25Index.build(CHUNKS)
+    previous.save(str(tmp_path), "kb", "gen1")
+    for base in (previous, main.BM25Index.load(str(tmp_path), "kb")):  # In memory and mmap-loaded
+        incremental = main.BM25Index.build(changed, previous=base)
+        assert_same_index(incremental, main.BM25Index.build(changed))
+        assert incremental.build_stats["tokenized"] == tokenized
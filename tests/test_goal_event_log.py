@@ -0,0 +1,34 @@
+import sqlite3
+from datetime import datetime
+
+import main
+
+
+def test_replay_from_a_compacted_snapshot_matches_the_live_goal(tmp_path, monkeypatch):
+    monkeypatch.setitem(main.GOALS_CONFIG, "event_snapshot_every", 3)
+    db = main.GoalsDatabase(str(tmp_path / "goals.db"))
+    goal = next(g for g in db.get_goals_by_status("active") if "Sleep" in g.title)
+    routine = goal.daily_routines[0]["id"]
+    today = datetime.now().date().isoformat()
+
+    db.update_goal_fields(goal.id, progress_percentage=40)
+    db.update_milestone(goal.id, goal.milestones[0]["id"], status="completed")
+    db.add_checkmark(goal.id, routine, today, datetime.now().isoformat())
+    assert db.compact_events()["snapshots"] >= 1
+    before_later_edits = datetime.now().isoformat()
+
+    db.add_milestone(goal.id, {"title": "Wake up at 6:30 for a month", "status": "pending"})
+    db.update_goal_fields(goal.id, user_notes="Going well", progress_percentage=55)
+
+    conn = sqlite3.connect(db.db_path)
+    snapshot_seq = conn.execute("SELECT MAX(seq) FROM goal_snapshots WHERE goal_id = ?", (goal.id,)).fetchone()[0]
+    assert snapshot_seq > 0
+    conn.execute("DELETE FROM goal_events WHERE goal_id = ? AND seq <= ?", (goal.id, snapshot_seq))
+    conn.commit()  # Replay can only start from the snapshot now
+    conn.close()
+
+    assert db.get_goal_at(goal.id) == db.get_goal(goal.id)
+    past = db.get_goal_at(goal.id, before_later_edits)
+    assert past.progress_percentage == 40 and past.user_notes == goal.user_notes
+    assert len(past.milestones) == len(goal.milestones) and past.milestones[0]["status"] == "completed"
+    assert past.daily_routines[0]["checked_today"]
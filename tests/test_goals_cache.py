@@ -0,0 +1,37 @@
+import sqlite3
+
+import main
+
+
+def test_goals_are_reused_until_the_goals_version_changes(tmp_path):
+    db = main.GoalsDatabase(str(tmp_path / "goals.db"))
+    first = db.get_goals_by_status("active")
+    before = db.get_cache_stats()
+    assert db.get_goals_by_status("active") == first
+    assert db.get_cache_stats()["hits"] == before["hits"] + 1
+
+    goal = first[0]
+    db.update_goal_fields(goal.id, progress_percentage=55)
+    assert next(g for g in db.get_goals_by_status("active") if g.id == goal.id).progress_percentage == 55
+    assert db.get_cache_stats()["invalidations"] == before["invalidations"] + 1
+
+
+def test_writes_from_another_connection_invalidate_the_cache(tmp_path):
+    db = main.GoalsDatabase(str(tmp_path / "goals.db"))
+    goal = db.get_goals_by_status("active")[0]
+    invalidations = db.get_cache_stats()["invalidations"]
+
+    conn = sqlite3.connect(db.db_path)  # Another process - only the version triggers tell the cache
+    conn.execute("UPDATE goals SET title = 'Half marathon' WHERE id = ?", (goal.id,))
+    conn.commit()
+    conn.close()
+    assert next(g for g in db.get_goals_by_status("active") if g.id == goal.id).title == "Half marathon"
+    assert db.get_cache_stats()["invalidations"] == invalidations + 1
+
+
+def test_cache_can_be_switched_off(tmp_path, monkeypatch):
+    monkeypatch.setitem(main.GOALS_CONFIG, "cache_goals", False)
+    db = main.GoalsDatabase(str(tmp_path / "goals.db"))
+    db.get_goals_by_status("active")
+    db.get_goals_by_status("active")
+    assert db.get_cache_stats()["hits"] == 0
@@ -0,0 +1,92 @@
+import dataclasses
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+import main
+
+
+@pytest.fixture
+def db(tmp_path):
+    return main.GoalsDatabase(str(tmp_path / "goals.db"))  # A new database comes with the sample goals
+
+
+def goal_titled(db, prefix):
+    return next(g for g in db.get_goals_by_status("active") if prefix in g.title)
+
+
+def test_resaving_an_edited_goal_updates_it(db):
+    goal = goal_titled(db, "Sleep")
+    edited = dataclasses.replace(goal, title="😴 Sleep Mastery", milestones=goal.milestones[:1])
+    assert db.save_goal(edited)
+    saved = db.get_goal(goal.id)
+    assert saved.title == "😴 Sleep Mastery"
+    assert [m["id"] for m in saved.milestones] == [goal.milestones[0]["id"]]
+    version, changed = db.get_changed_goal_ids(0)
+    assert goal.id in changed and version == db.goals_version()
+
+
+def test_relevance_index_follows_goal_edits_and_deletes(db):
+    index = main.GoalRelevanceIndex(db)
+    assert index.rank("how do I sleep better", "general", k=1)[0][0].title == "😴 Sleep Optimization"
+
+    goal = goal_titled(db, "Sustainable")
+    assert db.save_goal(dataclasses.replace(goal, title="🎸 Guitar Practice", description="Learn guitar chords",
+                                            milestones=[], daily_routines=[]))
+    assert index.rank("guitar chords", "general", k=1)[0][0].id == goal.id
+    assert index.get_stats()["syncs"] == 1 and index.get_stats()["full_builds"] == 1
+
+    db.update_goal_fields(goal.id, status="completed")
+    assert goal.id not in {g.id for g, _ in index.rank("guitar chords", "general")}
+
+    sleep = goal_titled(db, "Sleep")
+    conn = sqlite3.connect(db.db_path)  # Deleted by another process - seen through the change log
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.execute("DELETE FROM goals WHERE id = ?", (sleep.id,))
+    conn.commit()
+    conn.close()
+    assert sleep.id not in {g.id for g, _ in index.rank("how do I sleep better", "general")}
+    assert index.get_stats()["goals"] == 1
+
+
+def test_update_goal_fields_changes_only_the_given_fields(db, capsys):
+    goal = goal_titled(db, "Sleep")
+    assert db.update_goal_fields(goal.id, progress_percentage=70, user_notes="Better mornings")
+    updated = db.get_goal(goal.id)
+    assert (updated.progress_percentage, updated.user_notes) == (70, "Better mornings")
+    assert dataclasses.replace(updated, progress_percentage=goal.progress_percentage,
+                               user_notes=goal.user_notes) == goal
+
+    events = len(db.get_goal_history(goal.id))
+    capsys.readouterr()
+    assert db.update_goal_fields(goal.id)  # Nothing to change is not an error
+    assert db.update_milestone(goal.id, goal.milestones[0]["id"])
+    assert capsys.readouterr().out == ""
+    assert len(db.get_goal_history(goal.id)) == events
+    assert not db.update_goal_fields(goal.id, colour="blue")
+
+
+def test_add_checkmark_is_idempotent_within_a_day(db):
+    goal = goal_titled(db, "Sleep")
+    routine = goal.daily_routines[0]["id"]
+    today = datetime.now().date().isoformat()
+    for _ in range(2):
+        assert db.add_checkmark(goal.id, routine, today, datetime.now().isoformat())
+
+    assert len(db.get_checkmarks(goal.id, routine)) == 1
+    checked = next(r for r in db.get_goal(goal.id).daily_routines if r["id"] == routine)
+    assert checked["streak_count"] == 1 and checked["checked_today"]
+    assert [e["type"] for e in db.get_goal_history(goal.id)].count("routine_checked") == 1
+
+
+def test_failed_save_goals_rolls_back_every_goal(db):
+    sleep = goal_titled(db, "Sleep")
+    version, events = db.goals_version(), len(db.get_goal_history(sleep.id))
+    new_goal = dataclasses.replace(sleep, id="new-goal", title="🎸 Guitar Practice", milestones=[], daily_routines=[])
+    broken = dataclasses.replace(goal_titled(db, "Sustainable"), related_agents=[object()])  # Not JSON
+
+    assert not db.save_goals([dataclasses.replace(sleep, title="😴 Sleep Mastery"), new_goal, broken])
+    assert db.get_goal(sleep.id) == sleep
+    assert db.get_goal("new-goal") is None
+    assert db.goals_version() == version and len(db.get_goal_history(sleep.id)) == events
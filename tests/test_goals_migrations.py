@@ -0,0 +1,82 @@
+import json
+import sqlite3
+from datetime import datetime, timedelta
+
+import main
+
+LATEST = main.GOALS_MIGRATIONS[-1][0]
+
+
+def make_v1_database(path):
+    """A goals.db as the first release wrote it: JSON milestones/routines, no schema_version table"""
+    today = datetime.now().date()
+    yesterday = today - timedelta(days=1)
+    milestones = [{"id": "m1", "title": "Run 5k", "status": "pending", "progress_percentage": 0},
+                  {"id": "m1", "title": "Run 10k", "status": "pending", "progress_percentage": 0}]  # Colliding ids
+    routines = [{"id": "r1", "title": "Morning jog", "frequency": "daily", "streak_count": 9, "is_active": True,
+                 "checkmarks": [{"date": yesterday.isoformat(), "timestamp": f"{yesterday}T07:00:00"},
+                                {"date": today.isoformat(), "timestamp": f"{today}T07:00:00"},
+                                {"date": today.isoformat(), "timestamp": f"{today}T19:00:00"}]}]
+    conn = sqlite3.connect(path)
+    conn.execute(main.GOALS_MIGRATIONS[0][2][0])
+    conn.execute("INSERT INTO goals VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                 ("g1", "Marathon training", "Finish a marathon", "health_fitness", "high", "active", None,
+                  datetime.now().isoformat(), None, 10, json.dumps(milestones), json.dumps(routines),
+                  json.dumps(["wellness_coach"]), "Build up slowly", json.dumps([])))
+    conn.commit()
+    conn.close()
+
+
+def schema_versions(path):
+    conn = sqlite3.connect(path)
+    try:
+        return [row[0] for row in conn.execute("SELECT version FROM schema_version ORDER BY version")]
+    finally:
+        conn.close()
+
+
+def test_v1_database_is_upgraded_in_place(tmp_path):
+    path = str(tmp_path / "goals.db")
+    make_v1_database(path)
+    db = main.GoalsDatabase(path)
+    assert schema_versions(path) == list(range(1, LATEST + 1))
+
+    goals = db.get_goals_by_status("active")
+    assert [g.title for g in goals] == ["Marathon training"]  # No sample goals added to an existing database
+    goal = goals[0]
+    assert [m["title"] for m in goal.milestones] == ["Run 5k", "Run 10k"]
+    assert len({m["id"] for m in goal.milestones}) == 2
+    assert goal.related_agents == ["wellness_coach"]
+
+    routine = goal.daily_routines[0]
+    assert len(db.get_checkmarks("g1", "r1")) == 2  # Same-day check-ins collapsed
+    assert routine["streak_count"] == 2 and routine["longest_streak"] == 2  # Rebuilt from history, not kept at 9
+    assert routine["checked_today"]
+
+    assert [g.title for g, _, _ in db.search_goals("marathon jog")] == ["Marathon training"]
+    assert db.get_goal_at("g1").title == "Marathon training"  # v7 snapshot of the migrated state
+
+
+def test_migrations_resume_from_the_recorded_version(tmp_path):
+    path = str(tmp_path / "goals.db")
+    make_v1_database(path)
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE schema_version (version INTEGER PRIMARY KEY, description TEXT, applied_at TEXT)")
+    conn.execute("INSERT INTO schema_version VALUES (1, 'goals table', '2024-01-01')")
+    conn.commit()
+    conn.close()
+
+    main.GoalsDatabase(path)
+    assert schema_versions(path) == list(range(1, LATEST + 1))
+
+
+def test_new_database_gets_latest_schema_and_sample_goals_once(tmp_path):
+    path = str(tmp_path / "goals.db")
+    db = main.GoalsDatabase(path)
+    assert schema_versions(path) == list(range(1, LATEST + 1))
+    samples = len(db.get_goals_by_status("active"))
+    assert samples > 0
+
+    main.GoalsDatabase(path)  # Already current - nothing migrated or seeded again
+    assert schema_versions(path) == list(range(1, LATEST + 1))
+    assert len(db.get_goals_by_status("active")) == samples
@@ -0,0 +1,73 @@
+import time
+
+import pytest
+
+
+def test_generate_deadline_cuts_the_http_request(stubs, make_client):
+    server = stubs()
+    server.delay = 5.0
+    client = make_client(server)
+    started = time.time()
+    with pytest.raises(TimeoutError):
+        client.generate("m", "hello", cache=False, deadline=0.5)
+    assert time.time() - started < 2.0
+    backend = client.backends.backends[0]
+    assert backend.outstanding == 0
+    assert client.scheduler.get_stats()["interactive"]["active"] == 0
+    assert backend.is_healthy()  # A deadline is not a server failure
+
+    server.delay = 0.0
+    assert client.generate("m", "hello", cache=False, deadline=2.0)["response"] == "stub answer"
+
+
+def test_background_generate_honours_its_deadline(stubs, make_client):
+    server = stubs()
+    server.delay = 5.0
+    client = make_client(server)
+    client.deadlines = {**client.deadlines, "proactive": 0.5}
+    future = client.generate_background("m", "hello", kind="proactive")
+    with pytest.raises(TimeoutError):
+        future.result(timeout=3.0)
+
+
+def test_stalled_stream_stops_after_the_idle_timeout(stubs, make_client):
+    server = stubs(response="first second third")
+    server.stall = 5.0
+    client = make_client(server)
+    client.stream_idle_timeout = 0.75
+    received = []
+    started = time.time()
+    with pytest.raises(TimeoutError, match="stalled"):
+        for chunk in client.stream("m", "hello", deadline=5.0):
+            received.append(chunk["response"])
+    assert time.time() - started < 2.0
+    assert received == ["first "]
+    assert client.backends.backends[0].outstanding == 0
+
+
+def test_no_first_token_within_the_deadline(stubs, make_client):
+    server = stubs()
+    server.delay = 5.0
+    client = make_client(server)
+    started = time.time()
+    with pytest.raises(TimeoutError, match="first token"):
+        list(client.stream("m", "hello", deadline=0.5))
+    assert time.time() - started < 2.0
+
+
+def test_steady_stream_may_outlast_its_deadline(stubs, make_client):
+    server = stubs(response="one two three four five six")
+    server.chunk_interval = 0.2
+    client = make_client(server)
+    client.stream_idle_timeout = 1.0
+    started = time.time()
+    chunks = list(client.stream("m", "hello", deadline=0.5))
+    assert time.time() - started > 1.0
+    assert "".join(c["response"] for c in chunks).split() == ["one", "two", "three", "four", "five", "six"]
+
+
+def test_stream_within_deadline_completes(stubs, make_client):
+    client = make_client(stubs(response="one two"))
+    chunks = list(client.stream("m", "hello", deadline=5.0))
+    assert "".join(c["response"] for c in chunks).split() == ["one", "two"]
+    assert chunks[-1]["done"]
@@ -0,0 +1,58 @@
+import main
+
+TEXT = ("A long enough paragraph about {topic} so that chunk_text keeps it: it has to run past one hundred "
+        "characters, which this sentence now does.")
+
+
+def make_system(tmp_path, registry=None):
+    config = {"index_dir": str(tmp_path / "index"), "reindex_interval": 0, "lazy_load": True}
+    return main.VectorWorldviewSystem(config, registry)
+
+
+def write_kb(tmp_path, name, topic):
+    path = tmp_path / f"{name}.txt"
+    path.write_text(f"# {name}\n\n" + TEXT.format(topic=topic), encoding="utf-8")
+    return str(path)
+
+
+def test_agents_resolve_to_dedicated_then_default_knowledge(tmp_path):
+    registry = {
+        "worldview": {"file": "worldview.txt", "agents": ["general"], "default": True},
+        "cooking": {"file": "cooking.txt", "categories": ["cooking"]},
+        "code": {"file": "code.txt", "agents": ["coder", "plant_doctor"]},
+    }
+    agents = {"general": {"category": "general"}, "chef": {"category": "cooking"},
+              "coder": {"category": "ai_ml_datascience"}, "poet": {"category": "creative"}}
+    resolved = make_system(tmp_path, registry).resolve_agent_knowledge(agents)
+    assert resolved == {
+        "general": ["worldview"],
+        "chef": ["cooking", "worldview"],  # Claimed by category
+        "coder": ["code", "worldview"],  # Claimed by id
+        "poet": ["worldview"],  # Unclaimed - defaults only
+        "plant_doctor": ["code", "worldview"],  # Only named in the registry
+    }
+
+
+def test_shipped_registry_covers_every_agent(tmp_path):
+    system = make_system(tmp_path)
+    assert set(main.HACKATHON_AGENTS) <= set(system.agent_knowledge)
+    assert system.agent_knowledge["coding_mentor"] == ["technical", "worldview"]
+    assert system.agent_knowledge["culinary_guide"] == ["worldview"]
+
+
+def test_search_loads_only_the_agents_knowledge_and_falls_back_to_the_default(tmp_path):
+    registry = {
+        "worldview": {"file": write_kb(tmp_path, "worldview", "everyday wellbeing"), "default": True},
+        "technical": {"file": write_kb(tmp_path, "technical", "python generators"), "agents": ["coding_mentor"]},
+        "cooking": {"file": str(tmp_path / "missing.txt"), "categories": ["cooking"]},
+    }
+    system = make_system(tmp_path, registry)
+    assert system.indices == {}  # Lazy: nothing read yet
+
+    assert "python generators" in system.semantic_search("python generators", "coding_mentor")[0]
+    assert set(system.indices) == {"technical"}
+
+    # culinary_guide's cooking corpus is missing - its search falls through to the default
+    assert system.agent_knowledge["culinary_guide"] == ["cooking", "worldview"]
+    assert "everyday wellbeing" in system.semantic_search("everyday wellbeing", "culinary_guide")[0]
+    assert set(system.indices) == {"technical", "worldview"}
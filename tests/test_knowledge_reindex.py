@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+import main
+
+CHUNKS = [
+    "Sleep hygiene: keep a consistent bedtime, avoid screens before bed and keep the bedroom cool and dark.",
+    "Interval training alternates short bursts of hard running with easy recovery jogs to build speed and endurance.",
+    "Python list comprehensions build new lists from any iterable in a single, readable and usually faster expression.",
+]
+
+
+@pytest.fixture
+def worldview(tmp_path):
+    path = tmp_path / "kb.txt"
+    path.write_text("# Notes\n\n" + "\n\n".join(CHUNKS[:2]), encoding="utf-8")
+    config = {"index_dir": str(tmp_path / "index"), "reindex_interval": 0, "lazy_load": True}
+    registry = {"notes": {"file": str(path), "agents": ["general"], "default": True}}
+    return path, lambda: main.VectorWorldviewSystem(config, registry)
+
+
+def test_refresh_reindexes_only_what_changed(worldview):
+    path, make_system = worldview
+    system = make_system()
+    assert system.ensure_loaded("notes")["chunks"] == CHUNKS[:2]
+    assert system.refresh() == {}
+
+    path.write_text(path.read_text(encoding="utf-8") + "\n\n" + CHUNKS[2], encoding="utf-8")
+    os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 1_000_000_000))
+    changes = system.refresh()["notes"]
+    assert (changes["added"], changes["removed"], changes["tokenized"], changes["reused"]) == (1, 0, 1, 2)
+    assert system.semantic_search("python list comprehensions", "general")[0].endswith(CHUNKS[2])
+
+
+def test_unchanged_file_reuses_the_saved_index(worldview, capsys):
+    _, make_system = worldview
+    make_system().ensure_loaded("notes")
+    capsys.readouterr()
+    assert make_system().ensure_loaded("notes")["chunks"] == CHUNKS[:2]
+    output = capsys.readouterr().out
+    assert "reusing its saved index" in output and "index built" not in output
@@ -0,0 +1,43 @@
+from types import SimpleNamespace
+
+import main
+
+
+def run_turn(system, message, session):
+    events = list(system.get_response_stream(message, selected_agent="general", session_state=session))
+    assert not [e for e in events if e["type"] == "error"], events
+    return events
+
+
+def primary_requests(server):
+    return [r for r in server.generate_requests if r["model"] == main.MODEL_CONFIG["primary_model"] and r["prompt"]]
+
+
+def primary_evaluations(server):
+    return [e for e in server.evaluations if e["model"] == main.MODEL_CONFIG["primary_model"]]
+
+
+def test_turns_reuse_the_prefilled_prefix_without_a_context_array(agent_system):
+    system, server = agent_system
+    session = SimpleNamespace(session_id="session-1", stop_proactive=True)
+    header = server.tokenize(server.TEMPLATE.split("{prompt}")[0])
+
+    for turn in range(2):
+        events = run_turn(system, "How do I stay motivated?", session)
+        prefill, main_request = primary_requests(server)[-2:]
+        assert prefill["options"]["num_predict"] == 1
+        assert "context" not in prefill and "context" not in main_request
+        assert main_request["prompt"].startswith(prefill["prompt"])
+
+        # Rendered exactly once by the chat template: one user turn, then the model's turn
+        evaluation = primary_evaluations(server)[-1]
+        assert evaluation["tokens"].count("<start_of_turn>") == 2
+        assert evaluation["tokens"][:len(header)] == header
+        prefix_tokens = len(header) + len(server.tokenize(prefill["prompt"]))
+        assert evaluation["cached"] >= prefix_tokens  # The runner's prompt cache kept the prefilled prefix
+
+        options = main_request["options"]
+        assert options["num_ctx"] == main.PERFORMANCE_CONFIG["num_ctx"]
+        assert options["num_keep"] == system.prompt_budget.estimate(prefill["prompt"])
+        metadata = next(e for e in events if e["type"] == "metadata")
+        assert metadata["kv_context"] == {"prefix_tokens": options["num_keep"], "prefilled": True}
@@ -0,0 +1,63 @@
+import threading
+import time
+
+import main
+
+
+def scheduler(**config):
+    unloaded = []
+    residency = main.ModelResidencyScheduler({"enabled": True, "memory_budget_gb": 10.0, "default_size_gb": 4.0,
+                                              "swap_wait_seconds": 5.0, "models": {}, **config})
+    residency.set_unloader(unloaded.append)
+    return residency, unloaded
+
+
+def use(residency, *models):
+    for model in models:
+        with residency.slot(model):
+            pass
+
+
+def test_least_recently_used_model_is_evicted_to_stay_within_budget():
+    residency, unloaded = scheduler()
+    use(residency, "a", "b", "a")
+    use(residency, "c")
+    assert unloaded == ["b"]
+    stats = residency.get_stats()
+    assert stats["resident"] == ["a", "c"] and stats["resident_gb"] <= residency.memory_budget_gb
+
+
+def test_pinned_model_is_never_unloaded():
+    residency, unloaded = scheduler(models={"primary": {"size_gb": 7.0, "pinned": True}})
+    use(residency, "primary", "a", "b")
+    assert unloaded == ["a"]
+    use(residency, "c", "d")
+    assert "primary" not in unloaded
+    assert "primary" in residency.get_stats()["resident"]
+
+
+def test_swap_waits_for_a_busy_model_to_drain():
+    residency, unloaded = scheduler(memory_budget_gb=4.0)
+    residency.acquire("a")
+    admitted = threading.Event()
+    waiter = threading.Thread(target=lambda: (residency.acquire("b"), admitted.set()))
+    waiter.start()
+    time.sleep(0.1)
+    assert not admitted.is_set() and residency.get_stats()["queued"] == {"b": 1}
+
+    residency.release("a")
+    assert admitted.wait(2)
+    waiter.join()
+    assert unloaded == ["a"] and residency.get_stats()["forced_admits"] == 0
+
+
+def test_unload_asks_the_server_with_keep_alive_zero(stubs, make_client, monkeypatch):
+    monkeypatch.setitem(main.RESIDENCY_CONFIG, "models", {"a": {"size_gb": 3.0}, "b": {"size_gb": 3.0}})
+    server = stubs()
+    client = make_client({"host": server.host, "memory_budget_gb": 4.0})
+    client.generate("a", "hello", cache=False)
+    client.generate("b", "hello", cache=False)
+
+    unloads = [r for r in server.requests if r.get("keep_alive") == 0]
+    assert [r["model"] for r in unloads] == ["a"]
+    assert server.resident == ["b"]
@@ -0,0 +1,32 @@
+import time
+from concurrent.futures import Future
+
+import main
+
+
+def collect(future, started):
+    agent_system = main.GemmaAgentSystem.__new__(main.GemmaAgentSystem)
+    return agent_system._collect_prefill(future, started)
+
+
+def test_pending_prefill_reports_no_time_saved():
+    info = collect(Future(), time.time() - 3.0)
+    assert info["ttft_saved"] == 0.0
+    assert info["prefill"] == "pending"
+    assert not info["prefill_done"]
+
+
+def test_finished_prefill_reports_its_load_and_prefill_time():
+    future = Future()
+    future.set_result({"prompt_eval_count": 120, "load_duration": 1_500_000_000, "prompt_eval_duration": 500_000_000})
+    info = collect(future, time.time() - 3.0)
+    assert info["ttft_saved"] == 2.0
+    assert info["prefill_tokens"] == 120
+
+
+def test_failed_prefill_reports_no_time_saved():
+    future = Future()
+    future.set_exception(RuntimeError("runner crashed"))
+    info = collect(future, time.time() - 3.0)
+    assert info["ttft_saved"] == 0.0
+    assert "runner crashed" in info["error"]
@@ -0,0 +1,76 @@
+import threading
+import time
+
+import main
+
+
+def make_scheduler(**config):
+    return main.InferencePriorityScheduler({"enabled": True, "priorities": ["interactive", "proactive"],
+                                            "max_concurrent": 3, "class_limits": {"proactive": 2},
+                                            "max_defer_seconds": 30.0, **config})
+
+
+def acquire_later(scheduler, kind, admitted, timeout=5.0):
+    def run():
+        if scheduler.acquire(kind, timeout=timeout):
+            admitted.append(kind)
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def wait_for_queue(scheduler, kind, depth):
+    for _ in range(100):
+        if scheduler.queued[kind] == depth:
+            return
+        time.sleep(0.01)
+    raise AssertionError(f"{kind} queue never reached {depth}")
+
+
+def test_class_limit_caps_a_class_below_max_concurrent():
+    scheduler = make_scheduler()
+    assert scheduler.acquire("proactive", timeout=0.1)
+    assert scheduler.acquire("proactive", timeout=0.1)
+    assert not scheduler.acquire("proactive", timeout=0.1)
+    assert scheduler.acquire("interactive", timeout=0.1)  # Other classes still fit under max_concurrent
+    assert not scheduler.acquire("interactive", timeout=0.1)
+    scheduler.release("proactive")
+    assert scheduler.acquire("proactive", timeout=0.1)
+    assert scheduler.get_stats()["proactive"]["timeouts"] == 1
+
+
+def test_queued_interactive_call_goes_before_queued_background_work():
+    scheduler = make_scheduler(max_concurrent=1, class_limits={})
+    assert scheduler.acquire("proactive")
+    admitted = []
+    background = acquire_later(scheduler, "proactive", admitted)
+    wait_for_queue(scheduler, "proactive", 1)
+    interactive = acquire_later(scheduler, "interactive", admitted)
+    wait_for_queue(scheduler, "interactive", 1)
+
+    scheduler.release("proactive")
+    interactive.join(timeout=2)
+    assert admitted == ["interactive"]
+    scheduler.release("interactive")
+    background.join(timeout=2)
+    assert admitted == ["interactive", "proactive"]
+
+
+def test_background_work_stops_deferring_after_max_defer_seconds():
+    scheduler = make_scheduler(max_concurrent=2, class_limits={"interactive": 1}, max_defer_seconds=0.2)
+    assert scheduler.acquire("interactive")
+    admitted = []
+    waiting = acquire_later(scheduler, "interactive", admitted)  # Blocked by its class limit, stays queued
+    wait_for_queue(scheduler, "interactive", 1)
+    started = time.time()
+    assert scheduler.acquire("proactive", timeout=2.0)  # Deferred while interactive is queued, then ages out
+    assert 0.15 < time.time() - started < 1.5
+    scheduler.release("interactive")
+    waiting.join(timeout=2)
+
+
+def test_proactive_wave_fits_in_one_round_of_slots():
+    # The follow-up rounds and goal suggestions are submitted together as kind="proactive"
+    limits = main.SCHEDULER_CONFIG["class_limits"]
+    workers = main.GOALS_CONFIG["proactive_workers"]
+    assert min(limits["proactive"], main.SCHEDULER_CONFIG["max_concurrent"]) >= workers
@@ -0,0 +1,36 @@
+import threading
+import time
+from types import SimpleNamespace
+
+
+def complete_event(system, session):
+    events = list(system.get_response_stream("How do I stay motivated?", selected_agent="general",
+                                             session_state=session))
+    return next(e for e in events if e["type"] == "complete")
+
+
+def test_goal_suggestions_are_returned_when_not_stopped(agent_system, monkeypatch):
+    system, _ = agent_system
+    monkeypatch.setattr(system, "_generate_goal_suggestions", lambda *args: [{"title": "Walk daily"}])
+    event = complete_event(system, SimpleNamespace(session_id="s", stop_proactive=False))
+    assert event["proactive_result"]["suggested_goals"] == [{"title": "Walk daily"}]
+
+
+def test_stop_skips_pending_goal_suggestions(agent_system, monkeypatch):
+    system, _ = agent_system
+    session = SimpleNamespace(session_id="s", stop_proactive=False)
+    release = threading.Event()
+
+    def slow_suggestions(*args):
+        session.stop_proactive = True  # The user presses stop while the suggestions are still generating
+        release.wait(timeout=30)
+        return [{"title": "Too late"}]
+
+    monkeypatch.setattr(system, "_generate_goal_suggestions", slow_suggestions)
+    started = time.time()
+    try:
+        event = complete_event(system, session)
+    finally:
+        release.set()
+    assert event["proactive_result"]["suggested_goals"] == []
+    assert time.time() - started < 10
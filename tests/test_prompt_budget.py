@@ -0,0 +1,38 @@
+import main
+
+SECTIONS = {
+    "user_message": {"priority": 0, "max_tokens": None, "keep": True},
+    "knowledge": {"priority": 3, "max_tokens": 100},
+    "instructions": {"priority": 4, "max_tokens": 50},
+}
+
+
+def make_budget(total_tokens):
+    return main.PromptBudget({"enabled": True, "total_tokens": total_tokens, "chars_per_token": 1.0,
+                              "sections": SECTIONS})
+
+
+def test_long_message_is_kept_whole_and_other_sections_shrink():
+    message = "word " * 60
+    fitted, report = make_budget(340).fit({"user_message": message, "knowledge": "k" * 80,
+                                           "instructions": ["long " * 10, "short", ""]})
+    assert fitted["user_message"] == message
+    assert main.TRUNCATION_MARKER not in fitted["user_message"]
+    assert set(report["compacted"]) == {"knowledge", "instructions"}
+    assert report["over_budget"] == 0
+
+
+def test_message_over_the_whole_budget_is_reported_not_cut():
+    message = "word " * 60
+    fitted, report = make_budget(100).fit({"user_message": message, "knowledge": "k" * 80}, reserved_tokens=90)
+    assert fitted["user_message"] == message
+    assert fitted["knowledge"] == ""
+    assert report["over_budget"] == 90 + len(message) - 100
+
+
+def test_default_config_never_cuts_the_user_message():
+    budget = main.PromptBudget()
+    message = "x" * int(budget.total_tokens * budget.chars_per_token * 2)
+    fitted, report = budget.fit({"user_message": message})
+    assert fitted["user_message"] == message
+    assert report["over_budget"] > 0
@@ -0,0 +1,43 @@
+import main
+
+
+def response_cache(tmp_path=None, **config):
+    return main.ResponseCache({"enabled": True, "memory_entries": 2, "ttl_seconds": 60,
+                               "disk_enabled": tmp_path is not None,
+                               "disk_path": str(tmp_path / "cache.db") if tmp_path else None, **config})
+
+
+def test_response_cache_evicts_least_recently_used():
+    cache = response_cache()
+    cache.put("a", "A")
+    cache.put("b", "B")
+    assert cache.get("a") == "A"  # a is now the most recent
+    cache.put("c", "C")
+    assert cache.get("b") is None
+    assert cache.get("a") == "A" and cache.get("c") == "C"
+
+
+def test_response_cache_expires_entries(monkeypatch):
+    cache = response_cache()
+    now = 1_000_000.0
+    monkeypatch.setattr(main.time, "time", lambda: now)
+    cache.put("a", "A")
+    now += 61
+    assert cache.get("a") is None
+    assert cache.get_stats()["entries"] == 0
+
+
+def test_response_cache_disk_tier_survives_memory_eviction_and_restart(tmp_path):
+    cache = response_cache(tmp_path)
+    for key in "abc":
+        cache.put(key, key.upper())
+    assert cache.get("a") == "A"  # Evicted from memory, read back from disk
+    assert cache.stats["disk_hits"] == 1
+    assert response_cache(tmp_path).get("b") == "B"
+
+
+def test_response_cache_only_caches_low_temperature_calls():
+    cache = response_cache()
+    assert cache.is_cacheable({"temperature": 0.1})
+    assert not cache.is_cacheable({"temperature": 0.7})
+    assert not cache.is_cacheable()  # Ollama's default temperature
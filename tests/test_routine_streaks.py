@@ -0,0 +1,79 @@
+from datetime import date, timedelta
+
+from main import RoutineStreakEngine as Streaks
+
+START = date(2024, 1, 1)  # A Monday
+
+
+def check_ins(days, frequency="daily"):
+    state = {}
+    for day in days:
+        state = Streaks.check_in(state, day, frequency) or state
+    return state
+
+
+def bitmap(state):
+    return int(state["recent_days"], 16)
+
+
+def test_daily_streak_resets_after_a_gap_and_keeps_the_longest():
+    state = check_ins([START + timedelta(days=n) for n in (0, 1, 2)])
+    assert (state["streak_count"], state["longest_streak"]) == (3, 3)
+
+    state = Streaks.check_in(state, START + timedelta(days=4))  # Day 3 missed
+    assert (state["streak_count"], state["longest_streak"]) == (1, 3)
+    assert bitmap(state) == 0b11101  # Bit 0 = day 4, bit 1 = the missed day 3
+
+
+def test_check_in_on_or_before_the_last_day_is_ignored():
+    state = check_ins([START + timedelta(days=1)])
+    assert Streaks.check_in(state, START + timedelta(days=1)) is None
+    assert Streaks.check_in(state, START) is None
+
+
+def test_weekly_streak_counts_weeks_not_days():
+    monday, sunday = START, START + timedelta(days=6)
+    state = check_ins([monday, sunday], "weekly")
+    assert state["streak_count"] == 1  # Same week
+
+    state = Streaks.check_in(state, sunday + timedelta(days=1), "weekly")  # Next Monday
+    assert state["streak_count"] == 2
+
+    state = Streaks.check_in(state, sunday + timedelta(days=15), "weekly")  # A whole week skipped
+    assert (state["streak_count"], state["longest_streak"]) == (1, 2)
+
+
+def test_bitmap_rolls_days_out_after_ninety_days():
+    state = check_ins([START, START + timedelta(days=89)])
+    assert bitmap(state) == (1 << 89) | 1
+
+    state = Streaks.check_in(state, START + timedelta(days=90))
+    assert bitmap(state) == (1 << 1) | 1  # START fell out of the window
+    assert bitmap(Streaks.check_in(state, START + timedelta(days=500))) == 1
+
+
+def test_summarize_rates_and_current_streak():
+    last = START + timedelta(days=6)
+    state = check_ins([START + timedelta(days=n) for n in range(7)])
+
+    summary = Streaks.summarize(state, last)
+    assert summary["current_streak"] == 7 and summary["checked_today"]
+    assert summary["completion_rates"] == {"7d": 1.0, "30d": round(7 / 30, 3), "90d": round(7 / 90, 3)}
+
+    assert Streaks.summarize(state, last + timedelta(days=1))["current_streak"] == 7  # Today still open
+    later = Streaks.summarize(state, last + timedelta(days=2))
+    assert later["current_streak"] == 0 and later["longest_streak"] == 7
+    assert later["completion_rates"]["7d"] == round(5 / 7, 3)
+
+
+def test_summarize_weekly_rates_count_weeks():
+    state = check_ins([START, START + timedelta(days=8)], "weekly")  # Weeks 1 and 2
+    summary = Streaks.summarize(state, START + timedelta(days=13), "weekly")
+    assert summary["current_streak"] == 2
+    assert summary["completion_rates"] == {"7d": 1.0, "30d": round(2 / 4, 3), "90d": round(2 / 12, 3)}
+
+
+def test_summarize_without_check_ins():
+    summary = Streaks.summarize({}, START)
+    assert summary["current_streak"] == 0 and not summary["checked_today"]
+    assert set(summary["completion_rates"].values()) == {0.0}
@@ -0,0 +1,60 @@
+from types import SimpleNamespace
+
+import main
+
+
+def semantic_cache(**config):
+    return main.SemanticResponseCache({"enabled": True, "similarity_threshold": 0.8, "embedding_dim": 1024,
+                                       "max_entries_per_agent": 2, **config})
+
+
+def test_semantic_cache_answers_paraphrases_only_with_same_goals_and_numbers():
+    cache = semantic_cache()
+    cache.store("general", "How do I improve my sleep schedule?", "goals-1", "Go to bed earlier.")
+    assert cache.lookup("general", "how do i improve my sleep schedule", "goals-1")["response"] == "Go to bed earlier."
+    assert cache.lookup("general", "What is the capital of France?", "goals-1") is None
+
+    cache.store("math", "What is 2x + 3 when x is 4?", "goals-1", "11")
+    assert cache.lookup("math", "What is 2x + 3 when x is 5?", "goals-1") is None
+
+
+def test_semantic_cache_skips_but_keeps_answers_written_against_other_goals():
+    cache = semantic_cache()
+    cache.store("general", "How do I improve my sleep schedule?", "goals-1", "Go to bed earlier.")
+    assert cache.lookup("general", "How do I improve my sleep schedule?", "goals-2") is None
+    cache.store("general", "How do I pace my first marathon?", "goals-2", "Start slow.")
+    assert cache.lookup("general", "How do I improve my sleep schedule?", "goals-1")["response"] == "Go to bed earlier."
+    assert cache.get_stats()["invalidations"] == 0
+
+
+def test_semantic_cache_keeps_the_newest_answers_per_agent():
+    cache = semantic_cache()
+    for topic in ("sleep schedule", "running pace", "guitar chords"):
+        cache.store("general", f"How do I improve my {topic}?", "goals", topic)
+    assert cache.lookup("general", "How do I improve my sleep schedule?", "goals") is None
+    assert cache.lookup("general", "How do I improve my guitar chords?", "goals")["response"] == "guitar chords"
+
+
+def test_semantic_cache_only_for_configured_agents():
+    cache = semantic_cache(agents=["general"])
+    cache.store("coaching", "How do I improve my sleep schedule?", "goals", "Go to bed earlier.")
+    assert cache.lookup("coaching", "How do I improve my sleep schedule?", "goals") is None
+    assert cache.get_stats()["stores"] == 0
+
+
+def test_a_message_ranking_other_goals_does_not_empty_the_cache(agent_system, monkeypatch):
+    system, server = agent_system
+    monkeypatch.setattr(system, "semantic_cache", semantic_cache(agents=["general"]))
+    session = SimpleNamespace(session_id="s", stop_proactive=True)
+
+    def ask(message):
+        events = list(system.get_response_stream(message, selected_agent="general", session_state=session))
+        return next(e for e in events if e["type"] == "metadata")
+
+    sleep_goals = ask("How do I fix my sleep schedule?")["relevant_goals"]
+    career_goals = ask("Which AI/ML career skills should I learn next?")["relevant_goals"]
+    assert sleep_goals[0]["title"] != career_goals[0]["title"]  # A different goal block in the prompt
+
+    metadata = ask("How do I fix my sleep schedule?")
+    assert metadata["relevant_goals"] == sleep_goals
+    assert metadata["semantic_cache"]["hit"]